@@ -1,44 +1,78 @@
 # app.py
-from crypt import methods
-from email import message
-from flask import Flask, request, jsonify, Response
-from lib.db import (
-    get_db,
-)
-from lib.auth import auth_bp
-from lib.workers import worker_bp
-from lib.client import client_bp
+import os
+import threading
+
+from flask import Flask, current_app
 from flask_cors import CORS
+from dotenv import load_dotenv
 
-app = Flask(__name__)
-CORS(app)
 
+# Readiness check: pings MongoDB, cached for HEALTH_CACHE_SECONDS, and waits
+# for index creation. Unique indexes blocked by duplicates are reported but do
+# not take the instance out of service, only the writes relying on them.
+def home():
+    from lib.connection import check_health
+    from lib.indexes import index_error, indexes_checked, indexes_ready
 
-app.register_blueprint(auth_bp, url_prefix="/auth")
-app.register_blueprint(worker_bp, url_prefix="/workers")
-app.register_blueprint(client_bp, url_prefix="/clients")
+    health = check_health()
+    if health["OK"] and not indexes_checked():
+        return {
+            "MESSAGE": f"Database indexes are not ready: {index_error()}",
+            "VERSION": current_app.config["VERSION"],
+        }, 503
+    if health["OK"] and not indexes_ready():
+        return {
+            "MESSAGE": "Human Resource Management System API.",
+            "VERSION": current_app.config["VERSION"],
+            "INDEX_ERROR": index_error(),
+        }
+    if health["OK"]:
+        return {
+            "MESSAGE": "Human Resource Management System API.",
+            "VERSION": current_app.config["VERSION"],
+        }
+    return {
+        "MESSAGE": "Unable to connect to MongoDB",
+        "VERSION": current_app.config["VERSION"],
+    }, 503
 
-import os
-from dotenv import load_dotenv
 
-load_dotenv()
+def create_app():
+    # Load .env before the blueprints read their settings from the environment
+    load_dotenv()
 
-VERSION = os.environ.get("VERSION", "v0.0.1")
+    from lib.auth import auth_bp
+    from lib.client import client_bp
+    from lib.connection import get_db
+    from lib.indexes import ensure_indexes_until_ready, require_indexes
+    from lib.json_provider import FastJSONProvider
+    from lib.tokens import check_secret_key
+    from lib.workers import worker_bp
 
+    check_secret_key()
 
-@app.route("/")
-def home():
-    db = get_db()
-    if db is not None:
-        return {
-            "MESSAGE": "Human Resource Management System API.",
-            "VERSION": VERSION,
-        }
-    return "Unable to connect to MongoDB"
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    app.config["VERSION"] = os.environ.get("VERSION", "v0.0.1")
+    CORS(app)
+    app.before_request(require_indexes)
 
+    app.register_blueprint(auth_bp, url_prefix="/auth")
+    app.register_blueprint(worker_bp, url_prefix="/workers")
+    app.register_blueprint(client_bp, url_prefix="/clients")
+    app.add_url_rule("/", "home", home)
 
-if __name__ == "__main__":
-    import os
+    # Index creation talks to MongoDB, keep it off the startup path
+    threading.Thread(
+        target=ensure_indexes_until_ready, args=(get_db,), daemon=True
+    ).start()
 
+    return app
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
     PORT = os.environ.get("PORT", 8080)
     app.run(debug=True, host="0.0.0.0", port=PORT)
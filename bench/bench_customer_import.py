@@ -0,0 +1,117 @@
+# bench_customer_import.py
+# Customer import throughput: one POST /clients/save per customer against one
+# POST /clients/import upload, as CSV and as NDJSON, through the Flask test
+# client so both paths include routing, auth and validation.
+#
+#   python -m bench.bench_customer_import [--rows 10000] [--single 1000]
+#
+# The single-insert path is timed on the first --single rows only; rows/s
+# compares the paths.
+import argparse
+import csv
+import io
+import json
+import os
+
+from bench.common import bench_db, drop_bench_db, duration, print_table
+
+COLUMNS = ("NAME", "ADDRESS", "EMAIL", "MOBILE", "GST_NUMBER", "DAILY_RATE")
+
+
+def customer_rows(count):
+    return [
+        {
+            "NAME": f"Customer {number}",
+            "ADDRESS": f"{number} Park Street, Kolkata",
+            "EMAIL": f"customer{number}@example.com",
+            "MOBILE": f"9{number:09d}",
+            "GST_NUMBER": f"19AAAAA{number:04d}A1Z5",
+            "DAILY_RATE": "650",
+        }
+        for number in range(count)
+    ]
+
+
+def to_csv(rows):
+    output = io.StringIO()
+    writer = csv.DictWriter(output, COLUMNS)
+    writer.writeheader()
+    writer.writerows(rows)
+    return output.getvalue().encode()
+
+
+def to_ndjson(rows):
+    return "".join(json.dumps(row) + "\n" for row in rows).encode()
+
+
+def save_one_by_one(client, headers, rows):
+    for row in rows:
+        form = {field: {"VALUE": value} for field, value in row.items()}
+        response = client.post(
+            "/clients/save",
+            json={"CUSTOMER_DATA": {"CUSTOMER_DATA": form}},
+            headers=headers,
+        )
+        assert response.status_code == 200, response.get_json()
+
+
+def upload(client, headers, body, input_format):
+    response = client.post(
+        f"/clients/import?FORMAT={input_format}", data=body, headers=headers
+    )
+    report = response.get_json()
+    assert report["FAILED"] == 0, report["RESULTS"][:5]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the bulk customer import.")
+    parser.add_argument("--rows", type=int, default=10000, help="customers imported")
+    parser.add_argument(
+        "--single", type=int, default=1000, help="customers saved one by one"
+    )
+    args = parser.parse_args()
+
+    # Startup refuses to run with auth on and no SECRET_KEY
+    os.environ.setdefault("SECRET_KEY", "bench-secret-key")
+    from app import app
+    from lib.tokens import issue_token
+
+    db = bench_db()
+    try:
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {issue_token('bench')}"}
+        rows = customer_rows(args.rows)
+        single = min(args.single, args.rows)
+
+        results = []
+        for name, count, function, *function_args in (
+            ("POST /clients/save", single, save_one_by_one, rows[:single]),
+            ("POST /clients/import csv", args.rows, upload, to_csv(rows), "csv"),
+            (
+                "POST /clients/import ndjson",
+                args.rows,
+                upload,
+                to_ndjson(rows),
+                "ndjson",
+            ),
+        ):
+            db["Customers"].delete_many({})
+            seconds = duration(function, client, headers, *function_args)
+            results.append((name, count, seconds, count / seconds))
+
+        baseline = results[0][3]
+        print_table(
+            ("path", "rows", "seconds", "rows/s", "speedup"),
+            [
+                (
+                    name,
+                    count,
+                    f"{seconds:.2f}",
+                    f"{rate:.0f}",
+                    f"{rate / baseline:.1f}x",
+                )
+                for name, count, seconds, rate in results
+            ],
+        )
+    finally:
+        drop_bench_db()
@@ -0,0 +1,96 @@
+# bench_customer_update.py
+# Latency of update_customer_data as the customer base grows.
+#
+#   python -m bench.bench_customer_update [--sizes 100,1000,10000,100000] [--repeat 200]
+#
+# Collisions on email, mobile and name are rejected by the unique indexes on
+# Customers, so an update is one indexed write whatever the number of
+# customers: the median and p95 should stay flat from 100 to 100k customers.
+# Each size is timed for successful updates and for updates rejected as a
+# duplicate of another customer.
+import argparse
+import random
+
+from bench.common import bench_db, drop_bench_db, latency, print_table
+
+
+def customer_fields(number, name=None):
+    return {
+        "NAME": {"VALUE": name or f"Customer {number}"},
+        "ADDRESS": {"VALUE": f"{number} Park Street, Kolkata"},
+        "EMAIL": {"VALUE": f"customer{number}@example.com"},
+        "MOBILE": {"VALUE": f"9{number:09d}"},
+    }
+
+
+def add_customers(db, start, stop, batch_size=10000):
+    for first in range(start, stop, batch_size):
+        db["Customers"].insert_many(
+            [
+                {"CUSTOMER_DATA": customer_fields(number)}
+                for number in range(first, min(first + batch_size, stop))
+            ],
+            ordered=False,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark update_customer_data.")
+    parser.add_argument("--sizes", default="100,1000,10000,100000")
+    parser.add_argument(
+        "--repeat", type=int, default=200, help="updates timed per size"
+    )
+    args = parser.parse_args()
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+
+    from lib.db import update_customer_data
+
+    db = bench_db()
+    try:
+        rows = []
+        count = 0
+        for size in sizes:
+            add_customers(db, count, size)
+            count = size
+            ids = {
+                int(customer["CUSTOMER_DATA"]["MOBILE"]["VALUE"][1:]): str(
+                    customer["_id"]
+                )
+                for customer in db["Customers"].find({}, {"CUSTOMER_DATA.MOBILE": 1})
+            }
+            numbers = random.choices(range(size), k=args.repeat)
+
+            updates = [
+                (ids[number], customer_fields(number, f"Customer {number} Ltd"))
+                for number in numbers
+            ]
+            # The email of the next customer collides
+            duplicates = [
+                (
+                    ids[number],
+                    {
+                        **customer_fields(number),
+                        "EMAIL": customer_fields((number + 1) % size)["EMAIL"],
+                    },
+                )
+                for number in numbers
+            ]
+            rows.append(
+                (
+                    size,
+                    *(f"{ms:.2f}" for ms in latency(update_customer_data, updates)),
+                    *(f"{ms:.2f}" for ms in latency(update_customer_data, duplicates)),
+                )
+            )
+        print_table(
+            (
+                "customers",
+                "update median ms",
+                "p95 ms",
+                "duplicate median ms",
+                "p95 ms",
+            ),
+            rows,
+        )
+    finally:
+        drop_bench_db()
@@ -0,0 +1,102 @@
+# bench_json.py
+# Encoding a day sheet of --workers workers: the copy loop replacing every _id
+# with str(_id) followed by Flask's default provider, against FastJSONProvider
+# on the documents as read and the streamed ndjson encoding of the records.
+# Reports time and peak memory (tracemalloc) of each. No database needed.
+#
+#   python -m bench.bench_json [--workers 10000] [--repeat 5]
+#
+# FastJSONProvider uses orjson when it is installed, the standard library json
+# otherwise; the backend in use is printed.
+import argparse
+import tracemalloc
+from datetime import datetime
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from bench.common import duration, print_table
+from lib import json_provider
+from lib.json_provider import FastJSONProvider, iter_ndjson
+
+
+def day_sheet(workers):
+    return {
+        "_id": ObjectId(),
+        "DATE": "2024-03-04",
+        "CLIENT_ID": str(ObjectId()),
+        "SIGNED_BY": "supervisor",
+        "PRESENT": workers,
+        "ABSENT": 0,
+        "REVISION": 3,
+        "UPDATED_AT": datetime(2024, 3, 4, 18, 30),
+        "WORKER_LIST": [
+            {
+                "_id": ObjectId(),
+                "WORKER_ID": str(ObjectId()),
+                "WORKER_NAME": f"Worker {number}",
+                "WORKER_EMAIL": {"VALUE": f"worker{number}@example.com"},
+                "PHONE": f"9{number:09d}",
+                "Comments": "",
+                "STATUS": {"VALUE": "PRESENT"},
+            }
+            for number in range(workers)
+        ],
+    }
+
+
+# Before the provider: every read path copied the documents to stringify _id
+def copy_and_encode(provider, day):
+    day = {**day, "_id": str(day["_id"]), "UPDATED_AT": day["UPDATED_AT"].isoformat()}
+    day["WORKER_LIST"] = [
+        {**worker, "_id": str(worker["_id"])} for worker in day["WORKER_LIST"]
+    ]
+    return provider.dumps(day)
+
+
+def stream(day):
+    size = 0
+    for line in iter_ndjson(day["WORKER_LIST"]):
+        size += len(line)
+    return size
+
+
+# Bytes allocated at the peak of one call of function(*args)
+def peak_memory(function, *args):
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the JSON provider.")
+    parser.add_argument(
+        "--workers", type=int, default=10000, help="workers on the day sheet"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="runs, the fastest is kept"
+    )
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    default_provider = DefaultJSONProvider(app)
+    fast_provider = FastJSONProvider(app)
+    day = day_sheet(args.workers)
+
+    rows = []
+    for name, function, function_args in (
+        ("copy loop + default provider", copy_and_encode, (default_provider, day)),
+        ("FastJSONProvider", fast_provider.dumps, (day,)),
+        ("iter_ndjson (streamed)", stream, (day,)),
+    ):
+        # Timed without tracing: tracemalloc slows every allocation down
+        seconds = min(duration(function, *function_args) for _ in range(args.repeat))
+        peak = peak_memory(function, *function_args)
+        rows.append((name, f"{seconds * 1000:.1f}", f"{peak / 2**20:.2f}"))
+
+    print(f"JSON backend: {'orjson' if json_provider.orjson is not None else 'json'}")
+    print_table(("encoding", "ms", "peak MiB"), rows)
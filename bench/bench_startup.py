@@ -0,0 +1,120 @@
+# bench_startup.py
+# Cold start of the app: time to import app.py and to serve the first request,
+# each measured in a fresh interpreter, plus the slowest imports made by app.py
+# according to `python -X importtime`. No database is needed: the first request is an
+# OPTIONS preflight, answered without a MongoDB round trip.
+#
+#   python -m bench.bench_startup [--runs 10] [--top 10]
+#
+# Heavy dependencies are imported on first use, so none of DEFERRED_MODULES
+# should be loaded by the app once the first request has been served (modules
+# the interpreter itself loaded through site are not counted).
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from bench.common import print_table
+
+DEFERRED_MODULES = ("pandas", "numpy", "pytz", "bcrypt", "zipfile", "multiprocessing")
+
+FIRST_REQUEST = """
+import json, sys, time
+started = float(sys.argv[1])
+interpreter = set(sys.modules)
+from app import app
+imported = time.time()
+app.test_client().options("/workers/")
+served = time.time()
+print(json.dumps({
+    "IMPORT": imported - started,
+    "FIRST_REQUEST": served - started,
+    "LOADED": [
+        module for module in sys.argv[2:]
+        if module in sys.modules and module not in interpreter
+    ],
+}))
+"""
+
+
+def _environment():
+    environment = dict(os.environ)
+    # Startup refuses to run with auth on and no SECRET_KEY
+    environment.setdefault("SECRET_KEY", "bench-secret-key")
+    return environment
+
+
+def first_request():
+    output = subprocess.run(
+        [sys.executable, "-c", FIRST_REQUEST, str(time.time()), *DEFERRED_MODULES],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=_environment(),
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+# (cumulative microseconds, module) of the modules imported by app.py itself
+def import_times():
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=_environment(),
+    ).stderr
+    children = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # A module is listed after its imports, indented two spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((int(cumulative), name.strip()))
+        elif depth == 0:
+            if name.strip() == "app":
+                return sorted(children, reverse=True)
+            children = []
+    return []
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the cold start of the app.")
+    parser.add_argument(
+        "--runs", type=int, default=10, help="fresh interpreters started"
+    )
+    parser.add_argument("--top", type=int, default=10, help="slowest imports listed")
+    args = parser.parse_args()
+
+    results = [first_request() for _ in range(args.runs)]
+    print_table(
+        ("", "median ms", "max ms"),
+        [
+            (
+                name,
+                f"{statistics.median(result[key] for result in results) * 1000:.0f}",
+                f"{max(result[key] for result in results) * 1000:.0f}",
+            )
+            for name, key in (
+                ("import app", "IMPORT"),
+                ("first request", "FIRST_REQUEST"),
+            )
+        ],
+    )
+    loaded = sorted({module for result in results for module in result["LOADED"]})
+    print(f"Deferred modules loaded at startup: {', '.join(loaded) or 'none'}")
+    print()
+    print_table(
+        ("module", "cumulative ms"),
+        [
+            (name, f"{microseconds / 1000:.1f}")
+            for microseconds, name in import_times()[: args.top]
+        ],
+    )
@@ -0,0 +1,121 @@
+# bench_validators.py
+# Customer form validation: the validators compiled from the client schema CSV
+# against generic JSON-schema validation of the same rules with the jsonschema
+# package (not an app dependency: pip install jsonschema). No database needed.
+#
+#   python -m bench.bench_validators [--forms 10000]
+#
+# jsonschema is timed both with a validator built once and with
+# jsonschema.validate(), which checks and compiles the schema on every call.
+import argparse
+import time
+
+from bench.common import print_table
+from lib.schema_templates import CLIENT_SCHEMA_CSV, get_schema_fields
+from lib.validators import (
+    DATE_PATTERN,
+    EMAIL_PATTERN,
+    NUMBER_PATTERN,
+    validate_client_fields,
+)
+
+NUMBER = {
+    "anyOf": [{"type": "number"}, {"type": "string", "pattern": NUMBER_PATTERN.pattern}]
+}
+JSON_TYPES = {
+    "string": {"type": "string"},
+    "number": NUMBER,
+    "date": {"type": "string", "pattern": DATE_PATTERN.pattern},
+    "object": {"type": "object"},
+    "email": {"type": "string", "pattern": EMAIL_PATTERN.pattern},
+}
+
+
+# JSON schema of a {FIELD: {"VALUE": ...}} form with the rules of the CSV
+def json_schema(csv_file_path):
+    properties = {}
+    for field in get_schema_fields(csv_file_path):
+        data_type = (
+            "email" if field.NAME.endswith("EMAIL") else field.DATA_TYPE.strip().lower()
+        )
+        properties[field.NAME] = {
+            "type": "object",
+            "properties": {"VALUE": JSON_TYPES.get(data_type, {})},
+        }
+    return {"type": "object", "properties": properties}
+
+
+def forms(count):
+    return [
+        {
+            name: {"VALUE": value}
+            for name, value in {
+                "NAME": f"Customer {number}",
+                "ADDRESS": f"{number} Park Street, Kolkata",
+                "EMAIL": f"customer{number}@example.com",
+                "MOBILE": f"9{number:09d}",
+                "CONTACT_NAME": "Accounts",
+                "CONTACT_NUMBER": f"8{number:09d}",
+                "CONTACT_EMAIL": f"accounts{number}@example.com",
+                "ONBOARDING_DATE": "2024-01-15",
+                "GST_NUMBER": f"19AAAAA{number:04d}A1Z5",
+                "BILLING_DATE": "15/01/2024",
+                "DAILY_RATE": 650,
+            }.items()
+        }
+        for number in range(count)
+    ]
+
+
+def per_form(validate, forms):
+    started = time.perf_counter()
+    for form in forms:
+        validate(form)
+    return (time.perf_counter() - started) / len(forms) * 1_000_000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the compiled validators.")
+    parser.add_argument(
+        "--forms", type=int, default=10000, help="forms validated per run"
+    )
+    args = parser.parse_args()
+
+    try:
+        import jsonschema
+    except ImportError:
+        raise SystemExit("jsonschema is not installed: pip install jsonschema")
+
+    schema = json_schema(CLIENT_SCHEMA_CSV)
+    validator = jsonschema.Draft7Validator(schema)
+    valid = forms(args.forms)
+    invalid = [{**form, "EMAIL": {"VALUE": "not-an-email"}} for form in valid]
+    assert all(validate_client_fields(form) is None for form in valid)
+    assert all(validator.is_valid(form) for form in valid)
+    assert not any(validator.is_valid(form) for form in invalid)
+
+    def validate_each_time(form):
+        try:
+            jsonschema.validate(form, schema)
+        except jsonschema.ValidationError:
+            pass
+
+    # Each stops at the first invalid field, as the compiled validators do
+    print_table(
+        ("validation", "valid form us", "invalid form us"),
+        [
+            (
+                name,
+                f"{per_form(validate, valid):.1f}",
+                f"{per_form(validate, invalid):.1f}",
+            )
+            for name, validate in (
+                ("compiled validators", validate_client_fields),
+                (
+                    "jsonschema, built once",
+                    lambda form: next(validator.iter_errors(form), None),
+                ),
+                ("jsonschema.validate()", validate_each_time),
+            )
+        ],
+    )
@@ -0,0 +1,65 @@
+# common.py
+# Shared setup of the benchmarks, run from the repository root:
+#
+#   python -m bench.<benchmark> [options]
+#
+# Benchmarks that need MongoDB write to BENCH_MONGO_URI (a local mongod by
+# default) in the database BENCH_MONGO_DB_NAME, created with the indexes of
+# lib/indexes.py and dropped at the end. .env is not read, so a benchmark never
+# touches the application database.
+import os
+import statistics
+import time
+
+os.environ["MONGO_URI"] = os.getenv("BENCH_MONGO_URI", "mongodb://localhost:27017")
+os.environ["MONGO_DB_NAME"] = os.getenv("BENCH_MONGO_DB_NAME", "Attendance_DB_bench")
+os.environ.setdefault("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")
+
+
+def bench_db():
+    from pymongo.errors import PyMongoError
+
+    from lib.connection import get_db
+    from lib.indexes import ensure_indexes
+
+    db = get_db()
+    try:
+        db.client.drop_database(db.name)
+    except PyMongoError as e:
+        raise SystemExit(f"MongoDB is not reachable: {e}")
+    if not ensure_indexes(db):
+        raise SystemExit("Unique indexes could not be created, see the errors above.")
+    return db
+
+
+def drop_bench_db():
+    from lib.connection import close_connection, get_db
+
+    db = get_db()
+    db.client.drop_database(db.name)
+    close_connection()
+
+
+# Milliseconds per call of function(*args) for each args: (median, p95)
+def latency(function, calls):
+    timings = []
+    for args in calls:
+        started = time.perf_counter()
+        function(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    if len(timings) < 2:
+        return timings[0], timings[0]
+    return statistics.median(timings), statistics.quantiles(timings, n=20)[-1]
+
+
+# Seconds taken by one call of function(*args)
+def duration(function, *args):
+    started = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - started
+
+
+def print_table(header, rows):
+    widths = [max(len(str(value)) for value in column) for column in zip(header, *rows)]
+    for row in (header, *rows):
+        print("  ".join(str(value).rjust(width) for value, width in zip(row, widths)))
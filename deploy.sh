@@ -5,9 +5,15 @@ if [ -f .env ]; then
   export $(grep -v '^#' .env | xargs)
 fi
 
+# Tokens must verify on every instance, so all of them share one SECRET_KEY
+if [ -z "${SECRET_KEY}" ]; then
+  echo "SECRET_KEY is not set, add it to .env before deploying." >&2
+  exit 1
+fi
+
 gcloud run deploy attendance-management-backend \
   --image us-central1-docker.pkg.dev/attendance-management-0000/attendance-management/attendance-management-backend:v${VERSION} \
   --platform managed \
   --region us-central1 \
   --allow-unauthenticated \
-  --update-env-vars VERSION=${VERSION}
\ No newline at end of file
+  --update-env-vars VERSION=${VERSION},SECRET_KEY=${SECRET_KEY}
\ No newline at end of file
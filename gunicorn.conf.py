@@ -0,0 +1,22 @@
+# gunicorn.conf.py
+# Loaded automatically by gunicorn from the working directory.
+# The serving mode is selected with SERVER_MODE:
+#   sync    - one request at a time per worker process (default)
+#   threads - gthread workers, THREADS concurrent requests per process
+#   async   - gevent workers, WORKER_CONNECTIONS concurrent requests per process.
+#             The socket module is monkey patched before the app is imported,
+#             so pymongo (which supports gevent) yields while waiting on MongoDB
+#             and one process multiplexes many requests. gevent is in the Pipfile.
+import os
+
+SERVER_MODE = os.getenv("SERVER_MODE", "sync").lower()
+
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "30"))
+
+if SERVER_MODE == "async":
+    worker_class = "gevent"
+    worker_connections = int(os.getenv("WORKER_CONNECTIONS", "500"))
+elif SERVER_MODE == "threads":
+    worker_class = "gthread"
+    threads = int(os.getenv("THREADS", "16"))
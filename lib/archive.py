@@ -0,0 +1,485 @@
+# archive.py
+# Compact archive of closed attendance months.
+#
+#   python -m lib.archive [--month YYYY-MM]
+#
+# A closed month (before the current IST month) is packed into one
+# Attendance_Archive document: the day headers, each worker's details stored
+# once, and a (workers x days) int8 matrix of status codes stored as binary.
+# Its Daily_Attendance and Worker_Attendance documents are then removed. The
+# read paths in lib.db fall back to the archive, so archived days are served as
+# before but are read-only. Summaries run as NumPy operations over the matrix.
+#
+# The archive document is claimed in the PENDING state before the month is
+# read: from then on attendance writes to the month are refused, while reads
+# keep using the live documents. Only COMPLETE archives are read or cached.
+# Writes that passed that check before the claim can still land: each day
+# header is deleted only if its REVISION is still the one archived, so a day
+# rewritten meanwhile stays live and is packed again. Writers whose day header
+# was deleted under them refuse the write (see lib.db).
+import argparse
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from bson import Binary
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+from dotenv import load_dotenv
+
+from lib.attendance import MONTH_PATTERN, month_query, plain_value
+from lib.connection import close_connection, get_db
+from lib.schema_templates import IST, created_on_ist
+
+ARCHIVE_CACHE_SIZE = int(os.getenv("ARCHIVE_CACHE_SIZE", "12"))
+PENDING = "PENDING"
+COMPLETE = "COMPLETE"
+# Archives written before the STATE field are complete
+COMPLETE_QUERY = {"STATE": {"$ne": PENDING}}
+HEADER_FIELDS = {
+    "CLIENT_ID": "",
+    "SIGNED_BY": "",
+    "PRESENT": 0,
+    "ABSENT": 0,
+    "REVISION": 0,
+}
+# Keys of a worker record that are not worker details
+RECORD_KEYS = ("_id", "DATE", "WORKER_ID", "STATUS")
+# Status code 0 marks a worker without a record on that day
+NO_RECORD = 0
+MAX_CODES = 127
+
+_lock = threading.Lock()
+# MONTH -> ArchivedMonth, archived months never change
+_cache = OrderedDict()
+
+
+def current_month():
+    return datetime.now(IST).strftime("%Y-%m")
+
+
+# Pack the day headers and worker records of a month into an archive document
+def pack_month(month, headers, records):
+    import numpy as np
+
+    dates = [header["DATE"] for header in headers]
+    day_index = {date: day for day, date in enumerate(dates)}
+    codes = [None]
+    code_index = {}
+    cells = {}
+    for record in records:
+        worker_id = record.get("WORKER_ID")
+        day = day_index.get(record.get("DATE"))
+        if not worker_id or day is None:
+            continue
+        status = plain_value(record.get("STATUS"), "")
+        if status not in code_index:
+            if len(codes) > MAX_CODES:
+                raise ValueError(f"Too many distinct statuses in {month}.")
+            code_index[status] = len(codes)
+            codes.append(status)
+        details = {
+            key: value for key, value in record.items() if key not in RECORD_KEYS
+        }
+        cells[worker_id, day] = (code_index[status], details)
+
+    worker_ids = sorted({worker_id for worker_id, _ in cells})
+    worker_index = {worker_id: worker for worker, worker_id in enumerate(worker_ids)}
+    workers = [None] * len(worker_ids)
+    extras = []
+    matrix = np.zeros((len(worker_ids), len(dates)), dtype=np.int8)
+    for (worker_id, day), (code, details) in sorted(
+        cells.items(), key=lambda cell: cell[0][1]
+    ):
+        worker = worker_index[worker_id]
+        matrix[worker, day] = code
+        # Details are kept once per worker, days that differ keep their changes
+        if workers[worker] is None:
+            workers[worker] = details
+        else:
+            changed = {
+                key: value
+                for key, value in details.items()
+                if workers[worker].get(key) != value
+            }
+            if changed:
+                extras.append([worker, day, changed])
+
+    return {
+        "MONTH": month,
+        "DATES": dates,
+        "HEADERS": [
+            {
+                field: header.get(field, default)
+                for field, default in HEADER_FIELDS.items()
+            }
+            for header in headers
+        ],
+        "WORKER_IDS": worker_ids,
+        "WORKERS": workers,
+        "CODES": codes,
+        "STATUS": Binary(matrix.tobytes()),
+        "EXTRAS": extras,
+        "ARCHIVED_ON": created_on_ist(),
+    }
+
+
+# Claim a month for archiving, resuming a claim left PENDING by an interrupted run
+def _claim_month(db, month):
+    try:
+        db["Attendance_Archive"].insert_one(
+            {"MONTH": month, "STATE": PENDING, "ARCHIVED_ON": created_on_ist()}
+        )
+    except DuplicateKeyError:
+        existing = db["Attendance_Archive"].find_one({"MONTH": month}, {"STATE": 1})
+        if existing is None:
+            raise RuntimeError(f"{month} was claimed concurrently, try again.")
+        if existing.get("STATE") != PENDING:
+            return False
+    return True
+
+
+# DATE -> (header, records) of the days of an archive document
+def _archived_days(document):
+    archived = ArchivedMonth(document)
+    days = {}
+    for date in archived.dates:
+        header = archived.header(date)
+        header.pop("ARCHIVED")
+        records = [{**record, "DATE": date} for record in archived.records(date)]
+        days[date] = (header, records)
+    return days
+
+
+# Read the live days of a month into days, DATE -> (header, records).
+# Returns the headers read.
+def _read_live_days(db, query, days):
+    headers = list(db["Daily_Attendance"].find(query).sort("DATE", ASCENDING))
+    if not headers:
+        return headers
+    records = {}
+    dates = [header["DATE"] for header in headers]
+    for record in db["Worker_Attendance"].find({"DATE": {"$in": dates}}, {"_id": 0}):
+        records.setdefault(record["DATE"], []).append(record)
+    for header in headers:
+        day_records = records.get(header["DATE"], [])
+        # Day documents that were never split keep their own WORKER_LIST
+        for worker in header.get("WORKER_LIST", []):
+            day_records.append({**worker, "DATE": header["DATE"]})
+        days[header["DATE"]] = (header, day_records)
+    return headers
+
+
+# Archive one closed month, returns the number of days archived
+def archive_month(db, month):
+    if month >= current_month():
+        raise ValueError("Only closed months can be archived.")
+    query = month_query(month)
+    days = {}
+    claim = {"MONTH": month, "STATE": PENDING}
+    if not _claim_month(db, month):
+        if db["Daily_Attendance"].find_one(query, {"_id": 1}) is None:
+            raise ValueError(f"{month} is already archived.")
+        # Interrupted after the archive was written: the days still live were
+        # not deleted yet, or rewritten since
+        days = _archived_days(db["Attendance_Archive"].find_one({"MONTH": month}))
+        claim = {"MONTH": month, **COMPLETE_QUERY}
+
+    while True:
+        headers = _read_live_days(db, query, days)
+        if not headers:
+            break
+        dates = sorted(days)
+        document = pack_month(
+            month,
+            [days[date][0] for date in dates],
+            [record for date in dates for record in days[date][1]],
+        )
+        # Readers prefer the live documents while both exist
+        result = db["Attendance_Archive"].replace_one(
+            claim, {**document, "STATE": COMPLETE}
+        )
+        if result.matched_count == 0:
+            raise RuntimeError(f"The archive claim of {month} was lost, try again.")
+        claim = {"MONTH": month, **COMPLETE_QUERY}
+        with _lock:
+            _cache.pop(month, None)
+        for header in headers:
+            deleted = db["Daily_Attendance"].delete_one(
+                {"_id": header["_id"], "REVISION": header.get("REVISION")}
+            )
+            if deleted.deleted_count:
+                db["Worker_Attendance"].delete_many({"DATE": header["DATE"]})
+
+    if not days:
+        db["Attendance_Archive"].delete_one({"MONTH": month, "STATE": PENDING})
+    return len(days)
+
+
+# Months before the current one that still have live day sheets
+def closed_months(db):
+    months = db["Daily_Attendance"].aggregate(
+        [
+            {"$match": {"DATE": {"$lt": f"{current_month()}-01"}}},
+            {"$group": {"_id": {"$substrBytes": ["$DATE", 0, 7]}}},
+            {"$sort": {"_id": ASCENDING}},
+        ]
+    )
+    return [month["_id"] for month in months]
+
+
+class ArchivedMonth:
+    def __init__(self, document):
+        import numpy as np
+
+        self.month = document["MONTH"]
+        self.dates = document["DATES"]
+        self.day_index = {date: day for day, date in enumerate(self.dates)}
+        self.headers = document["HEADERS"]
+        self.worker_ids = document["WORKER_IDS"]
+        self.worker_index = {
+            worker_id: worker for worker, worker_id in enumerate(self.worker_ids)
+        }
+        self.workers = document["WORKERS"]
+        self.codes = document["CODES"]
+        self.matrix = np.frombuffer(document["STATUS"], dtype=np.int8).reshape(
+            len(self.worker_ids), len(self.dates)
+        )
+        self.extras = {
+            (worker, day): changed for worker, day, changed in document["EXTRAS"]
+        }
+
+    def status_mask(self, status):
+        import numpy as np
+
+        if status not in self.codes:
+            return np.zeros(self.matrix.shape, dtype=bool)
+        return self.matrix == self.codes.index(status)
+
+    def _record(self, worker, day):
+        return {
+            "WORKER_ID": self.worker_ids[worker],
+            **self.workers[worker],
+            **self.extras.get((worker, day), {}),
+            "STATUS": self.codes[self.matrix[worker, day]],
+        }
+
+    # Worker records of a day with the given status, or all of them
+    def records(self, date, status=None):
+        import numpy as np
+
+        day = self.day_index[date]
+        if status is None:
+            workers = np.flatnonzero(self.matrix[:, day] != NO_RECORD)
+        else:
+            workers = np.flatnonzero(self.status_mask(status)[:, day])
+        return [self._record(worker, day) for worker in workers]
+
+    def header(self, date):
+        day = self.day_index.get(date)
+        if day is None:
+            return None
+        return {"DATE": date, **self.headers[day], "ARCHIVED": True}
+
+    def day_view(self, date):
+        entry = self.header(date)
+        if entry is not None:
+            entry["WORKER_LIST"] = self.records(date)
+        return entry
+
+    def dates_between(self, date_from=None, date_to=None, after=None):
+        return [
+            date
+            for date in self.dates
+            if (not date_from or date >= date_from)
+            and (not date_to or date <= date_to)
+            and (not after or date > after)
+        ]
+
+    def worker_series(self, WORKER_ID, date_from=None, date_to=None):
+        worker = self.worker_index.get(WORKER_ID)
+        if worker is None:
+            return {}
+        codes = self.matrix[worker]
+        return {
+            date: self.codes[codes[self.day_index[date]]]
+            for date in self.dates_between(date_from, date_to)
+            if codes[self.day_index[date]] != NO_RECORD
+        }
+
+    # Worker-days of the signed days per client, shaped like the invoice totals;
+    # skip_dates are billed elsewhere
+    def client_totals(self, skip_dates=()):
+        totals = {}
+        for date, header in zip(self.dates, self.headers):
+            if not header["CLIENT_ID"] or date in skip_dates:
+                continue
+            total = totals.setdefault(
+                header["CLIENT_ID"],
+                {"_id": header["CLIENT_ID"], "WORKER_DAYS": 0, "DAYS": []},
+            )
+            total["WORKER_DAYS"] += header["PRESENT"]
+            total["DAYS"].append({"DATE": date, "PRESENT": header["PRESENT"]})
+        return [totals[client_id] for client_id in sorted(totals)]
+
+    def worker_rollups(self):
+        present = self.status_mask("PRESENT").sum(axis=1)
+        absent = self.status_mask("ABSENT").sum(axis=1)
+        return [
+            {
+                "WORKER_ID": worker_id,
+                "MONTH": self.month,
+                "PRESENT": int(p),
+                "ABSENT": int(a),
+            }
+            for worker_id, p, a in zip(self.worker_ids, present, absent)
+        ]
+
+    def client_rollups(self):
+        rollups = {}
+        for header in self.headers:
+            if not header["CLIENT_ID"]:
+                continue
+            rollup = rollups.setdefault(
+                header["CLIENT_ID"],
+                {
+                    "CLIENT_ID": header["CLIENT_ID"],
+                    "MONTH": self.month,
+                    "PRESENT": 0,
+                    "ABSENT": 0,
+                    "DAYS": 0,
+                },
+            )
+            rollup["PRESENT"] += header["PRESENT"]
+            rollup["ABSENT"] += header["ABSENT"]
+            rollup["DAYS"] += 1
+        return list(rollups.values())
+
+
+def get_archived_month(db, month):
+    with _lock:
+        archived = _cache.get(month)
+        if archived is not None:
+            _cache.move_to_end(month)
+            return archived
+    document = db["Attendance_Archive"].find_one({"MONTH": month, **COMPLETE_QUERY})
+    if document is None:
+        return None
+    archived = ArchivedMonth(document)
+    with _lock:
+        _cache[month] = archived
+        _cache.move_to_end(month)
+        while len(_cache) > ARCHIVE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return archived
+
+
+# Whether attendance writes to the month of a date are refused: the month is
+# archived or being archived
+def is_archived(db, date):
+    with _lock:
+        if date[:7] in _cache:
+            return True
+    return (
+        db["Attendance_Archive"].find_one({"MONTH": date[:7]}, {"_id": 1}) is not None
+    )
+
+
+# Archived months overlapping a date range, in MONTH order
+def iter_archived_months(db, date_from=None, date_to=None):
+    month_range = {}
+    if date_from:
+        month_range["$gte"] = date_from[:7]
+    if date_to:
+        month_range["$lte"] = date_to[:7]
+    query = {"MONTH": month_range} if month_range else {}
+    months = (
+        db["Attendance_Archive"]
+        .find({**query, **COMPLETE_QUERY}, {"_id": 0, "MONTH": 1})
+        .sort("MONTH", ASCENDING)
+    )
+    for month in [month["MONTH"] for month in months]:
+        archived = get_archived_month(db, month)
+        if archived is not None:
+            yield archived
+
+
+def _longest_runs(mask):
+    import numpy as np
+
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    longest = np.zeros(mask.shape[0], dtype=np.int64)
+    np.maximum.at(longest, rows, ends - starts)
+    return longest
+
+
+# Present/absent days, absence rate and longest streaks per worker over the
+# archived months, computed on the (workers x days) matrices of all of them
+def summarize_archived_months(months, WORKER_ID=None):
+    import numpy as np
+
+    worker_ids = sorted(
+        {worker_id for month in months for worker_id in month.worker_ids}
+    )
+    if WORKER_ID is not None:
+        worker_ids = [worker_id for worker_id in worker_ids if worker_id == WORKER_ID]
+    worker_index = {worker_id: worker for worker, worker_id in enumerate(worker_ids)}
+    days = sum(len(month.dates) for month in months)
+    present = np.zeros((len(worker_ids), days), dtype=bool)
+    absent = np.zeros((len(worker_ids), days), dtype=bool)
+    offset = 0
+    for month in months:
+        source = [
+            worker
+            for worker, worker_id in enumerate(month.worker_ids)
+            if worker_id in worker_index
+        ]
+        target = [worker_index[month.worker_ids[worker]] for worker in source]
+        columns = slice(offset, offset + len(month.dates))
+        present[target, columns] = month.status_mask("PRESENT")[source]
+        absent[target, columns] = month.status_mask("ABSENT")[source]
+        offset += len(month.dates)
+
+    present_days = present.sum(axis=1)
+    absent_days = absent.sum(axis=1)
+    marked = present_days + absent_days
+    absence_rate = np.divide(
+        absent_days, marked, out=np.zeros(len(worker_ids)), where=marked > 0
+    )
+    present_streak = _longest_runs(present)
+    absent_streak = _longest_runs(absent)
+    return {
+        worker_id: {
+            "PRESENT": int(present_days[worker]),
+            "ABSENT": int(absent_days[worker]),
+            "ABSENCE_RATE": round(float(absence_rate[worker]), 4),
+            "LONGEST_PRESENT_STREAK": int(present_streak[worker]),
+            "LONGEST_ABSENT_STREAK": int(absent_streak[worker]),
+        }
+        for worker, worker_id in enumerate(worker_ids)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive closed attendance months.")
+    parser.add_argument("--month", help="YYYY-MM, defaults to every closed month")
+    args = parser.parse_args()
+
+    if args.month is not None and not MONTH_PATTERN.match(args.month):
+        parser.error("--month must be in YYYY-MM format")
+
+    load_dotenv()
+    try:
+        db = get_db()
+        for month in [args.month] if args.month else closed_months(db):
+            try:
+                print(f"{month}: {archive_month(db, month)} days archived")
+            except (ValueError, RuntimeError) as e:
+                print(f"{month}: {e}")
+    finally:
+        close_connection()
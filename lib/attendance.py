@@ -0,0 +1,44 @@
+# attendance.py
+# Keys shared by the attendance modules (lib.db, lib.rollups, lib.archive,
+# lib.invoices): YYYY-MM months, DATE range filters and field values.
+# DATEs are YYYY-MM-DD strings, so ranges compare them as strings.
+import re
+
+MONTH_PATTERN = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+
+# First DATE of a month and first DATE of the next one
+def month_range(month):
+    year, number = int(month[:4]), int(month[5:7])
+    if number == 12:
+        return f"{month}-01", f"{year + 1}-01-01"
+    return f"{month}-01", f"{year}-{number + 1:02d}-01"
+
+
+# Query on the DATEs of a month, {} (every DATE) when month is None
+def month_query(month):
+    if month is None:
+        return {}
+    start, end = month_range(month)
+    return {"DATE": {"$gte": start, "$lt": end}}
+
+
+# Query on the DATEs between date_from and date_to (inclusive) and after a
+# DATE cursor, each optional; {} when none is given
+def date_query(date_from=None, date_to=None, after=None):
+    date_filter = {}
+    if date_from:
+        date_filter["$gte"] = date_from
+    if date_to:
+        date_filter["$lte"] = date_to
+    if after:
+        date_filter["$gt"] = after
+    return {"DATE": date_filter} if date_filter else {}
+
+
+# Value of a field stored either as a schema field ({"DESCRIPTION", "VALUE"})
+# or plainly, e.g. a worker's STATUS; default when it has none
+def plain_value(value, default=None):
+    if isinstance(value, dict):
+        value = value.get("VALUE")
+    return default if value is None else value
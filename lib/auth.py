@@ -1,6 +1,7 @@
 # auth.py
 from flask import Blueprint, request, jsonify
 from lib.db import create_user, login_user
+from lib.tokens import TOKEN_TTL_SECONDS, bearer_token, issue_token, revoke_token
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -30,6 +31,18 @@ def login():
 
     result = login_user(username, password)
     if result["message"] == "Login successful.":
+        result["TOKEN"] = issue_token(username)
+        result["EXPIRES_IN"] = TOKEN_TTL_SECONDS
         return jsonify(result)
     else:
         return jsonify(result), 401
+
+
+@auth_bp.route("/logout", methods=["POST"])
+def logout():
+    token = bearer_token()
+
+    if token is None or not revoke_token(token):
+        return jsonify({"message": "Invalid or expired token."}), 401
+
+    return jsonify({"message": "Logout successful."})
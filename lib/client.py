@@ -1,13 +1,22 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from lib.db import (
     create_customer,
     get_all_customers,
+    get_client_attendance_entries,
     update_customer_data,
     save_new_customer_data,
-    update_client_attendance_entry
+    update_client_attendance_entry,
 )
+from lib.attendance import MONTH_PATTERN
+from lib.customer_import import import_customers, upload_stream
+from lib.http_cache import versioned_json
+from lib.invoices import generate_invoices, get_invoices, iter_invoice_archive
+from lib.reports import REPORT_FORMATS
+from lib.rollups import get_client_summary
+from lib.tokens import require_token
 
 client_bp = Blueprint("client", __name__)
+client_bp.before_request(require_token)
 
 
 @client_bp.route("/", methods=["GET"])
@@ -22,8 +31,7 @@ def create_new_customer():
     )
 
 
-@client_bp.route("/all", methods=["GET"])
-def get_all_customers_data():
+def _all_customers_payload():
     list = get_all_customers()
 
     customers = {}
@@ -31,9 +39,16 @@ def get_all_customers_data():
     for customer in list:
         customers[customer["CUSTOMER_DATA"]["NAME"]["VALUE"]] = customer
 
-    return jsonify(
-        {"MESSAGE": "All customers retrieved successfully.", "CUSTOMER_DATA": customers}
-    )
+    return {
+        "MESSAGE": "All customers retrieved successfully.",
+        "CUSTOMER_DATA": customers,
+    }
+
+
+# Answers If-None-Match with 304 while the Customers version is unchanged
+@client_bp.route("/all", methods=["GET"])
+def get_all_customers_data():
+    return versioned_json("Customers", _all_customers_payload)
 
 
 @client_bp.route("/save", methods=["POST"])
@@ -47,6 +62,19 @@ def save_customer_data():
         return jsonify(response), 400
 
 
+# Bulk import from a CSV or NDJSON upload (multipart FILE field or raw body).
+# FORMAT=csv|ndjson, otherwise taken from the file extension or content type.
+@client_bp.route("/import", methods=["POST"])
+def import_customer_data():
+    stream, input_format = upload_stream(request)
+
+    if input_format not in ("csv", "ndjson"):
+        return jsonify({"MESSAGE": "FORMAT MUST BE CSV OR NDJSON."}), 400
+
+    response = import_customers(stream, input_format)
+    return jsonify(response), 200
+
+
 @client_bp.route("/update", methods=["PATCH"])
 def update_customer():
     data = request.json
@@ -66,6 +94,7 @@ def update_customer():
     else:
         return jsonify(message), 400
 
+
 @client_bp.route("/bill", methods=["POST"])
 def update_customer_billing_data():
     data = request.json
@@ -79,10 +108,104 @@ def update_customer_billing_data():
         return jsonify({"message": "CLIENT_ID is required."}), 400
     if ATTENDANCE_DATA is None:
         return jsonify({"message": "ATTENDANCE_DATA is required."}), 400
-    
+
     message = update_client_attendance_entry(DATE, CLIENT_ID, ATTENDANCE_DATA)
 
     if message == "Client Attendance Entry Updated Successfully":
         return jsonify({"MESSAGE": message}), 200
     else:
-        return jsonify({"MESSAGE": message}), 400
\ No newline at end of file
+        return jsonify({"MESSAGE": message}), 400
+
+
+# Billing attendance of a client keyed by DATE, optionally between FROM and TO
+@client_bp.route("/bill", methods=["GET"])
+def get_customer_billing_data():
+    CLIENT_ID = request.args.get("CLIENT_ID")
+
+    if CLIENT_ID is None:
+        return jsonify({"message": "CLIENT_ID is required."}), 400
+
+    ATTENDANCE_DATA = get_client_attendance_entries(
+        CLIENT_ID, request.args.get("FROM"), request.args.get("TO")
+    )
+
+    if ATTENDANCE_DATA is None:
+        return jsonify({"MESSAGE": "Customer not found."}), 404
+    return (
+        jsonify(
+            {
+                "MESSAGE": "Client attendance retrieved successfully.",
+                "ATTENDANCE_DATA": ATTENDANCE_DATA,
+            }
+        ),
+        200,
+    )
+
+
+# Generate (or regenerate) the invoices of MONTH from the signed attendance days
+@client_bp.route("/invoices", methods=["POST"])
+def generate_monthly_invoices():
+    data = request.json
+    MONTH = data.get("MONTH")
+
+    if MONTH is None:
+        return jsonify({"message": "MONTH is required."}), 400
+    if not MONTH_PATTERN.match(MONTH):
+        return jsonify({"message": "MONTH must be in YYYY-MM format."}), 400
+
+    INVOICES = generate_invoices(MONTH)
+    return (
+        jsonify(
+            {
+                "MESSAGE": "Invoices generated successfully.",
+                "INVOICES": INVOICES,
+            }
+        ),
+        200,
+    )
+
+
+# Stored invoices of MONTH streamed as one ZIP, FORMAT is pdf (default) or csv
+@client_bp.route("/invoices", methods=["GET"])
+def download_monthly_invoices():
+    MONTH = request.args.get("MONTH")
+    output_format = request.args.get("FORMAT", "pdf").lower()
+
+    if MONTH is None:
+        return jsonify({"message": "MONTH is required."}), 400
+    if not MONTH_PATTERN.match(MONTH):
+        return jsonify({"message": "MONTH must be in YYYY-MM format."}), 400
+    if output_format not in REPORT_FORMATS:
+        return jsonify({"message": "FORMAT must be csv or pdf."}), 400
+
+    INVOICES = get_invoices(MONTH)
+    if not INVOICES:
+        return jsonify({"MESSAGE": "No invoices generated for this month."}), 404
+
+    name = f"invoices_{MONTH}"
+    return Response(
+        iter_invoice_archive(INVOICES, output_format),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={name}.zip"},
+    )
+
+
+# Monthly worker-days and signed days per client for the months FROM..TO
+# (YYYY-MM), read from the rollups only. CLIENT_ID narrows it down to one client.
+@client_bp.route("/summary", methods=["GET"])
+def get_customer_summary():
+    month_from = request.args.get("FROM")
+    month_to = request.args.get("TO")
+
+    if month_from is None or month_to is None:
+        return jsonify({"message": "FROM and TO are required."}), 400
+    if not MONTH_PATTERN.match(month_from) or not MONTH_PATTERN.match(month_to):
+        return jsonify({"message": "MONTH must be in YYYY-MM format."}), 400
+
+    SUMMARY = get_client_summary(month_from, month_to, request.args.get("CLIENT_ID"))
+    return (
+        jsonify(
+            {"MESSAGE": "Client summary retrieved successfully.", "SUMMARY": SUMMARY}
+        ),
+        200,
+    )
@@ -0,0 +1,83 @@
+# connection.py
+# MongoDB connection manager. The client is created lazily in the process that
+# first uses it, so gunicorn workers never share a client created before fork.
+# The URI, pool, timeout and server-selection settings are read from the
+# environment when the client is created, after the entry point loaded .env.
+import os
+import threading
+import time
+
+import pymongo
+from pymongo import MongoClient, errors
+
+# environment variable -> MongoClient option
+CLIENT_OPTIONS = {
+    "MONGO_MAX_POOL_SIZE": "maxPoolSize",
+    "MONGO_MIN_POOL_SIZE": "minPoolSize",
+    "MONGO_MAX_IDLE_TIME_MS": "maxIdleTimeMS",
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": "waitQueueTimeoutMS",
+    "MONGO_CONNECT_TIMEOUT_MS": "connectTimeoutMS",
+    "MONGO_SOCKET_TIMEOUT_MS": "socketTimeoutMS",
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": "serverSelectionTimeoutMS",
+}
+
+HEALTH_CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", "10"))
+HEALTH_TIMEOUT_SECONDS = float(os.getenv("HEALTH_TIMEOUT_SECONDS", "2"))
+
+_lock = threading.Lock()
+_client = None
+_client_pid = None
+
+_health = {"OK": None, "ERROR": None, "CHECKED_AT": 0.0}
+
+
+def client_options():
+    options = {}
+    for variable, option in CLIENT_OPTIONS.items():
+        value = os.getenv(variable)
+        if value:
+            options[option] = int(value)
+    return options
+
+
+def get_client():
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _lock:
+            if _client is None or _client_pid != pid:
+                # A client inherited through fork is dropped, not closed: its
+                # sockets belong to the parent process
+                _client = MongoClient(os.getenv("MONGO_URI"), **client_options())
+                _client_pid = pid
+                print(f"Created MongoDB client for process {pid}.")
+    return _client
+
+
+def get_db():
+    return get_client()[os.getenv("MONGO_DB_NAME", "Attendance_DB")]
+
+
+def close_connection():
+    global _client
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+            print("MongoDB connection closed.")
+        _client = None
+
+
+# Readiness of the database, checked with a ping at most every HEALTH_CACHE_SECONDS
+def check_health():
+    now = time.monotonic()
+    if _health["OK"] is not None and now - _health["CHECKED_AT"] < HEALTH_CACHE_SECONDS:
+        return dict(_health)
+    try:
+        with pymongo.timeout(HEALTH_TIMEOUT_SECONDS):
+            get_client().admin.command("ping")
+        _health.update(OK=True, ERROR=None)
+    except errors.PyMongoError as e:
+        print(f"MongoDB health check failed: {e}")
+        _health.update(OK=False, ERROR=str(e))
+    _health["CHECKED_AT"] = time.monotonic()
+    return dict(_health)
@@ -0,0 +1,147 @@
+# customer_import.py
+# Bulk customer import from a CSV (columns named after the VARIABLE NAMEs of
+# schema/Attendance Schema - Client.csv) or NDJSON upload. Rows are validated
+# in-process and inserted in unordered batches; every row gets a result.
+import csv
+import io
+import json
+import os
+
+from pymongo.errors import BulkWriteError
+
+from lib.connection import get_db
+from lib.db import customer_duplicate_message, validate_customer_fields
+from lib.schema_templates import new_client_form
+from lib.versions import bump_version
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+
+
+def _iter_csv(stream):
+    for row in csv.DictReader(stream):
+        yield {
+            field.strip(): (value or "").strip()
+            for field, value in row.items()
+            if field
+        }
+
+
+# NDJSON lines are independent: a malformed one is yielded as its ValueError
+# and the following lines are still imported
+def _iter_ndjson(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield e
+
+
+# Customer document from a flat row ({"NAME": ...}) or a filled form
+# ({"CUSTOMER_DATA": {"NAME": {"VALUE": ...}}}), None if the row is malformed
+def build_customer(row):
+    customer = new_client_form()
+    fields = customer["CUSTOMER_DATA"]
+    values = row.get("CUSTOMER_DATA", row) if isinstance(row, dict) else None
+    if not isinstance(values, dict):
+        return None
+    for field, value in values.items():
+        if isinstance(value, dict):
+            value = value.get("VALUE", "")
+        if field in fields:
+            fields[field]["VALUE"] = value
+    return customer
+
+
+def _insert_batch(db, batch, results):
+    failures = {}
+    try:
+        db["Customers"].insert_many([customer for _, customer in batch], ordered=False)
+    except BulkWriteError as bwe:
+        failures = {error["index"]: error for error in bwe.details["writeErrors"]}
+    for index, (row_number, customer) in enumerate(batch):
+        if index in failures:
+            error = failures[index]
+            message = (
+                customer_duplicate_message(error)
+                if error["code"] == 11000
+                else error["errmsg"]
+            )
+            results.append({"ROW": row_number, "MESSAGE": message})
+        else:
+            results.append(
+                {
+                    "ROW": row_number,
+                    "MESSAGE": "CUSTOMER DATA SAVED SUCCESSFULLY.",
+                    "_id": customer["_id"],
+                }
+            )
+
+
+def import_customers(stream, input_format):
+    db = get_db()
+    rows = _iter_ndjson(stream) if input_format == "ndjson" else _iter_csv(stream)
+    results = []
+    batch = []
+    row_number = 0
+    while True:
+        try:
+            row = next(rows)
+        except StopIteration:
+            break
+        except (ValueError, csv.Error) as e:
+            # A malformed CSV row or undecodable upload ends the stream
+            row_number += 1
+            results.append({"ROW": row_number, "MESSAGE": f"INVALID ROW: {e}"})
+            break
+        row_number += 1
+        if isinstance(row, ValueError):
+            results.append({"ROW": row_number, "MESSAGE": f"INVALID ROW: {row}"})
+            continue
+        customer = build_customer(row)
+        if customer is None:
+            results.append({"ROW": row_number, "MESSAGE": "INVALID ROW."})
+            continue
+        message = validate_customer_fields(customer["CUSTOMER_DATA"])
+        if message is not None:
+            results.append({"ROW": row_number, "MESSAGE": message})
+            continue
+        batch.append((row_number, customer))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            _insert_batch(db, batch, results)
+            batch = []
+    if batch:
+        _insert_batch(db, batch, results)
+
+    results.sort(key=lambda result: result["ROW"])
+    imported = sum(1 for result in results if "_id" in result)
+    if imported:
+        bump_version(db, "Customers")
+    return {
+        "MESSAGE": "CUSTOMER IMPORT COMPLETED.",
+        "IMPORTED": imported,
+        "FAILED": len(results) - imported,
+        "RESULTS": results,
+    }
+
+
+# Text stream and format of an upload: a multipart FILE field or the raw body
+def upload_stream(request):
+    upload = request.files.get("FILE")
+    input_format = request.args.get("FORMAT")
+    if upload is not None:
+        binary = upload.stream
+        filename = upload.filename or ""
+    else:
+        binary = request.stream
+        filename = ""
+    if input_format is None:
+        is_ndjson = filename.endswith((".ndjson", ".jsonl")) or "ndjson" in (
+            request.content_type or ""
+        )
+        input_format = "ndjson" if is_ndjson else "csv"
+    return (
+        io.TextIOWrapper(binary, encoding="utf-8-sig", newline=""),
+        input_format.lower(),
+    )
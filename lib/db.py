@@ -1,45 +1,75 @@
 # lib/db.py
 from datetime import datetime, timedelta
-from pymongo import MongoClient, errors
-from dotenv import load_dotenv
-import pandas as pd
+from bson import ObjectId
+from pymongo import errors, ASCENDING, ReplaceOne, DeleteOne, UpdateOne
 
 import os
-import atexit
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Get MongoDB URI from environment variables
-MONGO_URI = os.getenv("MONGO_URI")
-
-# Initialize MongoDB client and database
-client = None
-db = None
-
-try:
-
-    client = MongoClient(MONGO_URI)
-    db = client["Attendance_DB"]
-    print("Successfully connected to MongoDB.")
-except errors.ConnectionError as e:
-    print(f"Failed to connect to MongoDB: {e}")
-
-
-def get_db():
-    return db
-
-
-def close_connection():
-    if client:
-        client.close()
-        print("MongoDB connection closed.")
-
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from heapq import merge
+from itertools import groupby, islice
+
+from lib.archive import get_archived_month, is_archived, iter_archived_months
+from lib.attendance import date_query, plain_value
+from lib.connection import check_health, get_db
+from lib.roster import get_roster
+from lib.rollups import apply_attendance_changes
+from lib.schema_templates import new_client_form
+from lib.validators import validate_client_fields
+from lib.versions import bump_version
+
+
+# Fields covered by the unique indexes declared in lib/indexes.py
+DUPLICATE_KEY_FIELDS = (
+    "CUSTOMER_DATA.EMAIL.VALUE",
+    "CUSTOMER_DATA.MOBILE.VALUE",
+    "CUSTOMER_DATA.NAME.VALUE",
+    "username",
+    "email",
+)
+
+
+# Field of the unique index that rejected a write, from the details of a
+# DuplicateKeyError or a bulk write error
+def _duplicate_key_field(details):
+    key_pattern = details.get("keyPattern")
+    if key_pattern:
+        return next(iter(key_pattern))
+    message = details.get("errmsg", "")
+    for field in DUPLICATE_KEY_FIELDS:
+        if field in message or field.replace(".", "_") in message:
+            return field
+    return None
+
+
+# bcrypt runs on a bounded pool of HASH_THREADS threads, so a burst of logins
+# queues up instead of occupying every request thread. bcrypt releases the GIL.
+HASH_THREADS = int(os.getenv("HASH_THREADS", "4"))
+
+_hash_pool = None
+_hash_pool_pid = None
+
+
+def _run_in_hash_pool(function, *args):
+    global _hash_pool, _hash_pool_pid
+    if "gevent" in sys.modules:
+        from gevent import monkey, get_hub
+
+        # Patched threads are greenlets, use gevent's pool of real threads
+        if monkey.is_module_patched("threading"):
+            return get_hub().threadpool.apply(function, args)
+    if _hash_pool is None or _hash_pool_pid != os.getpid():
+        _hash_pool = ThreadPoolExecutor(
+            max_workers=HASH_THREADS, thread_name_prefix="bcrypt"
+        )
+        _hash_pool_pid = os.getpid()
+    return _hash_pool.submit(function, *args).result()
 
-import bcrypt
 
+def _hash_password(password):
+    # bcrypt is only needed on the auth routes, imported on first use
+    import bcrypt
 
-def hash_password(password):
     # Generate a salt
     salt = bcrypt.gensalt()
     # Hash the password
@@ -47,30 +77,46 @@ def hash_password(password):
     return hashed_password
 
 
+def hash_password(password):
+    return _run_in_hash_pool(_hash_password, password)
+
+
+USER_DUPLICATE_MESSAGES = {
+    "username": "User already exists.",
+    "email": "Email already in use.",
+}
+
+
 def create_user(username, email, password):
     db = get_db()
-    # Check if the user already exists
-    if db["Users"].find_one({"username": username}):
-        return {"message": "User already exists."}
-    # Check if the email is already in use
-    if db["Users"].find_one({"email ": email}):
-        return {"message": "Email already in use."}
-
     # Hash the password
     hashed_password = hash_password(password)
 
     # Create the user document
     user = {"username": username, "email": email, "password": hashed_password}
 
-    # Insert the user into the database
-    db["Users"].insert_one(user)
+    # Insert the user into the database, unique indexes reject existing users
+    try:
+        db["Users"].insert_one(user)
+    except errors.DuplicateKeyError as e:
+        return {
+            "message": USER_DUPLICATE_MESSAGES.get(
+                _duplicate_key_field(e.details or {}), "User already exists."
+            )
+        }
     return {"message": "User created successfully."}
 
 
-def verify_password(stored_password, provided_password):
+def _verify_password(stored_password, provided_password):
+    import bcrypt
+
     return bcrypt.checkpw(provided_password.encode("utf-8"), stored_password)
 
 
+def verify_password(stored_password, provided_password):
+    return _run_in_hash_pool(_verify_password, stored_password, provided_password)
+
+
 def login_user(username, password):
     db = get_db()
     user = db["Users"].find_one({"username": username})
@@ -105,6 +151,96 @@ def create_Worker_Schema():
     return worker_schema
 
 
+# Attendance is stored as one Worker_Attendance record per (DATE, WORKER_ID).
+# Daily_Attendance only keeps the day header (DATE, CLIENT_ID, SIGNED_BY and the
+# PRESENT/ABSENT counters); the WORKER_LIST day view is reassembled on read.
+
+
+# Query matching a STATUS stored either plainly or as a schema field
+def _status_query(status):
+    return {"$or": [{"STATUS": status}, {"STATUS.VALUE": status}]}
+
+
+def _attendance_row(date, worker):
+    row = {key: value for key, value in worker.items() if key != "_id"}
+    row["DATE"] = date
+    return row
+
+
+def get_attendance_rows(date):
+    db = get_db()
+    return list(
+        db["Worker_Attendance"]
+        .find({"DATE": date}, {"_id": 0, "DATE": 0})
+        .sort([("DATE", ASCENDING), ("WORKER_ID", ASCENDING)])
+    )
+
+
+# Split a day document written before per-worker records into Worker_Attendance rows
+def _migrate_legacy_worker_list(entry):
+    worker_list = entry.pop("WORKER_LIST", None)
+    if worker_list is None:
+        return
+    db = get_db()
+    rows = [
+        _attendance_row(entry["DATE"], worker)
+        for worker in worker_list
+        if worker.get("WORKER_ID")
+    ]
+    if rows:
+        try:
+            db["Worker_Attendance"].insert_many(rows, ordered=False)
+        except errors.BulkWriteError as bwe:
+            # Duplicates are rows already split by a concurrent request, any
+            # other error leaves WORKER_LIST in place for the next attempt
+            details = bwe.details
+            if details.get("writeConcernErrors") or any(
+                error["code"] != 11000 for error in details["writeErrors"]
+            ):
+                raise
+    update = {"$unset": {"WORKER_LIST": ""}}
+    # Workers without a WORKER_ID can not become records, they are kept aside
+    # on the day document instead of being dropped
+    unmigrated = [worker for worker in worker_list if not worker.get("WORKER_ID")]
+    if unmigrated:
+        update["$set"] = {"UNMIGRATED_WORKER_LIST": unmigrated}
+    db["Daily_Attendance"].update_one({"_id": entry["_id"]}, update)
+    print(f"Migrated legacy WORKER_LIST for {entry['DATE']}.")
+
+
+# Split every day document still holding a WORKER_LIST, optionally only for
+# DATEs between date_from and date_to. Returns the number of days migrated.
+def migrate_legacy_attendance(date_from=None, date_to=None):
+    db = get_db()
+    query = {"WORKER_LIST": {"$exists": True}, **date_query(date_from, date_to)}
+    migrated = 0
+    for entry in (
+        db["Daily_Attendance"].find(query).sort("DATE", ASCENDING).batch_size(100)
+    ):
+        _migrate_legacy_worker_list(entry)
+        migrated += 1
+    return migrated
+
+
+# Reassemble the day document (header + WORKER_LIST) returned by the API
+def _day_view(entry, worker_list=None):
+    _migrate_legacy_worker_list(entry)
+    if worker_list is None:
+        worker_list = get_attendance_rows(entry["DATE"])
+    entry["WORKER_LIST"] = worker_list
+    return entry
+
+
+# Get the attendance day view of a date, None if the day sheet does not exist
+def get_attendance_day(date):
+    db = get_db()
+    entry = db["Daily_Attendance"].find_one({"DATE": date})
+    if entry is None:
+        archived = get_archived_month(db, date[:7])
+        return archived.day_view(date) if archived is not None else None
+    return _day_view(entry)
+
+
 # Create a new Attendance Entry
 def create_Attendance_Entry(date=None):
     print(f"Creating Attendance Entry at {date}")
@@ -125,152 +261,595 @@ def create_Attendance_Entry(date=None):
 
     if entry is not None:
         print("Attendance entry already exists.")
-        entry["_id"] = str(entry["_id"])
-        return entry
+        return _day_view(entry)
     elif entry is None:
         print("Attendance entry does not exist.")
-        workers = create_Worker_Schema()
+        if is_archived(db, date_info):
+            # Archived months are read-only, no day sheets are added to them
+            archived = get_archived_month(db, date_info[:7])
+            return archived.day_view(date_info) if archived is not None else None
+        workers = get_roster(db, create_Worker_Schema)
+        # Worker records are seeded before the day header, so a request that
+        # sees the header always sees the complete WORKER_LIST. Concurrent
+        # creators insert the same (DATE, WORKER_ID) records; the unique index
+        # keeps one of each.
+        if workers:
+            try:
+                db["Worker_Attendance"].insert_many(
+                    [_attendance_row(date_info, worker) for worker in workers],
+                    ordered=False,
+                )
+            except errors.BulkWriteError as e:
+                if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                    raise
         attendance = {
-            "DATE": date_info,
-            "WORKER_LIST": workers,
             "CLIENT_ID": "",
             "SIGNED_BY": "",
+            "PRESENT": 0,
+            "ABSENT": 0,
+            "REVISION": 0,
         }
-        result = db["Daily_Attendance"].insert_one(attendance)
+        # Upsert on the unique DATE index: exactly one day header per date
+        result = db["Daily_Attendance"].update_one(
+            {"DATE": date_info}, {"$setOnInsert": attendance}, upsert=True
+        )
+        if result.upserted_id is None:
+            print("Attendance entry created by a concurrent request.")
+            return get_attendance_day(date_info)
+        # The month was claimed for archiving after the check above
+        if is_archived(db, date_info):
+            deleted = db["Daily_Attendance"].delete_one(
+                {"_id": result.upserted_id, "REVISION": 0}
+            )
+            if deleted.deleted_count:
+                db["Worker_Attendance"].delete_many({"DATE": date_info})
+            archived = get_archived_month(db, date_info[:7])
+            return archived.day_view(date_info) if archived is not None else None
         print("Attendance entry created successfully.")
-        new_entry = db["Daily_Attendance"].find_one({"_id": result.inserted_id})
-        new_entry["_id"] = str(new_entry["_id"])
-        return new_entry
+        attendance["_id"] = result.upserted_id
+        attendance["DATE"] = date_info
+        return _day_view(attendance, workers)
+
+
+# Billing attendance lives in Client_Attendance, one document per
+# (CLIENT_ID, DATE), instead of a date map growing inside each customer.
+
+
+# Move a customer's legacy ATTENDANCE_DATA map into Client_Attendance
+def _migrate_legacy_billing(customer):
+    attendance_data = customer.get("ATTENDANCE_DATA")
+    if attendance_data is None:
+        return
+    db = get_db()
+    client_id = str(customer["_id"])
+    operations = [
+        UpdateOne(
+            {"CLIENT_ID": client_id, "DATE": date},
+            {"$setOnInsert": {"ATTENDANCE_DATA": data}},
+            upsert=True,
+        )
+        for date, data in attendance_data.items()
+    ]
+    if operations:
+        db["Client_Attendance"].bulk_write(operations, ordered=False)
+    db["Customers"].update_one(
+        {"_id": customer["_id"]}, {"$unset": {"ATTENDANCE_DATA": ""}}
+    )
+    print(f"Migrated legacy ATTENDANCE_DATA of customer {client_id}.")
+
 
+def _find_customer_for_billing(CLIENT_ID):
+    if not ObjectId.is_valid(CLIENT_ID):
+        return None
+    db = get_db()
+    customer = db["Customers"].find_one(
+        {"_id": ObjectId(CLIENT_ID)}, {"ATTENDANCE_DATA": 1}
+    )
+    if customer is not None:
+        _migrate_legacy_billing(customer)
+    return customer
 
 
 def update_client_attendance_entry(DATE, CLIENT_ID, ATTENDANCE_DATA):
     db = get_db()
+    entry = db["Daily_Attendance"].find_one({"DATE": DATE}, {"_id": 1})
+    if entry is None and get_attendance_revision(DATE) is None:
+        return "Attendance Entry does not exist."
+
+    if _find_customer_for_billing(CLIENT_ID) is None:
+        return "Customer not found."
+
+    # Update the customer's attendance data
+    db["Client_Attendance"].update_one(
+        {"CLIENT_ID": CLIENT_ID, "DATE": DATE},
+        {"$set": {"ATTENDANCE_DATA": ATTENDANCE_DATA}},
+        upsert=True,
+    )
+
+    return "Client Attendance Entry Updated Successfully"
+
+
+# Billing attendance of a customer keyed by DATE, optionally within a date range.
+# None if the customer does not exist.
+def get_client_attendance_entries(CLIENT_ID, date_from=None, date_to=None):
+    db = get_db()
+    if _find_customer_for_billing(CLIENT_ID) is None:
+        return None
+    query = {"CLIENT_ID": CLIENT_ID, **date_query(date_from, date_to)}
+    cursor = (
+        db["Client_Attendance"]
+        .find(query, {"_id": 0, "DATE": 1, "ATTENDANCE_DATA": 1})
+        .sort("DATE", ASCENDING)
+    )
+    return {entry["DATE"]: entry["ATTENDANCE_DATA"] for entry in cursor}
+
+
+# Update the Attendance Entry, writing only the worker records that changed
+def update_attendance_entry(DATE, WORKER_DATA, CLIENT_ID=None, SIGNED_BY=None):
+    db = get_db()
+    # Archived months, and months being archived, are read-only
+    if is_archived(db, DATE):
+        return "Attendance Entry is archived."
     entry = db["Daily_Attendance"].find_one({"DATE": DATE})
     if entry is None:
         return "Attendance Entry does not exist."
-    
-    # Update the customer's attendance data
-    result = db["Customers"].update_one(
-        {"_id": ObjectId(CLIENT_ID)},
-        {
-            "$set": {
-                f"ATTENDANCE_DATA.{DATE}": ATTENDANCE_DATA
-            }
-        }
+    _migrate_legacy_worker_list(entry)
+    # Workers without a WORKER_ID can not be stored, nor counted
+    if any(not data.get("WORKER_ID") for data in WORKER_DATA):
+        return "WORKER_ID is required for every worker."
+
+    stored = {row["WORKER_ID"]: row for row in get_attendance_rows(DATE)}
+    operations = []
+    transitions = []
+    # One record per WORKER_ID, the last one listed wins
+    workers = {data["WORKER_ID"]: data for data in WORKER_DATA}
+    statuses = {}
+    for worker_id, data in workers.items():
+        statuses[worker_id] = plain_value(data.get("STATUS"))
+        row = _attendance_row(DATE, data)
+        previous = stored.get(worker_id)
+        if previous is None or {**previous, "DATE": DATE} != row:
+            operations.append(
+                ReplaceOne({"DATE": DATE, "WORKER_ID": worker_id}, row, upsert=True)
+            )
+            transitions.append(
+                (worker_id, (previous or {}).get("STATUS"), data.get("STATUS"))
+            )
+    # Workers dropped from the list are removed, as the full list replaces the day
+    for worker_id in stored.keys() - statuses.keys():
+        operations.append(DeleteOne({"DATE": DATE, "WORKER_ID": worker_id}))
+        transitions.append((worker_id, stored[worker_id].get("STATUS"), None))
+
+    present = sum(status == "PRESENT" for status in statuses.values())
+    absent = sum(status == "ABSENT" for status in statuses.values())
+    header = _header_changes(entry, CLIENT_ID, SIGNED_BY)
+    if operations:
+        db["Worker_Attendance"].bulk_write(operations, ordered=False)
+    if (
+        operations
+        or header
+        or entry.get("PRESENT") != present
+        or entry.get("ABSENT") != absent
+    ):
+        # REVISION keys cached reports of this day
+        result = db["Daily_Attendance"].update_one(
+            {"DATE": DATE},
+            {
+                "$set": {
+                    "PRESENT": present,
+                    "ABSENT": absent,
+                    **header,
+                },
+                "$inc": {"REVISION": 1},
+            },
+        )
+        if result.matched_count == 0:
+            return _archived_under_write(DATE)
+        before = _day_counts(entry)
+        after = (header.get("CLIENT_ID", before[0]), present, absent)
+        apply_attendance_changes(db, DATE, transitions, before, after)
+    return "Attendance Entry Updated Successfully"
+
+
+# The day header was deleted by lib.archive while this write was in flight:
+# the archive holds the day as it was, records written after its cleanup are
+# dropped and the write is refused
+def _archived_under_write(DATE):
+    get_db()["Worker_Attendance"].delete_many({"DATE": DATE})
+    return "Attendance Entry is archived."
+
+
+# CLIENT_ID / SIGNED_BY of the day header that are being changed
+def _header_changes(entry, CLIENT_ID, SIGNED_BY):
+    header = {}
+    if CLIENT_ID is not None and entry.get("CLIENT_ID") != CLIENT_ID:
+        header["CLIENT_ID"] = CLIENT_ID
+    if SIGNED_BY is not None and entry.get("SIGNED_BY") != SIGNED_BY:
+        header["SIGNED_BY"] = SIGNED_BY
+    return header
+
+
+# (CLIENT_ID, PRESENT, ABSENT) of a day header, as kept in the rollups
+def _day_counts(entry):
+    return (
+        entry.get("CLIENT_ID") or "",
+        entry.get("PRESENT") or 0,
+        entry.get("ABSENT") or 0,
+    )
+
+
+# Recount the PRESENT/ABSENT counters of a day from its worker records,
+# returns the fields set on the day header, None if the header is gone
+def _recount_attendance(DATE, header=None):
+    db = get_db()
+    fields = dict(header or {})
+    for status in ("PRESENT", "ABSENT"):
+        fields[status] = db["Worker_Attendance"].count_documents(
+            {"DATE": DATE, **_status_query(status)}
+        )
+    result = db["Daily_Attendance"].update_one(
+        {"DATE": DATE}, {"$set": fields, "$inc": {"REVISION": 1}}
     )
-    
     if result.matched_count == 0:
-        return "Customer not found."
-    
-    return "Client Attendance Entry Updated Successfully"
+        return None
+    return fields
 
-# Update the Attendance Entry
-def update_attendance_entry(DATE, WORKER_DATA):
-    present = 0
-    absent = 0
+
+# Patch the Attendance Entry with only the changed worker statuses
+def patch_attendance_entry(DATE, WORKER_DATA, CLIENT_ID=None, SIGNED_BY=None):
     db = get_db()
+    # Archived months, and months being archived, are read-only
+    if is_archived(db, DATE):
+        return "Attendance Entry is archived."
     entry = db["Daily_Attendance"].find_one({"DATE": DATE})
     if entry is None:
         return "Attendance Entry does not exist."
+    _migrate_legacy_worker_list(entry)
+
+    changes = {}
     for data in WORKER_DATA:
-        if data["STATUS"] == "PRESENT":
-            present += 1
-        elif data["STATUS"] == "ABSENT":
-            absent += 1
-    db["Daily_Attendance"].update_one(
-        {"DATE": DATE},
-        {
-            "$set": {
-                "WORKER_LIST": WORKER_DATA,
-                "PRESENT": present,
-                "ABSENT": absent,
-            }
-        },
-    )
+        if not data.get("WORKER_ID"):
+            return "WORKER_ID is required for every worker."
+        changes[data["WORKER_ID"]] = data
+
+    previous = {
+        row["WORKER_ID"]: row.get("STATUS")
+        for row in db["Worker_Attendance"].find(
+            {"DATE": DATE, "WORKER_ID": {"$in": list(changes)}},
+            {"_id": 0, "WORKER_ID": 1, "STATUS": 1},
+        )
+    }
+    unknown = [worker_id for worker_id in changes if worker_id not in previous]
+    if unknown:
+        return f"Workers not found in the attendance entry: {', '.join(unknown)}"
+
+    operations = []
+    transitions = []
+    counters = {"PRESENT": 0, "ABSENT": 0}
+    for worker_id, data in changes.items():
+        fields = {
+            key: value
+            for key, value in data.items()
+            if key not in ("_id", "DATE", "WORKER_ID")
+        }
+        if not fields:
+            continue
+        # Only apply the change if the status was not modified concurrently
+        operations.append(
+            UpdateOne(
+                {"DATE": DATE, "WORKER_ID": worker_id, "STATUS": previous[worker_id]},
+                {"$set": fields},
+            )
+        )
+        if "STATUS" in fields:
+            transitions.append((worker_id, previous[worker_id], fields["STATUS"]))
+            old_status = plain_value(previous[worker_id])
+            new_status = plain_value(fields["STATUS"])
+            if old_status in counters:
+                counters[old_status] -= 1
+            if new_status in counters:
+                counters[new_status] += 1
+
+    header = _header_changes(entry, CLIENT_ID, SIGNED_BY)
+    if not operations and not header:
+        return "Attendance Entry Updated Successfully"
+
+    before = _day_counts(entry)
+    client = header.get("CLIENT_ID", before[0])
+    if operations:
+        result = db["Worker_Attendance"].bulk_write(operations, ordered=False)
+        if result.matched_count != len(operations) or "PRESENT" not in entry:
+            if result.matched_count != len(operations):
+                transitions = _applied_transitions(DATE, transitions)
+            fields = _recount_attendance(DATE, header)
+            if fields is None:
+                return _archived_under_write(DATE)
+            after = (client, fields["PRESENT"], fields["ABSENT"])
+            apply_attendance_changes(db, DATE, transitions, before, after)
+            return "Attendance Entry Updated Successfully"
+    update = {"$inc": {**counters, "REVISION": 1}}
+    if header:
+        update["$set"] = header
+    if db["Daily_Attendance"].update_one({"DATE": DATE}, update).matched_count == 0:
+        return _archived_under_write(DATE)
+    after = (client, before[1] + counters["PRESENT"], before[2] + counters["ABSENT"])
+    apply_attendance_changes(db, DATE, transitions, before, after)
     return "Attendance Entry Updated Successfully"
 
 
-# Return All Attendance Entries
-def get_all_attendance_entries():
+# Transitions whose compare-and-set update went through, judged by the status
+# the worker records hold now
+def _applied_transitions(DATE, transitions):
     db = get_db()
-    entries = list(db["Daily_Attendance"].find())
-    for entry in entries:
-        entry["_id"] = str(entry["_id"])
-    return entries
+    current = {
+        row["WORKER_ID"]: plain_value(row.get("STATUS"))
+        for row in db["Worker_Attendance"].find(
+            {"DATE": DATE, "WORKER_ID": {"$in": [t[0] for t in transitions]}},
+            {"_id": 0, "WORKER_ID": 1, "STATUS": 1},
+        )
+    }
+    return [
+        (worker_id, old_status, new_status)
+        for worker_id, old_status, new_status in transitions
+        if current.get(worker_id) == plain_value(new_status)
+    ]
 
 
-# Return all worker data
-def get_all_worker_data():
+# Stream attendance entries in DATE order, optionally filtered by a date range,
+# resumed after a DATE cursor, limited and projected to a subset of fields.
+# Days of archived months are merged in from the archive.
+def iter_attendance_entries(
+    date_from=None, date_to=None, after=None, limit=None, fields=None
+):
     db = get_db()
-    entries = list(db["Worker_Data"].find())
-    for entry in entries:
-        entry["_id"] = str(entry["_id"])
-    return entries
+    entries = _iter_live_attendance_entries(date_from, date_to, after, limit, fields)
+    start = max(after, date_from) if after and date_from else after or date_from
+    archived_entries = (
+        _project_entry(month.day_view(date), fields)
+        for month in iter_archived_months(db, start, date_to)
+        for date in month.dates_between(date_from, date_to, after)
+    )
+    try:
+        merged = merge(entries, archived_entries, key=lambda entry: entry["DATE"])
+        yield from islice(_unique_dates(merged, lambda entry: entry["DATE"]), limit)
+    finally:
+        entries.close()
 
 
-# Get entry of a date and convert the json to downloadable csv
+# A month being archived briefly exists both live and archived; merge() yields
+# the live copy of a DATE first, the archived one is dropped
+def _unique_dates(entries, date_of):
+    last_date = None
+    for entry in entries:
+        if date_of(entry) != last_date:
+            last_date = date_of(entry)
+            yield entry
 
-import pandas as pd
-import os
+
+# Apply an iter_attendance_entries FIELDS projection to an archived day view
+def _project_entry(entry, fields):
+    if not fields:
+        return entry
+    projected = {"DATE": entry["DATE"]}
+    worker_fields = []
+    for field in fields:
+        if field == "WORKER_LIST":
+            worker_fields = None
+        elif field.startswith("WORKER_LIST."):
+            if worker_fields is not None:
+                worker_fields.append(field.split(".", 1)[1])
+        elif field in entry:
+            projected[field] = entry[field]
+    if worker_fields is None:
+        projected["WORKER_LIST"] = entry["WORKER_LIST"]
+    elif worker_fields:
+        projected["WORKER_LIST"] = [
+            {
+                "WORKER_ID": worker["WORKER_ID"],
+                **{field: worker[field] for field in worker_fields if field in worker},
+            }
+            for worker in entry["WORKER_LIST"]
+        ]
+    return projected
 
 
-def generate_csv_report(date):
-    print(f"Generating Report for {date}")
+# Live day sheets of iter_attendance_entries. Worker records are merged in from
+# a second cursor sorted the same way, so only the current day is ever held in
+# memory.
+def _iter_live_attendance_entries(date_from, date_to, after, limit, fields):
     db = get_db()
-    report = db["Daily_Attendance"].find_one({"DATE": date})
-    if report is None:
-        return {"message": "Report not found."}
-    print("Report Found", report["WORKER_LIST"])
+    query = date_query(date_from, date_to, after)
+
+    projection = None
+    row_projection = {"_id": 0}
+    include_workers = True
+    if fields:
+        projection = {"DATE": 1}
+        worker_fields = []
+        for field in fields:
+            if field == "WORKER_LIST":
+                worker_fields = None
+            elif field.startswith("WORKER_LIST."):
+                if worker_fields is not None:
+                    worker_fields.append(field.split(".", 1)[1])
+            else:
+                projection[field] = 1
+        include_workers = worker_fields is None or len(worker_fields) > 0
+        if include_workers:
+            projection["WORKER_LIST"] = 1
+        if worker_fields:
+            row_projection = {"_id": 0, "DATE": 1, "WORKER_ID": 1}
+            row_projection.update({field: 1 for field in worker_fields})
+
+    days = db["Daily_Attendance"].find(query, projection).sort("DATE", ASCENDING)
+    if limit:
+        days = days.limit(limit)
+
+    rows = None
+    if include_workers:
+        rows = (
+            db["Worker_Attendance"]
+            .find(query, row_projection)
+            .sort([("DATE", ASCENDING), ("WORKER_ID", ASCENDING)])
+        )
+    pending = None
+
+    try:
+        for entry in days:
+            if not include_workers:
+                yield entry
+                continue
+            worker_list = []
+            while rows is not None:
+                if pending is None:
+                    pending = next(rows, None)
+                    if pending is None:
+                        rows = None
+                        break
+                if pending["DATE"] > entry["DATE"]:
+                    break
+                if pending["DATE"] == entry["DATE"]:
+                    pending.pop("DATE")
+                    worker_list.append(pending)
+                pending = None
+            # Day documents written before per-worker records keep their own list
+            if "WORKER_LIST" not in entry:
+                entry["WORKER_LIST"] = worker_list
+            yield entry
+    finally:
+        days.close()
+        if rows is not None:
+            rows.close()
 
-    worker_list = report["WORKER_LIST"]
 
-    # Filter out workers with status "ABSENT"
-    worker_list = [
-        worker for worker in worker_list if worker["STATUS"]["VALUE"] != "ABSENT"
-    ]
+# Return All Attendance Entries
+def get_all_attendance_entries():
+    return list(iter_attendance_entries())
+
+
+# Return all worker data
+def get_all_worker_data():
+    db = get_db()
+    return list(db["Worker_Data"].find())
 
-    # Prepare the worker data
-    for worker in worker_list:
-        worker["Name"] = worker.pop("Worker_Name")
-        worker["Email"] = worker.pop("Worker_Email")
-        worker["Phone"] = worker.pop("Worker_Phone")
-        worker.pop("Worker_ID", None)
 
-    # Create a DataFrame for the worker list
-    df = pd.DataFrame(worker_list, columns=["Name", "Email", "Phone"])
+# DATE -> STATUS series of one worker, optionally between date_from and date_to.
+# One _id lookup checks the worker exists; the series is then read from the
+# (WORKER_ID, DATE, STATUS) index. Legacy days of the range are split first so
+# they are not missed (a single probe of an empty partial index once the
+# migration ran). None if the worker does not exist.
+def get_worker_attendance_series(WORKER_ID, date_from=None, date_to=None):
+    if not ObjectId.is_valid(WORKER_ID):
+        return None
+    db = get_db()
+    if db["Worker_Data"].find_one({"_id": ObjectId(WORKER_ID)}, {"_id": 1}) is None:
+        return None
+    migrate_legacy_attendance(date_from, date_to)
+    query = {"WORKER_ID": WORKER_ID, **date_query(date_from, date_to)}
+    cursor = (
+        db["Worker_Attendance"]
+        .find(query, {"_id": 0, "DATE": 1, "STATUS": 1})
+        .sort("DATE", ASCENDING)
+    )
+    series = {row["DATE"]: plain_value(row.get("STATUS"), "") for row in cursor}
+    for month in iter_archived_months(db, date_from, date_to):
+        series.update(month.worker_series(WORKER_ID, date_from, date_to))
+    return dict(sorted(series.items()))
 
-    # Convert the DataFrame to CSV
-    csv_data = df.to_csv(index=False)
 
-    # Save the CSV to a local file
-    csv_file_path = f"attendance_report_{date}.csv"
-    with open(csv_file_path, "w") as file:
-        file.write(csv_data)
+# Revision of a day sheet, bumped on every attendance update. None if the day
+# sheet does not exist.
+def get_attendance_revision(date):
+    db = get_db()
+    entry = db["Daily_Attendance"].find_one({"DATE": date}, {"REVISION": 1})
+    if entry is None:
+        archived = get_archived_month(db, date[:7])
+        entry = archived.header(date) if archived is not None else None
+        if entry is None:
+            return None
+    return entry.get("REVISION", 0)
 
-    print(f"CSV report saved to {csv_file_path}")
 
-    return csv_data
+# Name, email and phone of the workers marked PRESENT on a date, streamed from the
+# attendance records. None if the day sheet does not exist.
+def get_presentee_rows(date):
+    db = get_db()
+    entry = db["Daily_Attendance"].find_one({"DATE": date})
+    if entry is None:
+        archived = get_archived_month(db, date[:7])
+        if archived is None or date not in archived.day_index:
+            return None
+        return (_presentee_row(row) for row in archived.records(date, "PRESENT"))
+    _migrate_legacy_worker_list(entry)
+    cursor = (
+        db["Worker_Attendance"]
+        .find(
+            {"DATE": date, **_status_query("PRESENT")},
+            {"_id": 0, "WORKER_NAME": 1, "WORKER_EMAIL": 1, "PHONE": 1},
+        )
+        .sort("WORKER_ID", ASCENDING)
+    )
+    return (_presentee_row(row) for row in cursor)
 
 
-def generate_new_client_response():
-    csv_file_path = "schema/Attendance Schema - Client.csv"
-    df = pd.read_csv(csv_file_path)
+# Presentee rows of every day in a date range, optionally only the days signed for
+# a client, fetched with one query over the attendance records and merged with
+# the archived days. Yields (DATE, rows) per day in DATE order.
+def iter_presentee_rows_between(date_from, date_to, client_id=None):
+    db = get_db()
+    archived = (
+        (date, [_presentee_row(row) for row in month.records(date, "PRESENT")])
+        for month in iter_archived_months(db, date_from, date_to)
+        for date in month.dates_between(date_from, date_to)
+        if not client_id or month.header(date)["CLIENT_ID"] == client_id
+    )
+    merged = merge(
+        _iter_live_presentee_rows_between(date_from, date_to, client_id),
+        archived,
+        key=lambda day: day[0],
+    )
+    return _unique_dates(merged, lambda day: day[0])
 
-    client_data = {}
-    for _, row in df.iterrows():
-        field_name = row["VARIABLE NAME"]
-        description = row["DESCRIPTION"]
 
-        client_data[field_name] = {"DESCRIPTION": description, "VALUE": ""}
-    # Get current time in IST
-    import pytz
+def _iter_live_presentee_rows_between(date_from, date_to, client_id=None):
+    db = get_db()
+    query = date_query(date_from, date_to)
+    if client_id:
+        query["CLIENT_ID"] = client_id
+    dates = []
+    for entry in db["Daily_Attendance"].find(query, {"DATE": 1, "WORKER_LIST": 1}):
+        _migrate_legacy_worker_list(entry)
+        dates.append(entry["DATE"])
+    if not dates:
+        return
+    cursor = (
+        db["Worker_Attendance"]
+        .find(
+            {"DATE": {"$in": dates}, **_status_query("PRESENT")},
+            {"_id": 0, "DATE": 1, "WORKER_NAME": 1, "WORKER_EMAIL": 1, "PHONE": 1},
+        )
+        .sort([("DATE", ASCENDING), ("WORKER_ID", ASCENDING)])
+    )
+    rows_by_date = groupby(cursor, key=lambda row: row["DATE"])
+    pending = next(rows_by_date, None)
+    for date in sorted(dates):
+        if pending is not None and pending[0] == date:
+            yield date, [_presentee_row(row) for row in pending[1]]
+            pending = next(rows_by_date, None)
+        else:
+            yield date, []
+
+
+def _presentee_row(row):
+    return (
+        plain_value(row.get("WORKER_NAME"), ""),
+        plain_value(row.get("WORKER_EMAIL"), ""),
+        plain_value(row.get("PHONE"), ""),
+    )
 
-    ist = pytz.timezone("Asia/Kolkata")
-    created_on_ist = datetime.now(ist).strftime("%Y-%m-%d %H:%M:%S %Z%z")
-    response = {"CREATED_ON": created_on_ist, "CUSTOMER_DATA": client_data}
 
-    return response
+def generate_new_client_response():
+    return new_client_form()
 
 
 #  Create a new customer
@@ -282,103 +861,91 @@ def create_customer():
     return new_client_response
 
 
-# SAVE CUSTOMER DATA
-def save_new_customer_data(CUSTOMER_DATA):
-    db = get_db()
+CUSTOMER_DUPLICATE_MESSAGES = {
+    "CUSTOMER_DATA.EMAIL.VALUE": "CUSTOMER EMAIL ALREADY EXISTS.",
+    "CUSTOMER_DATA.MOBILE.VALUE": "CUSTOMER MOBILE ALREADY EXISTS.",
+    "CUSTOMER_DATA.NAME.VALUE": "CUSTOMER NAME ALREADY EXISTS.",
+}
 
-    if CUSTOMER_DATA["CUSTOMER_DATA"]["NAME"]["VALUE"] == "":
-        return {"MESSAGE": "CUSTOMER NAME IS REQUIRED."}
-    if CUSTOMER_DATA["CUSTOMER_DATA"]["EMAIL"]["VALUE"] == "":
-        return {"MESSAGE": "CUSTOMER EMAIL IS REQUIRED."}
-    if CUSTOMER_DATA["CUSTOMER_DATA"]["MOBILE"]["VALUE"] == "":
-        return {"MESSAGE": "CUSTOMER MOBILE IS REQUIRED."}
 
-    check_entry = db["Customers"].find_one(
-        {"CUSTOMER_DATA.EMAIL.VALUE": CUSTOMER_DATA["CUSTOMER_DATA"]["EMAIL"]["VALUE"]}
-    )
-    if check_entry is not None:
-        return {"MESSAGE": "CUSTOMER EMAIL ALREADY EXISTS."}
-    check_entry = db["Customers"].find_one(
-        {
-            "CUSTOMER_DATA.MOBILE.VALUE": CUSTOMER_DATA["CUSTOMER_DATA"]["MOBILE"][
-                "VALUE"
-            ]
-        }
-    )
-    if check_entry is not None:
-        return {"MESSAGE": "CUSTOMER MOBILE ALREADY EXISTS."}
-    check_entry = db["Customers"].find_one(
-        {"CUSTOMER_DATA.NAME.VALUE": CUSTOMER_DATA["CUSTOMER_DATA"]["NAME"]["VALUE"]}
+def customer_duplicate_message(details):
+    return CUSTOMER_DUPLICATE_MESSAGES.get(
+        _duplicate_key_field(details), "CUSTOMER ALREADY EXISTS."
     )
-    if check_entry is not None:
-        return {"MESSAGE": "CUSTOMER NAME ALREADY EXISTS."}
 
-    result = db["Customers"].insert_one(CUSTOMER_DATA)
-    new_entry = db["Customers"].find_one({"_id": result.inserted_id})
-    new_entry["_id"] = str(new_entry["_id"])
-    return {"MESSAGE": "CUSTOMER DATA SAVED SUCCESSFULLY.", "CUSTOMER_DATA": new_entry}
 
+# Validate the CUSTOMER_DATA fields of a customer against the validators compiled
+# from the client schema, returns an error message or None if they are valid
+def validate_customer_fields(fields):
+    if not isinstance(fields, dict):
+        return "CUSTOMER DATA IS INVALID."
+    for field in ("NAME", "EMAIL", "MOBILE"):
+        entry = fields.get(field)
+        if not isinstance(entry, dict) or entry.get("VALUE", "") in ("", None):
+            return f"CUSTOMER {field} IS REQUIRED."
+    invalid = validate_client_fields(fields)
+    if invalid is not None:
+        field, missing = invalid
+        return f"CUSTOMER {field} IS {'REQUIRED' if missing else 'INVALID'}."
+    return None
 
-from bson import ObjectId
 
+# SAVE CUSTOMER DATA
+def save_new_customer_data(CUSTOMER_DATA):
+    db = get_db()
+
+    if not isinstance(CUSTOMER_DATA, dict):
+        return {"MESSAGE": "CUSTOMER DATA IS INVALID."}
+    message = validate_customer_fields(CUSTOMER_DATA.get("CUSTOMER_DATA"))
+    if message is not None:
+        return {"MESSAGE": message}
+
+    # Unique indexes on email, mobile and name reject duplicates
+    try:
+        db["Customers"].insert_one(CUSTOMER_DATA)
+    except errors.DuplicateKeyError as e:
+        return {"MESSAGE": customer_duplicate_message(e.details or {})}
+    bump_version(db, "Customers")
+    return {
+        "MESSAGE": "CUSTOMER DATA SAVED SUCCESSFULLY.",
+        "CUSTOMER_DATA": CUSTOMER_DATA,
+    }
 
-from bson import ObjectId
 
 def update_customer_data(CUSTOMER_ID, CUSTOMER_DATA):
     db = get_db()
 
-    if CUSTOMER_DATA["NAME"]["VALUE"] == "":
-        return {"MESSAGE": "CUSTOMER NAME IS REQUIRED."}
-    if CUSTOMER_DATA["EMAIL"]["VALUE"] == "":
-        return {"MESSAGE": "CUSTOMER EMAIL IS REQUIRED."}
-    if CUSTOMER_DATA["MOBILE"]["VALUE"] == "":
-        return {"MESSAGE": "CUSTOMER MOBILE IS REQUIRED."}
-    
+    message = validate_customer_fields(CUSTOMER_DATA)
+    if message is not None:
+        return {"MESSAGE": message}
+
     # Convert CUSTOMER_ID to ObjectId
     customer_id_obj = ObjectId(CUSTOMER_ID)
-    
-    customer_entries = get_all_customers()
-    for entry in customer_entries:
-        if (
-            entry["_id"] != str(customer_id_obj)  
-            and entry["CUSTOMER_DATA"]["EMAIL"]["VALUE"] == CUSTOMER_DATA["EMAIL"]["VALUE"]
-        ):
-            return {"MESSAGE": "CUSTOMER EMAIL ALREADY EXISTS."}
-        elif (
-            entry["_id"] != str(customer_id_obj)  
-            and entry["CUSTOMER_DATA"]["MOBILE"]["VALUE"] == CUSTOMER_DATA["MOBILE"]["VALUE"]
-        ):
-            return {"MESSAGE": "CUSTOMER MOBILE ALREADY EXISTS."}
-        elif (
-            entry["_id"] != str(customer_id_obj)  
-            and entry["CUSTOMER_DATA"]["NAME"]["VALUE"] == CUSTOMER_DATA["NAME"]["VALUE"]
-        ):
-            return {"MESSAGE": "CUSTOMER NAME ALREADY EXISTS."}
-
-    result = db["Customers"].update_one(
-        {"_id": customer_id_obj}, {"$set": {"CUSTOMER_DATA": CUSTOMER_DATA}}
-    )
+
+    # Unique indexes on email, mobile and name reject collisions with other customers
+    try:
+        result = db["Customers"].update_one(
+            {"_id": customer_id_obj}, {"$set": {"CUSTOMER_DATA": CUSTOMER_DATA}}
+        )
+    except errors.DuplicateKeyError as e:
+        return {"MESSAGE": customer_duplicate_message(e.details or {})}
     if result.matched_count == 0:
         return {"MESSAGE": "CUSTOMER NOT FOUND."}
+    bump_version(db, "Customers")
     return {"MESSAGE": "CUSTOMER UPDATED SUCCESSFULLY."}
 
 
 # Get all customers
 def get_all_customers():
     db = get_db()
-    entries = list(db["Customers"].find())
-    for entry in entries:
-        entry["_id"] = str(entry["_id"])
-    return entries
+    # Billing history is kept out of listings, see get_client_attendance_entries
+    return list(db["Customers"].find({}, {"ATTENDANCE_DATA": 0}))
 
 
 # Get a customer by ID
 def get_customer_by_id(customer_id):
     db = get_db()
-    customer = db["Customers"].find_one({"_id": customer_id})
-    if customer is not None:
-        customer["_id"] = str(customer["_id"])
-    return customer
+    return db["Customers"].find_one({"_id": customer_id}, {"ATTENDANCE_DATA": 0})
 
 
 # Update a customer
@@ -394,8 +961,11 @@ def DELETE_CUSTOMER(CUSTOMER_ID):
 
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
     # Test the connection
-    if db is not None:
+    if check_health()["OK"]:
         print("Database connection is active.")
     else:
         print("Database connection is not active.")
@@ -0,0 +1,58 @@
+# http_cache.py
+# Conditional responses for collection listings. The strong ETag is the
+# collection's change signal (lib.versions.collection_version: version counter,
+# document count and newest _id), so If-None-Match is answered with 304 after
+# two _id lookups and a metadata read, and inserts made outside the app (the
+# worker loader, mongoimport) are noticed without a version bump. The encoded
+# body is kept per signal and reused while the collection is unchanged; with
+# RESPONSE_CACHE_SECONDS > 0 it is served for that long without touching
+# MongoDB at all.
+import os
+import threading
+import time
+
+from flask import Response, current_app, request
+
+from lib.connection import get_db
+from lib.versions import collection_version
+
+RESPONSE_CACHE_SECONDS = float(os.getenv("RESPONSE_CACHE_SECONDS", "0"))
+
+_lock = threading.Lock()
+# collection -> (version, checked at, encoded body)
+_responses = {}
+
+
+def _etag(collection, version):
+    counter, count, newest = version
+    return f"{collection}-{counter}-{count}-{newest}"
+
+
+def _conditional(etag, body):
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    return response
+
+
+# JSON response of build_payload(), cached by the change signal of collection
+def versioned_json(collection, build_payload):
+    now = time.monotonic()
+    with _lock:
+        cached = _responses.get(collection)
+    if cached is not None and now - cached[1] < RESPONSE_CACHE_SECONDS:
+        return _conditional(_etag(collection, cached[0]), cached[2])
+
+    version = collection_version(get_db(), collection)
+    etag = _etag(collection, version)
+    if cached is not None and cached[0] == version:
+        body = cached[2]
+    elif request.if_none_match.contains(etag):
+        return _conditional(etag, b"")
+    else:
+        body = current_app.json.dumps(build_payload()).encode("utf-8")
+    with _lock:
+        _responses[collection] = (version, now, body)
+    return _conditional(etag, body)
@@ -0,0 +1,237 @@
+# indexes.py
+# Index declarations for every collection, created at startup. The app retries
+# until the unique indexes exist and reports not ready until then.
+import os
+import threading
+import time
+
+from flask import jsonify, request
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure, PyMongoError
+
+# collection -> list of (keys, options)
+INDEXES = {
+    "Customers": [
+        ([("CUSTOMER_DATA.EMAIL.VALUE", ASCENDING)], {"unique": True}),
+        ([("CUSTOMER_DATA.MOBILE.VALUE", ASCENDING)], {"unique": True}),
+        ([("CUSTOMER_DATA.NAME.VALUE", ASCENDING)], {"unique": True}),
+    ],
+    "Users": [
+        ([("username", ASCENDING)], {"unique": True}),
+        ([("email", ASCENDING)], {"unique": True}),
+    ],
+    # Logged out tokens, dropped by MongoDB once they would have expired
+    "Revoked_Tokens": [
+        ([("EXPIRES_AT", ASCENDING)], {"expireAfterSeconds": 0}),
+        ([("REVOKED_AT", ASCENDING)], {}),
+    ],
+    # Natural keys used by the worker ingestion upserts, unique where present so
+    # overlapping loader runs cannot create the same worker twice
+    "Worker_Data": [
+        (
+            [("EMAIL.VALUE", ASCENDING)],
+            {
+                "unique": True,
+                "name": "EMAIL.VALUE_unique",
+                "partialFilterExpression": {"EMAIL.VALUE": {"$gt": ""}},
+            },
+        ),
+        (
+            [("PHONE_NUMBER.VALUE", ASCENDING)],
+            {
+                "unique": True,
+                "name": "PHONE_NUMBER.VALUE_unique",
+                "partialFilterExpression": {"PHONE_NUMBER.VALUE": {"$gt": ""}},
+            },
+        ),
+    ],
+    # Billing attendance, one document per (CLIENT_ID, DATE); DATE serves the
+    # month scans of the invoices
+    "Client_Attendance": [
+        ([("CLIENT_ID", ASCENDING), ("DATE", ASCENDING)], {"unique": True}),
+        ([("DATE", ASCENDING)], {}),
+    ],
+    # One invoice per client and month
+    "Invoices": [
+        ([("CLIENT_ID", ASCENDING), ("MONTH", ASCENDING)], {"unique": True}),
+        ([("MONTH", ASCENDING)], {}),
+    ],
+    # Monthly rollups, also the $merge keys of their rebuild
+    "Worker_Rollups": [
+        ([("WORKER_ID", ASCENDING), ("MONTH", ASCENDING)], {"unique": True}),
+        ([("MONTH", ASCENDING)], {}),
+    ],
+    "Client_Rollups": [
+        ([("CLIENT_ID", ASCENDING), ("MONTH", ASCENDING)], {"unique": True}),
+    ],
+    # One packed document per archived month
+    "Attendance_Archive": [
+        ([("MONTH", ASCENDING)], {"unique": True}),
+    ],
+    "Daily_Attendance": [
+        ([("DATE", ASCENDING)], {"unique": True}),
+        # Only day documents not yet split into Worker_Attendance, so checking
+        # for them is one probe of an empty index after the migration
+        (
+            [("DATE", DESCENDING)],
+            {"partialFilterExpression": {"WORKER_LIST": {"$exists": True}}},
+        ),
+    ],
+    # One attendance record per (DATE, WORKER_ID); STATUS makes the per-worker
+    # series a covered query
+    "Worker_Attendance": [
+        ([("DATE", ASCENDING), ("WORKER_ID", ASCENDING)], {"unique": True}),
+        ([("WORKER_ID", ASCENDING), ("DATE", ASCENDING), ("STATUS", ASCENDING)], {}),
+    ],
+}
+
+
+# collection -> names of indexes replaced by a declaration above
+OBSOLETE_INDEXES = {
+    "Worker_Data": ["EMAIL.VALUE_1", "PHONE_NUMBER.VALUE_1"],
+    "Worker_Attendance": ["WORKER_ID_1_DATE_1"],
+}
+
+INDEX_RETRY_SECONDS = float(os.getenv("INDEX_RETRY_SECONDS", "10"))
+# Duplicates stay until lib.migrate_duplicates has run, retrying the index
+# builds (a collection scan each) more often would only load the database
+INDEX_DUPLICATE_RETRY_SECONDS = float(os.getenv("INDEX_DUPLICATE_RETRY_SECONDS", "300"))
+
+ATTENDANCE_COLLECTIONS = (
+    "Daily_Attendance",
+    "Worker_Attendance",
+    "Worker_Rollups",
+    "Client_Rollups",
+)
+
+# Endpoint -> collections whose unique indexes reject its duplicate writes.
+# Without those indexes the endpoint answers 503, every other one keeps
+# serving. Only the worker loader writes Worker_Data and checks its indexes.
+WRITE_ENDPOINTS = {
+    "auth.register": ("Users",),
+    "client.save_customer_data": ("Customers",),
+    "client.import_customer_data": ("Customers",),
+    "client.update_customer": ("Customers",),
+    "client.update_customer_billing_data": ("Client_Attendance",),
+    "client.generate_monthly_invoices": ("Invoices",),
+    # Opening a day creates its day sheet
+    "worker.get_attendance_entry": ATTENDANCE_COLLECTIONS,
+    "worker.save_attendance_entry": ATTENDANCE_COLLECTIONS,
+    "worker.patch_attendance": ATTENDANCE_COLLECTIONS,
+}
+
+# Set once ensure_indexes has reached the database, and once every unique
+# index exists
+_checked = threading.Event()
+_unique_ready = threading.Event()
+_status = {"ERROR": "Indexes have not been created yet."}
+# collection -> error of its unique index that could not be created
+_missing_unique = {}
+
+
+def _is_duplicate_key(error):
+    return error.code == 11000 or "E11000" in str(error)
+
+
+# Create every index, returns True when all the unique ones exist
+def ensure_indexes(db):
+    missing = {}
+    for collection, names in OBSOLETE_INDEXES.items():
+        for name in names:
+            try:
+                db[collection].drop_index(name)
+            except OperationFailure:
+                # Already dropped
+                pass
+            except PyMongoError as e:
+                print(f"Skipping index creation: {e}")
+                _status["ERROR"] = f"Database unreachable: {e}"
+                return False
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                db[collection].create_index(keys, **options)
+            except OperationFailure as e:
+                if options.get("unique") and _is_duplicate_key(e):
+                    print(
+                        f"DUPLICATE KEYS BLOCK THE UNIQUE INDEX {keys} "
+                        f"ON {collection}: writes relying on it are refused until "
+                        f"`python -m lib.migrate_duplicates` has merged them. {e}"
+                    )
+                else:
+                    print(f"Failed to create index {keys} on {collection}: {e}")
+                if options.get("unique"):
+                    missing[collection] = f"Unique index {keys} on {collection}: {e}"
+            except PyMongoError as e:
+                print(f"Skipping index creation: {e}")
+                _status["ERROR"] = f"Database unreachable: {e}"
+                return False
+    _missing_unique.clear()
+    _missing_unique.update(missing)
+    _status["ERROR"] = "; ".join(missing.values()) or None
+    _checked.set()
+    if missing:
+        return False
+    _unique_ready.set()
+    return True
+
+
+# Background loop of the app: retry until the unique indexes exist
+def ensure_indexes_until_ready(get_db):
+    while not ensure_indexes(get_db()):
+        delay = (
+            INDEX_DUPLICATE_RETRY_SECONDS if _checked.is_set() else INDEX_RETRY_SECONDS
+        )
+        print(f"Unique indexes missing, retrying in {delay:.0f}s.")
+        time.sleep(delay)
+
+
+# True once index creation has reached the database
+def indexes_checked():
+    return _checked.is_set()
+
+
+def indexes_ready():
+    return _unique_ready.is_set()
+
+
+def index_error():
+    return _status["ERROR"]
+
+
+# True when the unique indexes of every collection given exist
+def unique_indexes_ready(*collections):
+    if _unique_ready.is_set():
+        return True
+    return _checked.is_set() and not any(
+        name in _missing_unique for name in collections
+    )
+
+
+# before_request hook: writes would accept duplicates without the unique
+# indexes, so the endpoints relying on a missing one answer 503
+def require_indexes():
+    collections = WRITE_ENDPOINTS.get(request.endpoint)
+    if (
+        collections is None
+        or request.method == "OPTIONS"
+        or unique_indexes_ready(*collections)
+    ):
+        return None
+    if not _checked.is_set():
+        return (
+            jsonify(
+                {"message": "Service is starting, database indexes are not ready."}
+            ),
+            503,
+        )
+    missing = ", ".join(name for name in collections if name in _missing_unique)
+    return (
+        jsonify(
+            {
+                "message": "Writes are disabled until the duplicates blocking "
+                f"the unique indexes of {missing} are merged."
+            }
+        ),
+        503,
+    )
@@ -0,0 +1,290 @@
+# invoices.py
+# Month-end invoices from the client billing rows and the attendance day headers.
+#
+#   python -m lib.invoices 2024-10 [--format pdf|csv] [--output invoices.zip]
+#
+# Worker-days per client come from the Client_Attendance billing rows
+# (POST /clients/bill), summed in one aggregation over the month. Days without
+# any billing row fall back to the PRESENT counter of the day header signed
+# off for a client, in a second aggregation over Daily_Attendance, instead of
+# a query per client and day. Each invoice is upserted on (CLIENT_ID, MONTH)
+# and invoices of clients without billed days are dropped, so re-running a
+# month replaces its invoices rather than duplicating them. Invoice documents
+# render in the reports process pool and stream out as one ZIP.
+import argparse
+import os
+
+from bson import ObjectId
+from pymongo import ASCENDING, UpdateOne
+from dotenv import load_dotenv
+
+from lib.archive import get_archived_month
+from lib.attendance import MONTH_PATTERN, month_query
+from lib.connection import close_connection, get_db
+from lib.reports import iter_archive, report_filename
+from lib.schema_templates import created_on_ist
+
+INVOICE_COLUMNS = ("Date", "Worker Days", "Daily Rate", "Amount")
+# Rate used for clients without a DAILY_RATE of their own
+INVOICE_DAILY_RATE = float(os.getenv("INVOICE_DAILY_RATE", "0"))
+
+
+# Worker-days of a billing row's ATTENDANCE_DATA: a number, a PRESENT count
+# (plain or a schema field), or the client's workers (a list, or a WORKER_LIST)
+# with their STATUS, of which the PRESENT ones are counted
+_BILLING_WORKERS = {
+    "$cond": [
+        {"$isArray": "$ATTENDANCE_DATA"},
+        "$ATTENDANCE_DATA",
+        {
+            "$cond": [
+                {"$isArray": "$ATTENDANCE_DATA.WORKER_LIST"},
+                "$ATTENDANCE_DATA.WORKER_LIST",
+                [],
+            ]
+        },
+    ]
+}
+BILLED_PRESENT = {
+    "$switch": {
+        "branches": [
+            {"case": {"$isNumber": "$ATTENDANCE_DATA"}, "then": "$ATTENDANCE_DATA"},
+            {
+                "case": {"$isNumber": "$ATTENDANCE_DATA.PRESENT"},
+                "then": "$ATTENDANCE_DATA.PRESENT",
+            },
+            {
+                "case": {"$isNumber": "$ATTENDANCE_DATA.PRESENT.VALUE"},
+                "then": "$ATTENDANCE_DATA.PRESENT.VALUE",
+            },
+        ],
+        "default": {
+            "$size": {
+                "$filter": {
+                    "input": _BILLING_WORKERS,
+                    "as": "worker",
+                    "cond": {
+                        "$or": [
+                            {"$eq": ["$$worker.STATUS", "PRESENT"]},
+                            {"$eq": ["$$worker.STATUS.VALUE", "PRESENT"]},
+                        ]
+                    },
+                }
+            }
+        },
+    }
+}
+
+
+# Group per client: total worker-days and the days of the month
+def _group_by_client(present):
+    return [
+        {"$sort": {"DATE": ASCENDING}},
+        {
+            "$group": {
+                "_id": "$CLIENT_ID",
+                "WORKER_DAYS": {"$sum": present},
+                "DAYS": {"$push": {"DATE": "$DATE", "PRESENT": present}},
+            }
+        },
+    ]
+
+
+# One document per client from its billing rows of the month
+def billed_days_by_client(db, month):
+    pipeline = [
+        {"$match": {**month_query(month), "CLIENT_ID": {"$nin": ["", None]}}},
+        *_group_by_client(BILLED_PRESENT),
+    ]
+    return db["Client_Attendance"].aggregate(pipeline)
+
+
+# One document per client from the day headers signed off for it, leaving out
+# skip_dates (the days that have billing rows)
+def worker_days_by_client(db, month, skip_dates=()):
+    query = {**month_query(month), "CLIENT_ID": {"$nin": ["", None]}}
+    if skip_dates:
+        query["DATE"] = {**query["DATE"], "$nin": sorted(skip_dates)}
+    pipeline = [
+        {"$match": query},
+        *_group_by_client({"$ifNull": ["$PRESENT", 0]}),
+    ]
+    return db["Daily_Attendance"].aggregate(pipeline)
+
+
+# Per-client totals of a month ordered by CLIENT_ID: billing rows first, day
+# headers (live or archived) for the days nobody billed
+def client_totals(db, month):
+    billed = list(billed_days_by_client(db, month))
+    billed_dates = {day["DATE"] for total in billed for day in total["DAYS"]}
+    archived = get_archived_month(db, month)
+    if archived is not None:
+        signed = archived.client_totals(billed_dates)
+    else:
+        signed = worker_days_by_client(db, month, billed_dates)
+
+    totals = {total["_id"]: total for total in billed}
+    for total in signed:
+        merged = totals.get(total["_id"])
+        if merged is None:
+            totals[total["_id"]] = total
+            continue
+        merged["WORKER_DAYS"] += total["WORKER_DAYS"]
+        merged["DAYS"] = sorted(
+            merged["DAYS"] + total["DAYS"], key=lambda day: day["DATE"]
+        )
+    return [totals[client_id] for client_id in sorted(totals)]
+
+
+def _customers_by_id(db, client_ids):
+    ids = [
+        ObjectId(client_id) for client_id in client_ids if ObjectId.is_valid(client_id)
+    ]
+    projection = {
+        "CUSTOMER_DATA.NAME": 1,
+        "CUSTOMER_DATA.GST_NUMBER": 1,
+        "CUSTOMER_DATA.DAILY_RATE": 1,
+    }
+    return {
+        str(customer["_id"]): customer.get("CUSTOMER_DATA", {})
+        for customer in db["Customers"].find({"_id": {"$in": ids}}, projection)
+    }
+
+
+def _field_value(customer_data, name):
+    field = customer_data.get(name)
+    if isinstance(field, dict):
+        return field.get("VALUE", "")
+    return ""
+
+
+def _daily_rate(customer_data):
+    value = _field_value(customer_data, "DAILY_RATE")
+    try:
+        return float(str(value).replace(",", ""))
+    except ValueError:
+        return INVOICE_DAILY_RATE
+
+
+# Unique per (CLIENT_ID, MONTH) like the invoices, hence the full CLIENT_ID
+def invoice_number(CLIENT_ID, month):
+    return f"INV-{month.replace('-', '')}-{CLIENT_ID.upper()}"
+
+
+# Build and store the invoices of a month, returns them ordered by CLIENT_ID
+def generate_invoices(month):
+    if not MONTH_PATTERN.match(month):
+        raise ValueError("MONTH must be in YYYY-MM format.")
+    db = get_db()
+    totals = client_totals(db, month)
+    customers = _customers_by_id(db, [total["_id"] for total in totals])
+
+    invoices = []
+    operations = []
+    for total in totals:
+        CLIENT_ID = total["_id"]
+        customer_data = customers.get(CLIENT_ID, {})
+        rate = _daily_rate(customer_data)
+        invoice = {
+            "INVOICE_NUMBER": invoice_number(CLIENT_ID, month),
+            "CLIENT_ID": CLIENT_ID,
+            "MONTH": month,
+            "CUSTOMER_NAME": _field_value(customer_data, "NAME"),
+            "GST_NUMBER": _field_value(customer_data, "GST_NUMBER"),
+            "DAILY_RATE": rate,
+            "WORKER_DAYS": total["WORKER_DAYS"],
+            "AMOUNT": round(total["WORKER_DAYS"] * rate, 2),
+            "DAYS": total["DAYS"],
+            "GENERATED_ON": created_on_ist(),
+        }
+        invoices.append(invoice)
+        operations.append(
+            UpdateOne(
+                {"CLIENT_ID": CLIENT_ID, "MONTH": month},
+                {"$set": invoice},
+                upsert=True,
+            )
+        )
+    if operations:
+        db["Invoices"].bulk_write(operations, ordered=False)
+    # The month's invoices are replaced as a set: clients whose days were
+    # re-signed to someone else must not keep their earlier invoice
+    db["Invoices"].delete_many(
+        {
+            "MONTH": month,
+            "CLIENT_ID": {"$nin": [invoice["CLIENT_ID"] for invoice in invoices]},
+        }
+    )
+    return invoices
+
+
+def get_invoices(month):
+    db = get_db()
+    return list(
+        db["Invoices"].find({"MONTH": month}, {"_id": 0}).sort("CLIENT_ID", ASCENDING)
+    )
+
+
+def _invoice_rows(invoice):
+    rate = invoice["DAILY_RATE"]
+    for day in invoice["DAYS"]:
+        yield (
+            day["DATE"],
+            str(day["PRESENT"]),
+            f"{rate:.2f}",
+            f"{day['PRESENT'] * rate:.2f}",
+        )
+    yield (
+        "Total",
+        str(invoice["WORKER_DAYS"]),
+        f"{rate:.2f}",
+        f"{invoice['AMOUNT']:.2f}",
+    )
+
+
+def _invoice_title(invoice):
+    name = invoice["CUSTOMER_NAME"] or invoice["CLIENT_ID"]
+    title = f"Invoice {invoice['INVOICE_NUMBER']} - {name} - {invoice['MONTH']}"
+    if invoice["GST_NUMBER"]:
+        title += f" - GSTIN {invoice['GST_NUMBER']}"
+    return title
+
+
+# Stream a ZIP with one invoice file per client
+def iter_invoice_archive(invoices, output_format):
+    jobs = (
+        (
+            report_filename(f"invoice_{invoice['INVOICE_NUMBER']}", output_format),
+            (
+                list(_invoice_rows(invoice)),
+                output_format,
+                _invoice_title(invoice),
+                INVOICE_COLUMNS,
+            ),
+        )
+        for invoice in invoices
+    )
+    return iter_archive(jobs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the invoices of a month.")
+    parser.add_argument("month", help="YYYY-MM")
+    parser.add_argument("--format", choices=("pdf", "csv"), default="pdf")
+    parser.add_argument(
+        "--output", help="ZIP file to write, defaults to invoices_<MONTH>.zip"
+    )
+    args = parser.parse_args()
+
+    load_dotenv()
+    try:
+        invoices = generate_invoices(args.month)
+        print(f"{len(invoices)} invoices generated for {args.month}")
+        if invoices:
+            output = args.output or f"invoices_{args.month}.zip"
+            with open(output, "wb") as file:
+                for chunk in iter_invoice_archive(invoices, args.format):
+                    file.write(chunk)
+            print(f"Invoices written to {output}")
+    finally:
+        close_connection()
@@ -0,0 +1,67 @@
+# json_provider.py
+# JSON encoding for the app: ObjectId, datetime/date and Decimal/Decimal128 are
+# encoded natively, so read paths hand Mongo documents to jsonify unchanged.
+# orjson is used when it is installed, the standard library json otherwise.
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from bson import Decimal128, ObjectId
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        value = value.to_decimal()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8", "replace")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj, sort_keys=False):
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=_default, option=option).decode("utf-8")
+    return json.dumps(obj, default=_default, sort_keys=sort_keys, ensure_ascii=False)
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# Encode documents one per line as they come, e.g. straight off a cursor
+def iter_ndjson(documents):
+    for document in documents:
+        yield dumps(document) + "\n"
+
+
+class FastJSONProvider(JSONProvider):
+    # Same key order as Flask's default provider
+    sort_keys = True
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            kwargs.setdefault("default", _default)
+            kwargs.setdefault("sort_keys", self.sort_keys)
+            return json.dumps(obj, **kwargs)
+        return dumps(obj, sort_keys=self.sort_keys)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return loads(s)
@@ -1,52 +1,169 @@
+# load_worker_data.py
+# Streaming worker ingestion from a contractor roster CSV.
+#
+#   python -m lib.load_worker_data [CSV] [--chunk-size N] [--restart]
+#
+# The CSV is read in chunks and documents are built column-wise. Each chunk is
+# upserted on its natural key (EMAIL, or PHONE_NUMBER when the email is empty)
+# with an unordered bulk_write, so re-running never duplicates workers and one
+# bad row does not abort the run. Progress is checkpointed after every chunk;
+# an interrupted run resumes from the last completed chunk.
+import argparse
+import json
+import os
+import time
+
 import pandas as pd
-from pymongo import MongoClient
+from pymongo import UpdateOne
 from pymongo.errors import BulkWriteError
 from dotenv import load_dotenv
 
-import os
+from lib.connection import close_connection, get_db
+from lib.indexes import ensure_indexes, unique_indexes_ready
+from lib.migrate_duplicates import merge_duplicate_workers
+from lib.versions import bump_version
+
+DEFAULT_CSV = "schema/sample_attendance_data.csv"
+
+# CSV column -> description stored with the value
+WORKER_FIELDS = {
+    "NAME": "Worker Name",
+    "CITY": "Worker City",
+    "ASSIGNED_CLIENT_ID": "Assigned Client",
+    "STATUS": "Labourer Status",
+    "PHONE_NUMBER": "Phone Number",
+    "EMAIL": "Email",
+}
+
 
-print("Current Working Directory:", os.getcwd())
+def _checkpoint_path(csv_file_path):
+    return f"{csv_file_path}.checkpoint.json"
 
-load_dotenv()
 
-MONGO_URI = os.getenv("MONGO_URI")
+def _read_checkpoint(csv_file_path):
+    path = _checkpoint_path(csv_file_path)
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        return json.load(f)["ROWS_DONE"]
 
-client = MongoClient(MONGO_URI)
 
-db = client["Attendance_DB"]
+def _write_checkpoint(csv_file_path, rows_done):
+    path = _checkpoint_path(csv_file_path)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump({"CSV": csv_file_path, "ROWS_DONE": rows_done}, f)
+    os.replace(f"{path}.tmp", path)
 
-csv_file_path = os.path.abspath("schema/sample_attendance_data.csv")
 
-df = pd.read_csv(csv_file_path)
+# Upserts for one chunk, built from whole columns instead of row by row.
+# Returns (operations, skipped row numbers).
+def build_operations(chunk, first_row):
+    columns = [
+        chunk[field].tolist() if field in chunk else [""] * len(chunk)
+        for field in WORKER_FIELDS
+    ]
+    operations = []
+    skipped = []
+    for offset, values in enumerate(zip(*columns)):
+        document = {
+            field: {"DESCRIPTION": description, "VALUE": value}
+            for (field, description), value in zip(WORKER_FIELDS.items(), values)
+        }
+        email = document["EMAIL"]["VALUE"]
+        phone = document["PHONE_NUMBER"]["VALUE"]
+        if not document["NAME"]["VALUE"] or not (email or phone):
+            skipped.append(first_row + offset)
+            continue
+        key = {"EMAIL.VALUE": email} if email else {"PHONE_NUMBER.VALUE": phone}
+        operations.append(UpdateOne(key, {"$set": document}, upsert=True))
+    return operations, skipped
 
 
-def transform_worker_data(row):
-    return {
-        "NAME": {"DESCRIPTION": "Worker Name", "VALUE": row["NAME"]},
-        "CITY": {"DESCRIPTION": "Worker City", "VALUE": row["CITY"]},
-        "ASSIGNED_CLIENT_ID": {
-            "DESCRIPTION": "Assigned Client",
-            "VALUE": row["ASSIGNED_CLIENT_ID"],
-        },
-        "STATUS": {"DESCRIPTION": "Labourer Status", "VALUE": row["STATUS"]},
-        "PHONE_NUMBER": {"DESCRIPTION": "Phone Number", "VALUE": row["PHONE_NUMBER"]},
-        "EMAIL": {"DESCRIPTION": "Email", "VALUE": row["EMAIL"]},
-    }
+def load_workers(csv_file_path, chunk_size=5000, restart=False):
+    db = get_db()
+    collection = db["Worker_Data"]
+    rows_done = 0 if restart else _read_checkpoint(csv_file_path)
+    if rows_done:
+        print(f"Resuming {csv_file_path} after {rows_done} rows.")
 
+    chunks = pd.read_csv(
+        csv_file_path,
+        chunksize=chunk_size,
+        dtype=str,
+        keep_default_na=False,
+        skiprows=range(1, rows_done + 1),
+    )
+    started = time.monotonic()
+    # Rows of a resumed run's earlier attempt do not count towards throughput
+    rows_this_run = 0
+    totals = {"UPSERTED": 0, "UPDATED": 0, "SKIPPED": 0, "FAILED": 0}
+    try:
+        for chunk in chunks:
+            operations, skipped = build_operations(chunk, rows_done + 1)
+            totals["SKIPPED"] += len(skipped)
+            for row_number in skipped:
+                print(
+                    f"Skipping row {row_number}: "
+                    "NAME and EMAIL or PHONE_NUMBER are required."
+                )
+            if operations:
+                try:
+                    result = collection.bulk_write(operations, ordered=False)
+                    totals["UPSERTED"] += result.upserted_count
+                    totals["UPDATED"] += result.modified_count
+                except BulkWriteError as bwe:
+                    details = bwe.details
+                    totals["UPSERTED"] += details["nUpserted"]
+                    totals["UPDATED"] += details["nModified"]
+                    totals["FAILED"] += len(details["writeErrors"])
+                    for error in details["writeErrors"]:
+                        print(
+                            f"Error writing row {rows_done + 1 + error['index']}: "
+                            f"{error['errmsg']}"
+                        )
+            rows_done += len(chunk)
+            rows_this_run += len(chunk)
+            _write_checkpoint(csv_file_path, rows_done)
+            elapsed = time.monotonic() - started
+            print(
+                f"{rows_done} rows processed, "
+                f"{totals['UPSERTED']} inserted, {totals['UPDATED']} updated, "
+                f"{totals['SKIPPED']} skipped, {totals['FAILED']} failed "
+                f"({rows_this_run / elapsed if elapsed else 0:.0f} rows/s)"
+            )
+    finally:
+        # The roster changed even if the run was interrupted
+        bump_version(db, "Worker_Data")
 
-records = df.apply(transform_worker_data, axis=1).tolist()
+    if os.path.exists(_checkpoint_path(csv_file_path)):
+        os.remove(_checkpoint_path(csv_file_path))
+    return totals
 
-collection = db["Worker_Data"]
 
-try:
-    result = collection.insert_many(records)
-    print(f"Inserted {len(result.inserted_ids)} records.")
-    if client:
-        client.close()
-        print("MongoDB connection closed.")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load workers from a roster CSV.")
+    parser.add_argument("csv", nargs="?", default=DEFAULT_CSV)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument(
+        "--restart", action="store_true", help="ignore the checkpoint of a previous run"
+    )
+    args = parser.parse_args()
 
-except BulkWriteError as bwe:
-    print(f"Error inserting data: {bwe.details}")
-    if client:
-        client.close()
-        print("MongoDB connection closed.")
+    load_dotenv()
+    print("Current Working Directory:", os.getcwd())
+    try:
+        # The unique natural-key indexes keep overlapping runs from duplicating
+        # workers; workers duplicated before they existed would block them
+        db = get_db()
+        merged = merge_duplicate_workers(db)
+        if merged:
+            print(
+                f"{merged} duplicate workers merged, "
+                "run `python -m lib.rollups` afterwards."
+            )
+        ensure_indexes(db)
+        if not unique_indexes_ready("Worker_Data"):
+            raise SystemExit("Unique indexes are missing, see the errors above.")
+        load_workers(os.path.abspath(args.csv), args.chunk_size, args.restart)
+    finally:
+        close_connection()
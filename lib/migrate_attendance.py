@@ -0,0 +1,32 @@
+# migrate_attendance.py
+# One-off migration of day documents written before per-worker records.
+#
+#   python -m lib.migrate_attendance [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+#
+# Days that still embed a WORKER_LIST are split into Worker_Attendance records.
+# Requests also do this lazily, but only for the days they happen to touch;
+# queries that read Worker_Attendance directly (worker history, rollups,
+# presentee exports) miss every day that was never migrated, so run this once
+# per deployment. Re-running is safe: migrated days no longer match. Workers
+# without a WORKER_ID are kept on the day document as UNMIGRATED_WORKER_LIST.
+import argparse
+
+from dotenv import load_dotenv
+
+from lib.connection import close_connection
+from lib.db import migrate_legacy_attendance
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Split legacy WORKER_LIST day documents."
+    )
+    parser.add_argument("--from", dest="date_from", help="first DATE to migrate")
+    parser.add_argument("--to", dest="date_to", help="last DATE to migrate")
+    args = parser.parse_args()
+
+    load_dotenv()
+    try:
+        migrated = migrate_legacy_attendance(args.date_from, args.date_to)
+        print(f"{migrated} legacy days migrated")
+    finally:
+        close_connection()
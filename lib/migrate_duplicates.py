@@ -0,0 +1,235 @@
+# migrate_duplicates.py
+# One-off merge of duplicate documents that block the unique indexes.
+#
+#   python -m lib.migrate_duplicates
+#
+# Workers sharing an EMAIL or a PHONE_NUMBER are merged into the oldest one:
+# its empty fields are filled from the newer duplicates, their attendance
+# records are moved to it (a day it already has keeps its own record) and the
+# days that lost a record are recounted. Customers sharing a NAME, EMAIL or
+# MOBILE are merged the same way, with their billing, day sheets and invoices.
+# Users sharing a username or an email are set aside. Nothing is deleted
+# outright, every merged document is kept in Merged_Duplicates with the _id it
+# was merged into. Re-running is safe: merged duplicates no longer match.
+#
+# Until it has run, the endpoints writing a collection whose unique index is
+# blocked answer 503. The worker loader runs the worker merge before it builds
+# the Worker_Data indexes. Run `python -m lib.rollups` afterwards, the rollups
+# of merged workers and customers are rebuilt from their moved records.
+import argparse
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+from lib.attendance import plain_value
+from lib.connection import close_connection, get_db
+from lib.versions import bump_version
+
+# Natural keys of the unique indexes, merged in this order
+WORKER_KEYS = ("EMAIL", "PHONE_NUMBER")
+CUSTOMER_KEYS = ("NAME", "EMAIL", "MOBILE")
+USER_KEYS = ("username", "email")
+
+
+# _ids of the documents sharing a value of field, one list per value with the
+# oldest _id first
+def _duplicate_groups(collection, field, query):
+    pipeline = [
+        {"$match": query},
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": f"${field}", "IDS": {"$push": "$_id"}}},
+        {"$match": {"IDS.1": {"$exists": True}}},
+    ]
+    return [group["IDS"] for group in collection.aggregate(pipeline, allowDiskUse=True)]
+
+
+# Keep documents removed by the merge, with the _id they were merged into
+def _set_aside(db, collection, documents, merged_into):
+    if not documents:
+        return
+    merged_at = datetime.now(timezone.utc)
+    db["Merged_Duplicates"].insert_many(
+        [
+            {
+                "COLLECTION": collection,
+                "MERGED_INTO": merged_into,
+                "MERGED_AT": merged_at,
+                "DOCUMENT": document,
+            }
+            for document in documents
+        ]
+    )
+    db[collection].delete_many(
+        {"_id": {"$in": [document["_id"] for document in documents]}}
+    )
+
+
+# Fields empty on the kept document and set on a duplicate, oldest first.
+# The natural keys are left alone so filling them cannot create new duplicates.
+def _fields_to_fill(kept, duplicates, keys):
+    fields = {}
+    for duplicate in duplicates:
+        for field, value in duplicate.items():
+            if field == "_id" or field in keys or field in fields:
+                continue
+            if plain_value(kept.get(field), "") == "" and plain_value(value, "") != "":
+                fields[field] = value
+    return fields
+
+
+# Point the documents of collection referencing a duplicate (field holds its
+# str(_id)) at the kept one. key is the other field of the collection's unique
+# index; a key value the kept _id already has keeps its own document and the
+# duplicate's is set aside. Returns the key values set aside.
+def _move_references(db, collection, field, key, kept_id, duplicate_ids):
+    documents = db[collection]
+    kept_keys = set(documents.distinct(key, {field: kept_id}))
+    dropped = []
+    for document in documents.find({field: {"$in": duplicate_ids}}).sort("_id", 1):
+        if document[key] in kept_keys:
+            dropped.append(document)
+            continue
+        documents.update_one({"_id": document["_id"]}, {"$set": {field: kept_id}})
+        kept_keys.add(document[key])
+    _set_aside(db, collection, dropped, kept_id)
+    return {document[key] for document in dropped}
+
+
+# Merge the workers sharing an EMAIL or a PHONE_NUMBER, returns the number of
+# duplicates merged
+def merge_duplicate_workers(db):
+    from lib.db import _recount_attendance, migrate_legacy_attendance
+
+    # Records still embedded in legacy day documents would not be moved
+    migrate_legacy_attendance()
+    workers = db["Worker_Data"]
+    merged = 0
+    recount = set()
+    for key in WORKER_KEYS:
+        field = f"{key}.VALUE"
+        for ids in _duplicate_groups(workers, field, {field: {"$gt": ""}}):
+            documents = {
+                document["_id"]: document
+                for document in workers.find({"_id": {"$in": ids}})
+            }
+            kept = documents[ids[0]]
+            duplicates = [documents[_id] for _id in ids[1:]]
+            fields = _fields_to_fill(kept, duplicates, WORKER_KEYS)
+            if fields:
+                workers.update_one({"_id": kept["_id"]}, {"$set": fields})
+            recount |= _move_references(
+                db,
+                "Worker_Attendance",
+                "WORKER_ID",
+                "DATE",
+                str(kept["_id"]),
+                [str(duplicate["_id"]) for duplicate in duplicates],
+            )
+            _set_aside(db, "Worker_Data", duplicates, kept["_id"])
+            print(
+                f"Merged {len(duplicates)} workers with {field} "
+                f"{kept[key]['VALUE']!r} into {kept['_id']}."
+            )
+            merged += len(duplicates)
+    for DATE in sorted(recount):
+        _recount_attendance(DATE)
+    if merged:
+        bump_version(db, "Worker_Data")
+    return merged
+
+
+# Merge the customers sharing a NAME, EMAIL or MOBILE, returns the number of
+# duplicates merged. Their billing, day sheets, invoices and assigned workers
+# move to the kept customer.
+def merge_duplicate_customers(db):
+    from lib.db import _migrate_legacy_billing
+
+    customers = db["Customers"]
+    merged = 0
+    for key in CUSTOMER_KEYS:
+        field = f"CUSTOMER_DATA.{key}.VALUE"
+        # The customer indexes are not partial: customers without the field
+        # collide on null as well
+        for ids in _duplicate_groups(customers, field, {}):
+            documents = {
+                document["_id"]: document
+                for document in customers.find({"_id": {"$in": ids}})
+            }
+            kept = documents[ids[0]]
+            duplicates = [documents[_id] for _id in ids[1:]]
+            for customer in documents.values():
+                _migrate_legacy_billing(customer)
+            fields = _fields_to_fill(
+                kept.get("CUSTOMER_DATA") or {},
+                [duplicate.get("CUSTOMER_DATA") or {} for duplicate in duplicates],
+                CUSTOMER_KEYS,
+            )
+            if fields:
+                customers.update_one(
+                    {"_id": kept["_id"]},
+                    {
+                        "$set": {
+                            f"CUSTOMER_DATA.{name}": value
+                            for name, value in fields.items()
+                        }
+                    },
+                )
+            kept_id = str(kept["_id"])
+            duplicate_ids = [str(duplicate["_id"]) for duplicate in duplicates]
+            _move_references(
+                db, "Client_Attendance", "CLIENT_ID", "DATE", kept_id, duplicate_ids
+            )
+            _move_references(
+                db, "Invoices", "CLIENT_ID", "MONTH", kept_id, duplicate_ids
+            )
+            db["Daily_Attendance"].update_many(
+                {"CLIENT_ID": {"$in": duplicate_ids}},
+                {"$set": {"CLIENT_ID": kept_id}, "$inc": {"REVISION": 1}},
+            )
+            db["Worker_Data"].update_many(
+                {"ASSIGNED_CLIENT_ID.VALUE": {"$in": duplicate_ids}},
+                {"$set": {"ASSIGNED_CLIENT_ID.VALUE": kept_id}},
+            )
+            _set_aside(db, "Customers", duplicates, kept["_id"])
+            print(f"Merged {len(duplicates)} customers with the {field} of {kept_id}.")
+            merged += len(duplicates)
+    if merged:
+        bump_version(db, "Customers")
+        bump_version(db, "Worker_Data")
+    return merged
+
+
+# Set aside the users sharing a username or an email, newest first; returns
+# the number set aside. Accounts can not be merged, the users set aside have
+# to register again. Emails were never checked before the unique index
+# (the lookup used an "email " key).
+def merge_duplicate_users(db):
+    users = db["Users"]
+    merged = 0
+    for field in USER_KEYS:
+        for ids in _duplicate_groups(users, field, {}):
+            duplicates = list(users.find({"_id": {"$in": ids[1:]}}))
+            _set_aside(db, "Users", duplicates, ids[0])
+            for duplicate in duplicates:
+                print(
+                    f"Set aside user {duplicate.get('username')!r}: "
+                    f"{field} {duplicate.get(field)!r} belongs to user {ids[0]}."
+                )
+            merged += len(duplicates)
+    return merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Merge duplicates blocking the unique indexes."
+    )
+    parser.parse_args()
+
+    load_dotenv()
+    try:
+        db = get_db()
+        print(f"{merge_duplicate_workers(db)} duplicate workers merged")
+        print(f"{merge_duplicate_customers(db)} duplicate customers merged")
+        print(f"{merge_duplicate_users(db)} duplicate users set aside")
+    finally:
+        close_connection()
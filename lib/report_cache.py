@@ -0,0 +1,61 @@
+# report_cache.py
+# Cache of rendered reports keyed by (date, revision, format). A day's revision
+# is bumped on every attendance update, so cached entries never go stale; old
+# revisions simply age out of the LRU. REPORT_CACHE_DIR optionally adds a disk
+# tier that survives restarts and is shared by gunicorn workers.
+import os
+import threading
+from collections import OrderedDict
+
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "64"))
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR")
+
+_lock = threading.Lock()
+_cache = OrderedDict()
+
+
+def report_etag(key):
+    return "-".join(str(part) for part in key)
+
+
+def _cache_path(key):
+    return os.path.join(REPORT_CACHE_DIR, report_etag(key))
+
+
+def get_cached_report(key):
+    with _lock:
+        report = _cache.get(key)
+        if report is not None:
+            _cache.move_to_end(key)
+            return report
+    if REPORT_CACHE_DIR and os.path.exists(_cache_path(key)):
+        with open(_cache_path(key), "rb") as file:
+            report = file.read()
+        _store(key, report)
+        return report
+    return None
+
+
+def _store(key, report):
+    with _lock:
+        _cache[key] = report
+        _cache.move_to_end(key)
+        while len(_cache) > REPORT_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+# Pass the chunks through and cache the report once it was fully generated
+def cache_report(key, chunks):
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    report = b"".join(parts)
+    _store(key, report)
+    if REPORT_CACHE_DIR:
+        os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+        # Write then rename, so other workers never read a partial file
+        temporary_path = f"{_cache_path(key)}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(report)
+        os.replace(temporary_path, _cache_path(key))
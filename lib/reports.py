@@ -0,0 +1,260 @@
+# reports.py
+# Streaming CSV and PDF report rendering. Renderers take an iterable of row
+# tuples and yield encoded chunks, so a report is never held in memory whole
+# and nothing touches the filesystem unless save_report() is asked to.
+import csv
+import io
+import os
+from collections import deque
+
+REPORT_COLUMNS = ("Name", "Email", "Phone")
+REPORT_DIR = os.getenv("REPORT_DIR", "reports")
+REPORT_FORMATS = {"csv": "text/csv", "pdf": "application/pdf"}
+
+CHUNK_SIZE = 16 * 1024
+
+
+def iter_csv(rows, columns=REPORT_COLUMNS):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+# A4 portrait, in points
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 40
+FONT_SIZE = 10
+LINE_HEIGHT = 14
+ROWS_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN - 3 * LINE_HEIGHT) // LINE_HEIGHT
+
+
+def _pdf_text(value, max_chars):
+    text = str(value)
+    if len(text) > max_chars:
+        text = text[: max_chars - 3] + "..."
+    text = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return text.encode("cp1252", "replace")
+
+
+class _PdfObjects:
+    # Tracks byte offsets of written objects for the cross-reference table
+    def __init__(self):
+        self.position = 0
+        self.offsets = {}
+
+    def raw(self, data):
+        self.position += len(data)
+        return data
+
+    def obj(self, number, body):
+        self.offsets[number] = self.position
+        return self.raw(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+
+def _pdf_page_content(title, columns, rows, page_number):
+    column_width = (PAGE_WIDTH - 2 * MARGIN) / len(columns)
+    max_chars = int(column_width / (FONT_SIZE * 0.5))
+    lines = [b"BT", b"/F1 %d Tf" % (FONT_SIZE + 2)]
+    y = PAGE_HEIGHT - MARGIN
+    lines.append(b"1 0 0 1 %d %d Tm (%s) Tj" % (MARGIN, y, _pdf_text(title, 90)))
+    lines.append(b"/F1 %d Tf" % FONT_SIZE)
+    for index, row in enumerate([columns] + rows):
+        y = PAGE_HEIGHT - MARGIN - (index + 2) * LINE_HEIGHT
+        for column, value in enumerate(row):
+            x = MARGIN + column * column_width
+            lines.append(
+                b"1 0 0 1 %.1f %d Tm (%s) Tj" % (x, y, _pdf_text(value, max_chars))
+            )
+    lines.append(
+        b"1 0 0 1 %d %d Tm (Page %d) Tj"
+        % (PAGE_WIDTH - MARGIN - 40, MARGIN // 2, page_number)
+    )
+    lines.append(b"ET")
+    return b"\n".join(lines)
+
+
+# Minimal PDF writer: a table with a title line, one page per ROWS_PER_PAGE rows.
+# Object 1 is the catalog, 2 the page tree (written last, once all pages are
+# known) and 3 the Helvetica font.
+def iter_pdf(rows, title, columns=REPORT_COLUMNS):
+    pdf = _PdfObjects()
+    yield pdf.raw(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    yield pdf.obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+    yield pdf.obj(
+        3,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica"
+        b" /Encoding /WinAnsiEncoding >>",
+    )
+    next_number = 4
+    page_numbers = []
+    page_rows = []
+    rows = iter(rows)
+    while True:
+        row = next(rows, None)
+        if row is not None:
+            page_rows.append(row)
+        if len(page_rows) < ROWS_PER_PAGE and row is not None:
+            continue
+        if page_rows or not page_numbers:
+            content = _pdf_page_content(
+                title, columns, page_rows, len(page_numbers) + 1
+            )
+            yield pdf.obj(
+                next_number,
+                b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream",
+            )
+            yield pdf.obj(
+                next_number + 1,
+                b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d]"
+                b" /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+                % (PAGE_WIDTH, PAGE_HEIGHT, next_number),
+            )
+            page_numbers.append(next_number + 1)
+            next_number += 2
+            page_rows = []
+        if row is None:
+            break
+    kids = b" ".join(b"%d 0 R" % number for number in page_numbers)
+    yield pdf.obj(
+        2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_numbers))
+    )
+    xref_offset = pdf.position
+    xref = [b"xref", b"0 %d" % next_number, b"0000000000 65535 f "]
+    xref += [
+        b"%010d 00000 n " % pdf.offsets[number] for number in range(1, next_number)
+    ]
+    yield pdf.raw(
+        b"\n".join(xref)
+        + b"\ntrailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+        % (next_number, xref_offset)
+    )
+
+
+def render_report(rows, output_format, title, columns=REPORT_COLUMNS):
+    if output_format == "pdf":
+        return iter_pdf(rows, title, columns)
+    return iter_csv(rows, columns)
+
+
+def report_filename(name, output_format):
+    return f"{name}.{output_format}"
+
+
+# Write the chunks to REPORT_DIR while passing them through
+def save_report(chunks, filename):
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    report_path = os.path.join(REPORT_DIR, filename)
+    with open(report_path, "wb") as file:
+        for chunk in chunks:
+            file.write(chunk)
+            yield chunk
+    print(f"Report saved to {report_path}")
+
+
+# Range exports: per-day reports are rendered in a process pool, at most
+# 2 * REPORT_WORKERS at a time, and streamed into a ZIP archive in DATE order.
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+
+_pool = None
+_pool_pid = None
+
+
+def _get_pool():
+    global _pool, _pool_pid
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # A pool inherited through a gunicorn fork is not usable, start a fresh one
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = ProcessPoolExecutor(
+            max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+        _pool_pid = os.getpid()
+    return _pool
+
+
+def render_report_bytes(rows, output_format, title, columns=REPORT_COLUMNS):
+    return b"".join(render_report(rows, output_format, title, columns))
+
+
+def _render_in_pool(jobs):
+    pool = _get_pool()
+    pending = deque()
+    for job in jobs:
+        filename, arguments = job
+        pending.append((filename, pool.submit(render_report_bytes, *arguments)))
+        if len(pending) >= 2 * REPORT_WORKERS:
+            filename, future = pending.popleft()
+            yield filename, future.result()
+    while pending:
+        filename, future = pending.popleft()
+        yield filename, future.result()
+
+
+class _ZipStream(io.RawIOBase):
+    # Write-only, unseekable sink; zipfile falls back to data descriptors
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+# jobs: iterable of (filename, (rows, output_format, title, columns)), rendered
+# in the process pool and streamed into a ZIP archive in order
+def iter_archive(jobs):
+    import zipfile
+
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for filename, report in _render_in_pool(jobs):
+            archive.writestr(filename, report)
+            yield stream.drain()
+    yield stream.drain()
+
+
+# days: iterable of (DATE, rows). mode "daily" renders one file per day,
+# "consolidated" a single file with a Date column. Both render in the process
+# pool, the consolidated rows are collected first to be sent there.
+def iter_report_archive(days, output_format, mode, name):
+    if mode != "consolidated":
+        jobs = (
+            (
+                report_filename(f"attendance_report_{date}", output_format),
+                (rows, output_format, f"Attendance Report - {date} - Presentees"),
+            )
+            for date, rows in days
+        )
+        yield from iter_archive(jobs)
+        return
+
+    rows = [(date,) + tuple(row) for date, day_rows in days for row in day_rows]
+    jobs = [
+        (
+            report_filename(name, output_format),
+            (rows, output_format, f"{name} - Presentees", ("Date",) + REPORT_COLUMNS),
+        )
+    ]
+    yield from iter_archive(jobs)
@@ -0,0 +1,247 @@
+# rollups.py
+# Monthly attendance rollups, kept up to date incrementally.
+#
+#   python -m lib.rollups [--month YYYY-MM]
+#
+# Worker_Rollups holds PRESENT/ABSENT per (WORKER_ID, MONTH) and Client_Rollups
+# PRESENT/ABSENT worker-days and signed DAYS per (CLIENT_ID, MONTH). Attendance
+# writes apply only the status differences they make as $inc upserts, so the
+# summary screens read a few rollup documents instead of every day sheet. The
+# command rebuilds the rollups from the attendance records, for the backfill
+# or to repair drift; it first creates the indexes and splits legacy day
+# documents, whose workers would otherwise be counted as zero.
+import argparse
+from datetime import datetime, timezone
+
+from pymongo import ASCENDING, ReplaceOne, UpdateOne
+from dotenv import load_dotenv
+
+from lib.archive import iter_archived_months
+from lib.attendance import MONTH_PATTERN, month_query, plain_value
+from lib.connection import close_connection, get_db
+
+STATUSES = ("PRESENT", "ABSENT")
+
+
+def _month(DATE):
+    return DATE[:7]
+
+
+# transitions: (WORKER_ID, old STATUS, new STATUS) of the worker records written.
+# before / after: (CLIENT_ID, PRESENT, ABSENT) of the day header around the write.
+def apply_attendance_changes(db, DATE, transitions, before, after):
+    month = _month(DATE)
+
+    worker_deltas = {}
+    for worker_id, old_status, new_status in transitions:
+        old_status, new_status = plain_value(old_status), plain_value(new_status)
+        if old_status == new_status:
+            continue
+        delta = worker_deltas.setdefault(worker_id, dict.fromkeys(STATUSES, 0))
+        if old_status in delta:
+            delta[old_status] -= 1
+        if new_status in delta:
+            delta[new_status] += 1
+    worker_operations = [
+        UpdateOne(
+            {"WORKER_ID": worker_id, "MONTH": month}, {"$inc": delta}, upsert=True
+        )
+        for worker_id, delta in worker_deltas.items()
+        if any(delta.values())
+    ]
+
+    client_deltas = {}
+    old_client, old_present, old_absent = before
+    new_client, new_present, new_absent = after
+    if old_client == new_client:
+        client_deltas[new_client] = {
+            "PRESENT": new_present - old_present,
+            "ABSENT": new_absent - old_absent,
+        }
+    else:
+        # The day was signed for another client: move its counts across
+        client_deltas[old_client] = {
+            "PRESENT": -old_present,
+            "ABSENT": -old_absent,
+            "DAYS": -1,
+        }
+        client_deltas[new_client] = {
+            "PRESENT": new_present,
+            "ABSENT": new_absent,
+            "DAYS": 1,
+        }
+    client_operations = [
+        UpdateOne(
+            {"CLIENT_ID": client_id, "MONTH": month}, {"$inc": delta}, upsert=True
+        )
+        for client_id, delta in client_deltas.items()
+        if client_id and any(delta.values())
+    ]
+
+    if worker_operations:
+        db["Worker_Rollups"].bulk_write(worker_operations, ordered=False)
+    if client_operations:
+        db["Client_Rollups"].bulk_write(client_operations, ordered=False)
+
+
+def _status_count(status):
+    value = {"$ifNull": ["$STATUS.VALUE", "$STATUS"]}
+    return {"$sum": {"$cond": [{"$eq": [value, status]}, 1, 0]}}
+
+
+# Recompute the rollups from Worker_Attendance and the day headers, for one
+# month or for the whole history. Archived months are counted from the archive.
+# Rollups are replaced in place and stamped with REBUILT_AT; the ones this run
+# did not produce are removed at the end, so summaries never read an empty
+# collection while it runs. $merge needs the unique rollup indexes.
+def rebuild_rollups(db, month=None):
+    rollup_filter = {} if month is None else {"MONTH": month}
+    rebuilt_at = datetime.now(timezone.utc)
+
+    db["Worker_Attendance"].aggregate(
+        [
+            {"$match": {"WORKER_ID": {"$nin": ["", None]}, **month_query(month)}},
+            {
+                "$group": {
+                    "_id": {
+                        "WORKER_ID": "$WORKER_ID",
+                        "MONTH": {"$substrBytes": ["$DATE", 0, 7]},
+                    },
+                    "PRESENT": _status_count("PRESENT"),
+                    "ABSENT": _status_count("ABSENT"),
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "WORKER_ID": "$_id.WORKER_ID",
+                    "MONTH": "$_id.MONTH",
+                    "PRESENT": 1,
+                    "ABSENT": 1,
+                    "REBUILT_AT": {"$literal": rebuilt_at},
+                }
+            },
+            {
+                "$merge": {
+                    "into": "Worker_Rollups",
+                    "on": ["WORKER_ID", "MONTH"],
+                    "whenMatched": "replace",
+                }
+            },
+        ]
+    )
+    db["Daily_Attendance"].aggregate(
+        [
+            {"$match": {"CLIENT_ID": {"$nin": ["", None]}, **month_query(month)}},
+            {
+                "$group": {
+                    "_id": {
+                        "CLIENT_ID": "$CLIENT_ID",
+                        "MONTH": {"$substrBytes": ["$DATE", 0, 7]},
+                    },
+                    "PRESENT": {"$sum": {"$ifNull": ["$PRESENT", 0]}},
+                    "ABSENT": {"$sum": {"$ifNull": ["$ABSENT", 0]}},
+                    "DAYS": {"$sum": 1},
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "CLIENT_ID": "$_id.CLIENT_ID",
+                    "MONTH": "$_id.MONTH",
+                    "PRESENT": 1,
+                    "ABSENT": 1,
+                    "DAYS": 1,
+                    "REBUILT_AT": {"$literal": rebuilt_at},
+                }
+            },
+            {
+                "$merge": {
+                    "into": "Client_Rollups",
+                    "on": ["CLIENT_ID", "MONTH"],
+                    "whenMatched": "replace",
+                }
+            },
+        ]
+    )
+    for archived in iter_archived_months(db, month, month):
+        for collection, key, rollups in (
+            ("Worker_Rollups", "WORKER_ID", archived.worker_rollups()),
+            ("Client_Rollups", "CLIENT_ID", archived.client_rollups()),
+        ):
+            operations = [
+                ReplaceOne(
+                    {key: rollup[key], "MONTH": rollup["MONTH"]},
+                    {**rollup, "REBUILT_AT": rebuilt_at},
+                    upsert=True,
+                )
+                for rollup in rollups
+            ]
+            if operations:
+                db[collection].bulk_write(operations, ordered=False)
+
+    stale = {**rollup_filter, "REBUILT_AT": {"$ne": rebuilt_at}}
+    db["Worker_Rollups"].delete_many(stale)
+    db["Client_Rollups"].delete_many(stale)
+
+
+# Summary of the months FROM..TO (inclusive, YYYY-MM) read from one rollup
+# collection: {KEY: {"PRESENT", "ABSENT", ..., "MONTHS": {MONTH: counts}}}
+def get_rollup_summary(collection, key, month_from, month_to, key_value=None):
+    db = get_db()
+    query = {"MONTH": {"$gte": month_from, "$lte": month_to}}
+    if key_value is not None:
+        query[key] = key_value
+    summary = {}
+    cursor = (
+        db[collection]
+        .find(query, {"_id": 0, "REBUILT_AT": 0})
+        .sort([(key, ASCENDING), ("MONTH", ASCENDING)])
+    )
+    for rollup in cursor:
+        totals = summary.setdefault(rollup.pop(key), {"MONTHS": {}})
+        totals["MONTHS"][rollup.pop("MONTH")] = rollup
+        for name, count in rollup.items():
+            totals[name] = totals.get(name, 0) + count
+    return summary
+
+
+def get_worker_summary(month_from, month_to, WORKER_ID=None):
+    return get_rollup_summary(
+        "Worker_Rollups", "WORKER_ID", month_from, month_to, WORKER_ID
+    )
+
+
+def get_client_summary(month_from, month_to, CLIENT_ID=None):
+    return get_rollup_summary(
+        "Client_Rollups", "CLIENT_ID", month_from, month_to, CLIENT_ID
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Rebuild the monthly attendance rollups."
+    )
+    parser.add_argument("--month", help="YYYY-MM, defaults to the whole history")
+    args = parser.parse_args()
+
+    if args.month is not None and not MONTH_PATTERN.match(args.month):
+        parser.error("--month must be in YYYY-MM format")
+
+    load_dotenv()
+    from lib.db import migrate_legacy_attendance
+    from lib.indexes import ATTENDANCE_COLLECTIONS, ensure_indexes, unique_indexes_ready
+
+    try:
+        db = get_db()
+        ensure_indexes(db)
+        if not unique_indexes_ready(*ATTENDANCE_COLLECTIONS):
+            raise SystemExit("Unique indexes are missing, see the errors above.")
+        if args.month is None:
+            migrate_legacy_attendance()
+        else:
+            migrate_legacy_attendance(f"{args.month}-01", f"{args.month}-31")
+        rebuild_rollups(db, args.month)
+        print(f"Rollups rebuilt for {args.month or 'all months'}")
+    finally:
+        close_connection()
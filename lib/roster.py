@@ -0,0 +1,57 @@
+# roster.py
+# In-process cache of the worker roster used to seed new day sheets.
+# The cache is keyed by the Worker_Data version counter, which is polled at
+# most every ROSTER_POLL_SECONDS, so new day sheets skip the Worker_Data scan.
+# Writes that do not bump the counter are still noticed through the document
+# count and the newest _id (lib.versions.collection_version); in-place edits of
+# existing workers need a version bump.
+import os
+import threading
+import time
+
+from lib.versions import collection_version
+
+ROSTER_POLL_SECONDS = float(os.getenv("ROSTER_POLL_SECONDS", "5"))
+
+_lock = threading.Lock()
+_cache = {"VERSION": None, "ROSTER": [], "CHECKED_AT": 0.0}
+_stats = {"HITS": 0, "MISSES": 0}
+
+
+# Return the roster, rebuilding it with build_roster() when Worker_Data changed
+def get_roster(db, build_roster):
+    with _lock:
+        now = time.monotonic()
+        if (
+            _cache["VERSION"] is not None
+            and now - _cache["CHECKED_AT"] < ROSTER_POLL_SECONDS
+        ):
+            _stats["HITS"] += 1
+            return [dict(worker) for worker in _cache["ROSTER"]]
+
+        version = collection_version(db, "Worker_Data")
+        _cache["CHECKED_AT"] = now
+        if version == _cache["VERSION"]:
+            _stats["HITS"] += 1
+        else:
+            _stats["MISSES"] += 1
+            _cache["ROSTER"] = sorted(
+                build_roster(), key=lambda worker: worker["WORKER_ID"]
+            )
+            _cache["VERSION"] = version
+        return [dict(worker) for worker in _cache["ROSTER"]]
+
+
+def invalidate_roster():
+    with _lock:
+        _cache["VERSION"] = None
+
+
+def roster_cache_stats():
+    with _lock:
+        return {
+            "HITS": _stats["HITS"],
+            "MISSES": _stats["MISSES"],
+            "VERSION": _cache["VERSION"][0] if _cache["VERSION"] else None,
+            "SIZE": len(_cache["ROSTER"]),
+        }
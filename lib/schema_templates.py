@@ -0,0 +1,83 @@
+# schema_templates.py
+# The client and worker schema CSVs compiled once into immutable form templates.
+# With SCHEMA_HOT_RELOAD=true a template is recompiled when its CSV's mtime changes.
+import csv
+import os
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+SCHEMA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "schema"
+)
+CLIENT_SCHEMA_CSV = os.path.join(SCHEMA_DIR, "Attendance Schema - Client.csv")
+WORKER_SCHEMA_CSV = os.path.join(SCHEMA_DIR, "Attendance Schema - Workers.csv")
+
+SCHEMA_HOT_RELOAD = os.getenv("SCHEMA_HOT_RELOAD", "false").lower() == "true"
+
+# India has a fixed UTC offset, no tz database needed
+IST = timezone(timedelta(hours=5, minutes=30), "IST")
+
+SchemaField = namedtuple(
+    "SchemaField", ["NAME", "DESCRIPTION", "DATA_TYPE", "VALIDATION_RULES", "COMMENT"]
+)
+
+_lock = threading.Lock()
+# csv path -> (mtime, tuple of SchemaField)
+_templates = {}
+
+
+def _compile(csv_file_path):
+    with open(csv_file_path, newline="") as f:
+        return tuple(
+            SchemaField(
+                NAME=row["VARIABLE NAME"],
+                DESCRIPTION=row["DESCRIPTION"],
+                DATA_TYPE=row["DATA TYPE"] or "",
+                VALIDATION_RULES=row["VALIDATION RULES"] or "",
+                COMMENT=row["COMMENT"] or "",
+            )
+            for row in csv.DictReader(f)
+        )
+
+
+# Compiled fields of a schema CSV
+def get_schema_fields(csv_file_path):
+    compiled = _templates.get(csv_file_path)
+    if compiled is not None and not SCHEMA_HOT_RELOAD:
+        return compiled[1]
+    mtime = os.path.getmtime(csv_file_path)
+    if compiled is not None and compiled[0] == mtime:
+        return compiled[1]
+    with _lock:
+        fields = _compile(csv_file_path)
+        _templates[csv_file_path] = (mtime, fields)
+        print(f"Compiled schema template {os.path.basename(csv_file_path)}")
+    return fields
+
+
+def _new_form(csv_file_path):
+    return {
+        field.NAME: {"DESCRIPTION": field.DESCRIPTION, "VALUE": ""}
+        for field in get_schema_fields(csv_file_path)
+    }
+
+
+def created_on_ist():
+    return datetime.now(IST).strftime("%Y-%m-%d %H:%M:%S %Z%z")
+
+
+def new_client_form():
+    return {
+        "CREATED_ON": created_on_ist(),
+        "CUSTOMER_DATA": _new_form(CLIENT_SCHEMA_CSV),
+    }
+
+
+def new_worker_form():
+    return {"CREATED_ON": created_on_ist(), "WORKER_DATA": _new_form(WORKER_SCHEMA_CSV)}
+
+
+# Compile at import so the first request does not pay for it
+get_schema_fields(CLIENT_SCHEMA_CSV)
+get_schema_fields(WORKER_SCHEMA_CSV)
@@ -0,0 +1,175 @@
+# tokens.py
+# Signed, expiring access tokens issued by /auth/login. Verifying a token only
+# checks its signature, age and the in-memory revocation cache: no bcrypt after
+# login. Logouts are stored in Revoked_Tokens and a background thread of every
+# process polls for new ones each REVOCATION_POLL_SECONDS, so a revoked token
+# stops working on the other workers within that delay. Only the first
+# verification of a process waits for the database, for the initial load of
+# the revocations (bounded by REVOCATION_TIMEOUT_SECONDS).
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from flask import g, jsonify, request
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+
+TOKEN_TTL_SECONDS = int(os.getenv("TOKEN_TTL_SECONDS", "43200"))
+AUTH_REQUIRED = os.getenv("AUTH_REQUIRED", "true").lower() == "true"
+REVOCATION_POLL_SECONDS = float(os.getenv("REVOCATION_POLL_SECONDS", "5"))
+REVOCATION_TIMEOUT_SECONDS = float(os.getenv("REVOCATION_TIMEOUT_SECONDS", "1"))
+
+_serializer = None
+_lock = threading.Lock()
+# jti -> time after which the revoked token would have expired anyway
+_revoked = {}
+_polled_since = None
+# Process the poller thread runs in, it does not survive a fork
+_poller_pid = None
+_poller_lock = threading.Lock()
+
+
+# Called at startup: tokens signed with a per-process key would only verify in
+# the worker that issued them
+def check_secret_key():
+    if AUTH_REQUIRED and not os.getenv("SECRET_KEY"):
+        raise RuntimeError(
+            "SECRET_KEY must be set when AUTH_REQUIRED is on "
+            "(set AUTH_REQUIRED=false to disable auth)."
+        )
+
+
+def _get_serializer():
+    global _serializer
+    if _serializer is None:
+        secret_key = os.getenv("SECRET_KEY")
+        if not secret_key:
+            # Only reachable with AUTH_REQUIRED=false, see check_secret_key
+            print("SECRET_KEY is not set, using a random per-process key.")
+            secret_key = uuid.uuid4().hex
+        _serializer = URLSafeTimedSerializer(secret_key, salt="access-token")
+    return _serializer
+
+
+# Forget revoked tokens that expired anyway, with _lock held
+def _prune_revoked(now):
+    for jti, expires_at in list(_revoked.items()):
+        if expires_at < now:
+            del _revoked[jti]
+
+
+# Pull the revocations made by other processes since the previous poll
+def _poll_revocations():
+    global _polled_since
+    import pymongo
+    from pymongo.errors import PyMongoError
+
+    from lib.connection import get_db
+
+    with _lock:
+        since = _polled_since
+    started = datetime.now(timezone.utc)
+    # Overlap the previous poll so clock skew between processes loses nothing
+    if since is None:
+        query = {"EXPIRES_AT": {"$gt": started}}
+    else:
+        query = {
+            "REVOKED_AT": {"$gt": since - timedelta(seconds=REVOCATION_POLL_SECONDS)}
+        }
+    try:
+        with pymongo.timeout(REVOCATION_TIMEOUT_SECONDS):
+            revoked = list(get_db()["Revoked_Tokens"].find(query, {"EXPIRES_AT": 1}))
+    except PyMongoError as e:
+        print(f"Unable to poll revoked tokens: {e}")
+        return
+    with _lock:
+        for token in revoked:
+            expires_at = token["EXPIRES_AT"].replace(tzinfo=timezone.utc)
+            _revoked[token["_id"]] = expires_at.timestamp()
+        _prune_revoked(time.time())
+        _polled_since = started
+
+
+def _poll_revocations_forever():
+    while True:
+        time.sleep(REVOCATION_POLL_SECONDS)
+        _poll_revocations()
+
+
+# Load the revocations and start the poller, once per process; concurrent
+# first verifications wait for the initial load
+def _start_poller():
+    global _poller_pid
+    pid = os.getpid()
+    if _poller_pid == pid:
+        return
+    with _poller_lock:
+        if _poller_pid == pid:
+            return
+        _poll_revocations()
+        threading.Thread(target=_poll_revocations_forever, daemon=True).start()
+        _poller_pid = pid
+
+
+def issue_token(username):
+    return _get_serializer().dumps({"sub": username, "jti": uuid.uuid4().hex})
+
+
+# Payload of a valid token, None if it is malformed, expired or revoked
+def verify_token(token):
+    try:
+        payload = _get_serializer().loads(token, max_age=TOKEN_TTL_SECONDS)
+    except (BadSignature, SignatureExpired):
+        return None
+    _start_poller()
+    with _lock:
+        if payload.get("jti") in _revoked:
+            return None
+    return payload
+
+
+def revoke_token(token):
+    payload = verify_token(token)
+    if payload is None:
+        return False
+    from lib.connection import get_db
+
+    now = time.time()
+    revoked_at = datetime.now(timezone.utc)
+    get_db()["Revoked_Tokens"].update_one(
+        {"_id": payload["jti"]},
+        {
+            "$set": {
+                "REVOKED_AT": revoked_at,
+                # TTL index removes the entry once the token expired anyway
+                "EXPIRES_AT": revoked_at + timedelta(seconds=TOKEN_TTL_SECONDS),
+            }
+        },
+        upsert=True,
+    )
+    with _lock:
+        _revoked[payload["jti"]] = now + TOKEN_TTL_SECONDS
+        _prune_revoked(now)
+    return True
+
+
+def bearer_token():
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        return header[len("Bearer ") :].strip()
+    return None
+
+
+# before_request hook protecting a blueprint, disabled with AUTH_REQUIRED=false
+def require_token():
+    if not AUTH_REQUIRED or request.method == "OPTIONS":
+        return None
+    token = bearer_token()
+    if token is None:
+        return jsonify({"message": "Authorization token is required."}), 401
+    payload = verify_token(token)
+    if payload is None:
+        return jsonify({"message": "Invalid or expired token."}), 401
+    g.user = payload["sub"]
+    return None
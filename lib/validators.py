@@ -0,0 +1,120 @@
+# validators.py
+# Field validators compiled from the schema CSVs: one precompiled regex or type
+# check per field, built once per template, so bad payloads are rejected before
+# any database round trip. Types follow lib/generate_schema.py; fields named
+# *EMAIL get its email pattern. Empty values are left to the required checks.
+import json
+import re
+
+from lib.schema_templates import CLIENT_SCHEMA_CSV, get_schema_fields
+
+EMAIL_PATTERN = re.compile(r"^[\w\.-]+@[\w\.-]+\.\w+$")
+# Numbers are typed in as phone numbers too: +91-98765 43210
+NUMBER_PATTERN = re.compile(r"^\+?[\d\s().-]{1,20}$")
+# ISO dates, optionally with a time, or DD/MM/YYYY as typed in the front end
+DATE_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2}|\d{2}[/-]\d{2}[/-]\d{4})")
+
+# csv path -> (compiled fields, validators)
+_compiled = {}
+
+
+def _is_string(value):
+    return isinstance(value, str)
+
+
+def _is_number(value):
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return True
+    return isinstance(value, str) and NUMBER_PATTERN.match(value) is not None
+
+
+def _is_date(value):
+    return isinstance(value, str) and DATE_PATTERN.match(value) is not None
+
+
+def _is_object(value):
+    return isinstance(value, dict)
+
+
+def _is_email(value):
+    return isinstance(value, str) and EMAIL_PATTERN.match(value) is not None
+
+
+TYPE_CHECKS = {
+    "string": _is_string,
+    "number": _is_number,
+    "date": _is_date,
+    "object": _is_object,
+    "email": _is_email,
+}
+
+
+def _rules(field):
+    try:
+        rules = json.loads(field.VALIDATION_RULES) if field.VALIDATION_RULES else None
+    except json.JSONDecodeError:
+        return None
+    return rules if isinstance(rules, dict) else None
+
+
+def _compile_field(field):
+    data_type = field.DATA_TYPE.strip().lower()
+    if field.NAME.endswith("EMAIL"):
+        data_type = "email"
+    checks = []
+    if data_type in TYPE_CHECKS:
+        checks.append(TYPE_CHECKS[data_type])
+    rules = _rules(field) or {}
+    if "pattern" in rules:
+        pattern = re.compile(rules["pattern"])
+        checks.append(
+            lambda value: isinstance(value, str) and pattern.search(value) is not None
+        )
+    if "enum" in rules:
+        allowed = frozenset(rules["enum"])
+        checks.append(lambda value: value in allowed)
+    if "maxLength" in rules:
+        max_length = rules["maxLength"]
+        checks.append(
+            lambda value: not isinstance(value, str) or len(value) <= max_length
+        )
+    required = "required" in field.COMMENT.lower()
+    return field.NAME, required, tuple(checks)
+
+
+def get_validators(csv_file_path):
+    fields = get_schema_fields(csv_file_path)
+    compiled = _compiled.get(csv_file_path)
+    # A hot reloaded template comes back as a new tuple
+    if compiled is None or compiled[0] is not fields:
+        compiled = (fields, tuple(_compile_field(field) for field in fields))
+        _compiled[csv_file_path] = compiled
+    return compiled[1]
+
+
+# Validate the {FIELD: {"VALUE": ...}} fields of a form, returns the name of the
+# first invalid field and whether it is missing, or None if the form is valid
+def find_invalid_field(csv_file_path, fields):
+    for name, required, checks in get_validators(csv_file_path):
+        entry = fields.get(name)
+        if entry is None:
+            if required:
+                return name, True
+            continue
+        if not isinstance(entry, dict):
+            return name, False
+        value = entry.get("VALUE", "")
+        if value == "" or value is None:
+            if required:
+                return name, True
+            continue
+        for check in checks:
+            if not check(value):
+                return name, False
+    return None
+
+
+def validate_client_fields(fields):
+    return find_invalid_field(CLIENT_SCHEMA_CSV, fields)
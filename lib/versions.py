@@ -0,0 +1,28 @@
+# versions.py
+# Per-collection version counters, bumped by every write path of a collection so
+# in-process caches can tell when their copy is stale with a single _id lookup.
+# collection_version adds the document count and the newest _id, both read from
+# indexes/metadata, so inserts and deletes that do not bump the counter are
+# noticed as well; in-place edits of existing documents need a version bump.
+from pymongo import DESCENDING
+
+
+def bump_version(db, collection):
+    db["Versions"].update_one(
+        {"_id": collection}, {"$inc": {"VERSION": 1}}, upsert=True
+    )
+
+
+def get_version(db, collection):
+    entry = db["Versions"].find_one({"_id": collection})
+    return entry["VERSION"] if entry is not None else 0
+
+
+# Change signal of a collection: (version counter, document count, newest _id)
+def collection_version(db, collection):
+    newest = db[collection].find_one({}, {"_id": 1}, sort=[("_id", DESCENDING)])
+    return (
+        get_version(db, collection),
+        db[collection].estimated_document_count(),
+        newest["_id"] if newest is not None else None,
+    )
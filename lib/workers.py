@@ -1,30 +1,188 @@
-from flask import Blueprint, request, jsonify
+import re
 
+from flask import Blueprint, Response, request, jsonify
+
+from lib.archive import iter_archived_months, summarize_archived_months
+from lib.attendance import MONTH_PATTERN
 from lib.db import (
     create_Attendance_Entry,
-    generate_csv_report,
-    get_all_attendance_entries,
     get_all_worker_data,
+    get_attendance_revision,
     get_db,
+    get_presentee_rows,
+    get_worker_attendance_series,
+    iter_attendance_entries,
+    iter_presentee_rows_between,
+    patch_attendance_entry,
     update_attendance_entry,
 )
+from lib.http_cache import versioned_json
+from lib.json_provider import dumps, iter_ndjson
+from lib.report_cache import cache_report, get_cached_report, report_etag
+from lib.reports import (
+    REPORT_FORMATS,
+    iter_report_archive,
+    render_report,
+    report_filename,
+    save_report,
+)
+from lib.rollups import get_worker_summary
+from lib.roster import roster_cache_stats
+from lib.tokens import require_token
 
 worker_bp = Blueprint("worker", __name__)
+worker_bp.before_request(require_token)
 
+DATE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}")
 
+
+# Answers If-None-Match with 304 while the Worker_Data version is unchanged
 @worker_bp.route("/", methods=["GET"])
 def get_all_workers():
-    list = get_all_worker_data()
-    return jsonify(list)
+    return versioned_json("Worker_Data", get_all_worker_data)
+
+
+@worker_bp.route("/roster/stats", methods=["GET"])
+def get_roster_stats():
+    return jsonify(roster_cache_stats())
+
+
+# Monthly PRESENT/ABSENT counts per worker for the months FROM..TO (YYYY-MM),
+# read from the rollups only. WORKER_ID narrows it down to one worker.
+@worker_bp.route("/summary", methods=["GET"])
+def get_attendance_summary():
+    month_from = request.args.get("FROM")
+    month_to = request.args.get("TO")
+
+    if month_from is None or month_to is None:
+        return jsonify({"message": "FROM and TO are required."}), 400
+
+    if not MONTH_PATTERN.match(month_from) or not MONTH_PATTERN.match(month_to):
+        return jsonify({"message": "Month must be in YYYY-MM format."}), 400
+
+    SUMMARY = get_worker_summary(month_from, month_to, request.args.get("WORKER_ID"))
+    return (
+        jsonify(
+            {
+                "message": "Attendance summary retrieved successfully.",
+                "SUMMARY": SUMMARY,
+            }
+        ),
+        200,
+    )
+
+
+# Present/absent days, absence rate and longest streaks per worker over the
+# archived months FROM..TO (YYYY-MM). WORKER_ID narrows it down to one worker.
+@worker_bp.route("/archive/summary", methods=["GET"])
+def get_archive_summary():
+    month_from = request.args.get("FROM")
+    month_to = request.args.get("TO")
+
+    if month_from is None or month_to is None:
+        return jsonify({"message": "FROM and TO are required."}), 400
+
+    if not MONTH_PATTERN.match(month_from) or not MONTH_PATTERN.match(month_to):
+        return jsonify({"message": "Month must be in YYYY-MM format."}), 400
 
+    months = list(iter_archived_months(get_db(), month_from, month_to))
+    if not months:
+        return jsonify({"message": "No archived months in this range."}), 404
 
+    SUMMARY = summarize_archived_months(months, request.args.get("WORKER_ID"))
+    return (
+        jsonify(
+            {
+                "message": "Archive summary retrieved successfully.",
+                "MONTHS": [month.month for month in months],
+                "SUMMARY": SUMMARY,
+            }
+        ),
+        200,
+    )
+
+
+# Attendance of one worker as a compact {DATE: STATUS} series, optionally
+# between FROM and TO (inclusive)
+@worker_bp.route("/<WORKER_ID>/attendance", methods=["GET"])
+def get_worker_attendance(WORKER_ID):
+    date_from = request.args.get("FROM")
+    date_to = request.args.get("TO")
+
+    for date in (date_from, date_to):
+        if date is not None and not DATE_PATTERN.fullmatch(date):
+            return jsonify({"message": "Date must be in YYYY-MM-DD format."}), 400
+
+    ATTENDANCE = get_worker_attendance_series(WORKER_ID, date_from, date_to)
+
+    if ATTENDANCE is None:
+        return jsonify({"message": "Worker not found."}), 404
+    return (
+        jsonify(
+            {
+                "message": "Worker attendance retrieved successfully.",
+                "WORKER_ID": WORKER_ID,
+                "ATTENDANCE": ATTENDANCE,
+            }
+        ),
+        200,
+    )
+
+
+# Attendance history, streamed as the Mongo cursor yields it.
+# Optional query parameters:
+#   FROM / TO  - inclusive DATE range
+#   AFTER      - resume after this DATE (the NEXT value of the previous page)
+#   LIMIT      - page size; the response becomes {"DATA": {...}, "NEXT": DATE}
+#   FIELDS     - comma separated fields to return, e.g. DATE,PRESENT,WORKER_LIST.STATUS
+#   FORMAT     - "json" (default) or "ndjson", one attendance entry per line
 @worker_bp.route("/all", methods=["GET"])
 def get_all_attendance():
-    list = get_all_attendance_entries()
-    attendance_Data = {}
-    for entry in list:
-        attendance_Data[entry["DATE"]] = entry
-    return jsonify(attendance_Data)
+    limit = request.args.get("LIMIT")
+    if limit is not None:
+        if not limit.isdigit() or int(limit) == 0:
+            return jsonify({"message": "LIMIT must be a positive integer."}), 400
+        limit = int(limit)
+    fields = request.args.get("FIELDS")
+    if fields:
+        fields = [field.strip() for field in fields.split(",") if field.strip()]
+    output_format = request.args.get("FORMAT", "json").lower()
+    if output_format not in ("json", "ndjson"):
+        return jsonify({"message": "FORMAT must be json or ndjson."}), 400
+
+    entries = iter_attendance_entries(
+        date_from=request.args.get("FROM"),
+        date_to=request.args.get("TO"),
+        after=request.args.get("AFTER"),
+        limit=limit,
+        fields=fields,
+    )
+
+    if output_format == "ndjson":
+        return Response(
+            iter_ndjson(entries),
+            mimetype="application/x-ndjson",
+        )
+    return Response(
+        _stream_attendance_json(entries, limit), mimetype="application/json"
+    )
+
+
+def _stream_attendance_json(entries, limit):
+    yield '{"DATA": {' if limit else "{"
+    count = 0
+    last_date = None
+    for entry in entries:
+        if count:
+            yield ", "
+        yield dumps(entry["DATE"]) + ": " + dumps(entry)
+        count += 1
+        last_date = entry["DATE"]
+    if limit:
+        next_cursor = last_date if count == limit else None
+        yield '}, "NEXT": ' + dumps(next_cursor) + "}"
+    else:
+        yield "}"
 
 
 @worker_bp.route("/attendance", methods=["GET"])
@@ -36,6 +194,9 @@ def get_attendance_entry():
 
     WORKER_DATA = create_Attendance_Entry(date)
 
+    if WORKER_DATA is None:
+        return jsonify({"message": "Attendance month is archived."}), 409
+
     return jsonify(
         {
             "message": "Attendance Entry Created/Fetched Successfully",
@@ -56,17 +217,123 @@ def save_attendance_entry():
     if WORKER_DATA is None:
         return jsonify({"message": "Worker Data is required."}), 400
 
-    message = update_attendance_entry(date, WORKER_DATA)
+    message = update_attendance_entry(
+        date, WORKER_DATA, data.get("CLIENT_ID"), data.get("SIGNED_BY")
+    )
+
+    if message == "Attendance Entry Updated Successfully":
+        return jsonify({"message": message})
+    else:
+        return jsonify({"message": message}), 400
 
-    return jsonify({"message": message})
 
+@worker_bp.route("/attendance", methods=["PATCH"])
+def patch_attendance():
+    data = request.json
+    date = data.get("DATE")
+    WORKER_DATA = data.get("WORKER_LIST")
+
+    if date is None:
+        return jsonify({"message": "Date is required."}), 400
+
+    if (
+        not WORKER_DATA
+        and data.get("CLIENT_ID") is None
+        and data.get("SIGNED_BY") is None
+    ):
+        return jsonify({"message": "Worker Data is required."}), 400
+
+    message = patch_attendance_entry(
+        date, WORKER_DATA or [], data.get("CLIENT_ID"), data.get("SIGNED_BY")
+    )
+
+    if message == "Attendance Entry Updated Successfully":
+        return jsonify({"message": message})
+    else:
+        return jsonify({"message": message}), 400
 
+
+# Report of the presentees of a date, streamed as CSV (default) or PDF.
+# SAVE=true also writes the report to REPORT_DIR.
 @worker_bp.route("/attendance/report", methods=["GET"])
 def get_attendance_report():
     date = request.args.get("DATE")
+    output_format = request.args.get("FORMAT", "csv").lower()
+    save = request.args.get("SAVE", "false").lower() == "true"
 
     if date is None:
         return jsonify({"message": "Date is required."}), 400
 
-    worker_data = generate_csv_report(date)
-    return jsonify(worker_data)
+    if not DATE_PATTERN.fullmatch(date):
+        return jsonify({"message": "Date must be in YYYY-MM-DD format."}), 400
+
+    if output_format not in REPORT_FORMATS:
+        return jsonify({"message": "FORMAT must be csv or pdf."}), 400
+
+    revision = get_attendance_revision(date)
+    if revision is None:
+        return jsonify({"message": "Report not found."}), 404
+
+    key = (date, revision, output_format)
+    etag = report_etag(key)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    filename = report_filename(f"attendance_report_{date}", output_format)
+    report = get_cached_report(key)
+    if report is not None:
+        report = [report]
+    else:
+        rows = get_presentee_rows(date)
+        if rows is None:
+            return jsonify({"message": "Report not found."}), 404
+        report = cache_report(
+            key,
+            render_report(
+                rows, output_format, f"Attendance Report - {date} - Presentees"
+            ),
+        )
+    if save:
+        report = save_report(report, filename)
+    response = Response(
+        report,
+        mimetype=REPORT_FORMATS[output_format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+    response.set_etag(etag)
+    return response
+
+
+# Presentee reports of every day between FROM and TO (inclusive), optionally only
+# the days signed for CLIENT_ID, streamed as one ZIP archive.
+# MODE=daily (default) puts one report per day in the archive, MODE=consolidated
+# a single report with a Date column. FORMAT is csv (default) or pdf.
+@worker_bp.route("/attendance/export", methods=["GET"])
+def export_attendance_reports():
+    date_from = request.args.get("FROM")
+    date_to = request.args.get("TO")
+    client_id = request.args.get("CLIENT_ID")
+    output_format = request.args.get("FORMAT", "csv").lower()
+    mode = request.args.get("MODE", "daily").lower()
+
+    if date_from is None or date_to is None:
+        return jsonify({"message": "FROM and TO are required."}), 400
+
+    if not DATE_PATTERN.fullmatch(date_from) or not DATE_PATTERN.fullmatch(date_to):
+        return jsonify({"message": "Date must be in YYYY-MM-DD format."}), 400
+
+    if output_format not in REPORT_FORMATS:
+        return jsonify({"message": "FORMAT must be csv or pdf."}), 400
+
+    if mode not in ("daily", "consolidated"):
+        return jsonify({"message": "MODE must be daily or consolidated."}), 400
+
+    name = f"attendance_{date_from}_{date_to}"
+    days = iter_presentee_rows_between(date_from, date_to, client_id)
+    return Response(
+        iter_report_archive(days, output_format, mode, name),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={name}.zip"},
+    )
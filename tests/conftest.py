@@ -0,0 +1,121 @@
+# conftest.py
+# Shared fixtures of the test suite.
+#
+#   python -m pytest tests
+#   SERVER_MODE=async python -m pytest tests
+#
+# The settings below are applied before the app is imported, so .env can not
+# point the tests at a real database. Tests using the `db` fixture run against
+# TEST_MONGO_URI (a local mongod by default) in MONGO_DB_NAME, which is dropped
+# at the end, or on mongomock when MongoDB is unreachable. SERVER_MODE=async
+# runs the same tests with gevent's monkey patching, as gunicorn.conf.py does.
+import os
+import threading
+
+if os.getenv("SERVER_MODE", "").lower() == "async":
+    from gevent import monkey
+
+    monkey.patch_all()
+
+import pytest
+
+os.environ["MONGO_URI"] = os.getenv("TEST_MONGO_URI", "mongodb://localhost:27017")
+os.environ["MONGO_DB_NAME"] = os.getenv("TEST_MONGO_DB_NAME", "Attendance_DB_test")
+os.environ.setdefault("MONGO_SERVER_SELECTION_TIMEOUT_MS", "2000")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("REVOCATION_TIMEOUT_SECONDS", "0.2")
+os.environ.setdefault("INDEX_RETRY_SECONDS", "1")
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import app
+
+    app.config["TESTING"] = True
+    return app
+
+
+# Test client with the unique indexes reported ready, for the routes that
+# answer before touching the database
+@pytest.fixture
+def client(app, monkeypatch):
+    ready = threading.Event()
+    ready.set()
+    monkeypatch.setattr("lib.indexes._unique_ready", ready)
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers():
+    from lib.tokens import issue_token
+
+    return {"Authorization": f"Bearer {issue_token('tester')}"}
+
+
+def _mongomock_client():
+    import mongomock
+    from mongomock.collection import BulkOperationBuilder
+
+    # pymongo 4.11+ passes sort= to bulk updates, which mongomock predates
+    for name in ("add_update", "add_replace"):
+        method = getattr(BulkOperationBuilder, name)
+        if not getattr(method, "ignores_sort", False):
+
+            def without_sort(self, *args, method=method, sort=None, **kwargs):
+                return method(self, *args, **kwargs)
+
+            without_sort.ignores_sort = True
+            setattr(BulkOperationBuilder, name, without_sort)
+    return mongomock.MongoClient()
+
+
+# MongoDB at TEST_MONGO_URI, or mongomock's in-process server when it is
+# unreachable (TEST_MONGOMOCK=false skips the database tests instead)
+@pytest.fixture(scope="session")
+def mongo(app):
+    from pymongo.errors import PyMongoError
+
+    from lib import connection
+    from lib.indexes import ensure_indexes
+
+    db = connection.get_db()
+    try:
+        db.client.admin.command("ping")
+    except PyMongoError as e:
+        if os.getenv("TEST_MONGOMOCK", "true").lower() != "true":
+            pytest.skip(f"MongoDB is not reachable: {e}")
+        try:
+            client = _mongomock_client()
+        except ImportError:
+            pytest.skip(f"MongoDB is not reachable and mongomock is not installed: {e}")
+        print(f"MongoDB is not reachable, using mongomock: {e}")
+        with connection._lock:
+            connection._client = client
+            connection._client_pid = os.getpid()
+        db = connection.get_db()
+    assert ensure_indexes(db), "unique indexes could not be created"
+    yield db
+    db.client.drop_database(db.name)
+
+
+# For the tests that need a real server: several processes or server-side
+# aggregation stages mongomock does not implement
+@pytest.fixture
+def mongod(db):
+    if type(db.client).__module__.startswith("mongomock"):
+        pytest.skip("needs a MongoDB server, mongomock is in use")
+    return db
+
+
+# Empty collections (indexes kept) for every test that uses the database
+@pytest.fixture
+def db(mongo):
+    from lib import archive
+    from lib.roster import invalidate_roster
+
+    for name in mongo.list_collection_names():
+        mongo[name].delete_many({})
+    invalidate_roster()
+    with archive._lock:
+        archive._cache.clear()
+    return mongo
@@ -0,0 +1,387 @@
+# test_api.py
+# Routes and JSON contracts of the API, through the Flask test client. The
+# tests without the `db` fixture answer before any database round trip.
+import os
+
+import pytest
+
+from lib.tokens import AUTH_REQUIRED
+
+requires_auth = pytest.mark.skipif(not AUTH_REQUIRED, reason="AUTH_REQUIRED is off")
+
+
+def _worker(db, name, email):
+    return str(
+        db["Worker_Data"]
+        .insert_one({"NAME": name, "EMAIL": {"VALUE": email}, "PHONE": ""})
+        .inserted_id
+    )
+
+
+def _customer(name, email, mobile):
+    return {
+        "CUSTOMER_DATA": {
+            "NAME": {"VALUE": name},
+            "ADDRESS": {"VALUE": "1 Park Street, Kolkata"},
+            "EMAIL": {"VALUE": email},
+            "MOBILE": {"VALUE": mobile},
+        }
+    }
+
+
+@requires_auth
+def test_token_is_required(client):
+    response = client.get("/workers/roster/stats")
+    assert response.status_code == 401
+    assert response.get_json() == {"message": "Authorization token is required."}
+
+
+@requires_auth
+def test_invalid_token_is_rejected(client):
+    response = client.get(
+        "/workers/roster/stats", headers={"Authorization": "Bearer not-a-token"}
+    )
+    assert response.status_code == 401
+    assert response.get_json() == {"message": "Invalid or expired token."}
+
+
+def test_writes_wait_for_the_unique_indexes(app, auth_headers, monkeypatch):
+    import threading
+
+    monkeypatch.setattr("lib.indexes._unique_ready", threading.Event())
+    monkeypatch.setattr("lib.indexes._checked", threading.Event())
+    client = app.test_client()
+    response = client.post("/clients/save", json={}, headers=auth_headers)
+    assert response.status_code == 503
+    assert "indexes are not ready" in response.get_json()["message"]
+    response = client.get("/workers/roster/stats", headers=auth_headers)
+    assert response.status_code != 503
+
+
+# Duplicates blocking one unique index only refuse the writes relying on it
+def test_duplicates_only_block_their_writes(app, auth_headers, monkeypatch):
+    import threading
+
+    checked = threading.Event()
+    checked.set()
+    monkeypatch.setattr("lib.indexes._unique_ready", threading.Event())
+    monkeypatch.setattr("lib.indexes._checked", checked)
+    monkeypatch.setattr("lib.indexes._missing_unique", {"Customers": "E11000"})
+    client = app.test_client()
+    response = client.post("/clients/save", json={}, headers=auth_headers)
+    assert response.status_code == 503
+    assert "Customers" in response.get_json()["message"]
+    response = client.post("/auth/register", json={})
+    assert response.status_code == 400
+
+
+def test_login_requires_credentials(client):
+    response = client.post("/auth/login", json={"USERNAME": "tester"})
+    assert response.status_code == 400
+    assert response.get_json() == {"message": "Username and password are required."}
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/workers/summary?FROM=2024-01",
+        "/workers/summary?FROM=2024-01&TO=2024-13",
+        "/workers/archive/summary?FROM=2024&TO=2024-02",
+        "/workers/0123456789abcdef01234567/attendance?FROM=01-02-2024",
+        "/workers/all?LIMIT=0",
+        "/workers/all?FORMAT=xml",
+        "/workers/attendance",
+        "/clients/bill",
+        "/clients/invoices?MONTH=2024-1",
+        "/clients/invoices?MONTH=2024-01&FORMAT=xlsx",
+        "/clients/summary?FROM=2024-01&TO=January",
+    ],
+)
+def test_invalid_query_is_rejected(client, auth_headers, url):
+    response = client.get(url, headers=auth_headers)
+    assert response.status_code == 400
+    assert "message" in response.get_json()
+
+
+@pytest.mark.parametrize(
+    "method, url, body",
+    [
+        ("POST", "/workers/attendance", {"WORKER_LIST": []}),
+        ("POST", "/workers/attendance", {"DATE": "2024-01-02"}),
+        ("PATCH", "/workers/attendance", {"DATE": "2024-01-02"}),
+        ("PATCH", "/clients/update", {"CUSTOMER_DATA": {}}),
+        ("POST", "/clients/bill", {"DATE": "2024-01-02", "CLIENT_ID": "x"}),
+        ("POST", "/clients/invoices", {"MONTH": "January"}),
+    ],
+)
+def test_invalid_body_is_rejected(client, auth_headers, method, url, body):
+    response = client.open(url, method=method, json=body, headers=auth_headers)
+    assert response.status_code == 400
+    assert "message" in response.get_json()
+
+
+def test_import_rejects_unknown_format(client, auth_headers):
+    response = client.post(
+        "/clients/import?FORMAT=xlsx", data=b"NAME\n", headers=auth_headers
+    )
+    assert response.status_code == 400
+    assert response.get_json() == {"MESSAGE": "FORMAT MUST BE CSV OR NDJSON."}
+
+
+@requires_auth
+def test_register_login_logout(client, db):
+    credentials = {"USERNAME": "supervisor", "PASSWORD": "secret"}
+    response = client.post(
+        "/auth/register", json={**credentials, "EMAIL": "supervisor@example.com"}
+    )
+    assert response.get_json() == {"message": "User created successfully."}
+
+    response = client.post("/auth/login", json={**credentials, "PASSWORD": "wrong"})
+    assert response.status_code == 401
+
+    response = client.post("/auth/login", json=credentials)
+    assert response.status_code == 200
+    headers = {"Authorization": f"Bearer {response.get_json()['TOKEN']}"}
+    assert client.get("/workers/roster/stats", headers=headers).status_code == 200
+
+    assert client.post("/auth/logout", headers=headers).status_code == 200
+    assert client.get("/workers/roster/stats", headers=headers).status_code == 401
+
+
+def test_attendance_day(client, db, auth_headers):
+    first = _worker(db, "Asha", "asha@example.com")
+    second = _worker(db, "Bikram", "bikram@example.com")
+
+    response = client.get("/workers/attendance?DATE=2024-01-02", headers=auth_headers)
+    assert response.status_code == 200
+    day = response.get_json()["WORKER_DATA"]
+    assert day["DATE"] == "2024-01-02"
+    assert sorted(worker["WORKER_ID"] for worker in day["WORKER_LIST"]) == sorted(
+        [first, second]
+    )
+
+    worker_list = [
+        {**worker, "STATUS": "PRESENT" if worker["WORKER_ID"] == first else "ABSENT"}
+        for worker in day["WORKER_LIST"]
+    ]
+    response = client.post(
+        "/workers/attendance",
+        json={
+            "DATE": "2024-01-02",
+            "WORKER_LIST": worker_list,
+            "CLIENT_ID": "client-1",
+        },
+        headers=auth_headers,
+    )
+    assert response.get_json() == {"message": "Attendance Entry Updated Successfully"}
+
+    response = client.patch(
+        "/workers/attendance",
+        json={
+            "DATE": "2024-01-02",
+            "WORKER_LIST": [{"WORKER_ID": second, "STATUS": "PRESENT"}],
+        },
+        headers=auth_headers,
+    )
+    assert response.get_json() == {"message": "Attendance Entry Updated Successfully"}
+
+    response = client.get(f"/workers/{first}/attendance", headers=auth_headers)
+    assert response.get_json()["ATTENDANCE"] == {"2024-01-02": "PRESENT"}
+
+    response = client.get(
+        "/workers/summary?FROM=2024-01&TO=2024-01", headers=auth_headers
+    )
+    summary = response.get_json()["SUMMARY"]
+    assert summary[first]["PRESENT"] == 1
+    assert summary[second] == {
+        "PRESENT": 1,
+        "ABSENT": 0,
+        "MONTHS": {"2024-01": {"PRESENT": 1, "ABSENT": 0}},
+    }
+
+    response = client.get(
+        "/clients/summary?FROM=2024-01&TO=2024-01", headers=auth_headers
+    )
+    assert response.get_json()["SUMMARY"]["client-1"]["PRESENT"] == 2
+
+    response = client.get("/workers/all?LIMIT=1", headers=auth_headers)
+    page = response.get_json()
+    assert list(page["DATA"]) == ["2024-01-02"]
+    assert page["NEXT"] == "2024-01-02"
+
+
+# Workers without a WORKER_ID would be counted without being stored
+def test_attendance_requires_worker_ids(client, db, auth_headers):
+    worker = _worker(db, "Asha", "asha@example.com")
+    client.get("/workers/attendance?DATE=2024-01-03", headers=auth_headers)
+
+    response = client.post(
+        "/workers/attendance",
+        json={
+            "DATE": "2024-01-03",
+            "WORKER_LIST": [
+                {"WORKER_ID": worker, "STATUS": "PRESENT"},
+                {"WORKER_NAME": "Unknown", "STATUS": "PRESENT"},
+            ],
+        },
+        headers=auth_headers,
+    )
+    assert response.status_code == 400
+    assert response.get_json() == {"message": "WORKER_ID is required for every worker."}
+    day = db["Daily_Attendance"].find_one({"DATE": "2024-01-03"})
+    assert day.get("PRESENT", 0) == 0
+
+
+def test_unknown_worker_attendance(client, db, auth_headers):
+    response = client.get(
+        "/workers/0123456789abcdef01234567/attendance", headers=auth_headers
+    )
+    assert response.status_code == 404
+    assert response.get_json() == {"message": "Worker not found."}
+
+
+# Legacy day documents are split into records on first read; workers without
+# a WORKER_ID are kept on the day document
+def test_legacy_day_is_migrated(client, db, auth_headers):
+    worker = _worker(db, "Asha", "asha@example.com")
+    db["Daily_Attendance"].insert_one(
+        {
+            "DATE": "2023-12-01",
+            "WORKER_LIST": [
+                {"WORKER_ID": worker, "STATUS": "PRESENT"},
+                {"WORKER_NAME": "Unknown", "STATUS": "ABSENT"},
+            ],
+        }
+    )
+
+    response = client.get("/workers/attendance?DATE=2023-12-01", headers=auth_headers)
+    day = response.get_json()["WORKER_DATA"]
+    assert day["WORKER_LIST"] == [{"WORKER_ID": worker, "STATUS": "PRESENT"}]
+    stored = db["Daily_Attendance"].find_one({"DATE": "2023-12-01"})
+    assert "WORKER_LIST" not in stored
+    assert stored["UNMIGRATED_WORKER_LIST"] == [
+        {"WORKER_NAME": "Unknown", "STATUS": "ABSENT"}
+    ]
+
+
+# Workers inserted without a version bump (the loader, mongoimport) still
+# change the ETag of the listing
+def test_worker_listing_etag(client, db, auth_headers):
+    _worker(db, "Asha", "asha@example.com")
+    response = client.get("/workers/", headers=auth_headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    response = client.get("/workers/", headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    _worker(db, "Ravi", "ravi@example.com")
+    response = client.get("/workers/", headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.get_json()) == 2
+
+
+def test_customers(client, db, auth_headers):
+    response = client.post(
+        "/clients/save",
+        json={"CUSTOMER_DATA": _customer("Acme", "acme@example.com", "9876543210")},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+
+    response = client.post(
+        "/clients/save",
+        json={"CUSTOMER_DATA": _customer("Acme", "other@example.com", "9876500000")},
+        headers=auth_headers,
+    )
+    assert response.status_code == 400
+    # mongomock's DuplicateKeyError does not name the index
+    if type(db.client).__module__.startswith("mongomock"):
+        assert response.get_json() == {"MESSAGE": "CUSTOMER ALREADY EXISTS."}
+    else:
+        assert response.get_json() == {"MESSAGE": "CUSTOMER NAME ALREADY EXISTS."}
+
+    response = client.get("/clients/all", headers=auth_headers)
+    customers = response.get_json()["CUSTOMER_DATA"]
+    assert list(customers) == ["Acme"]
+
+    fields = _customer("Acme Ltd", "acme@example.com", "9876543210")["CUSTOMER_DATA"]
+    response = client.patch(
+        "/clients/update",
+        json={"CUSTOMER_ID": customers["Acme"]["_id"], "CUSTOMER_DATA": fields},
+        headers=auth_headers,
+    )
+    assert response.get_json() == {"MESSAGE": "CUSTOMER UPDATED SUCCESSFULLY."}
+
+
+def test_customer_import(client, db, auth_headers):
+    rows = (
+        b'{"NAME": "Acme", "ADDRESS": "Kolkata", '
+        b'"EMAIL": "acme@example.com", "MOBILE": "9876543210"}\n'
+        b"not json\n"
+        b'{"NAME": "Globex", "ADDRESS": "Pune", '
+        b'"EMAIL": "globex@example.com", "MOBILE": "9876500000"}\n'
+    )
+    response = client.post(
+        "/clients/import?FORMAT=ndjson", data=rows, headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert db["Customers"].count_documents({}) == 2
+
+
+def test_invoices(client, db, auth_headers):
+    db["Daily_Attendance"].insert_many(
+        [
+            {"DATE": "2024-02-01", "CLIENT_ID": "client-1", "PRESENT": 3, "ABSENT": 0},
+            {"DATE": "2024-02-02", "CLIENT_ID": "client-1", "PRESENT": 2, "ABSENT": 1},
+        ]
+    )
+    response = client.post(
+        "/clients/invoices", json={"MONTH": "2024-02"}, headers=auth_headers
+    )
+    invoices = response.get_json()["INVOICES"]
+    assert [(invoice["CLIENT_ID"], invoice["WORKER_DAYS"]) for invoice in invoices] == [
+        ("client-1", 5)
+    ]
+
+    # Regenerating after the days moved to another client replaces the invoices
+    db["Daily_Attendance"].update_many({}, {"$set": {"CLIENT_ID": "client-2"}})
+    client.post("/clients/invoices", json={"MONTH": "2024-02"}, headers=auth_headers)
+    assert [invoice["CLIENT_ID"] for invoice in db["Invoices"].find()] == ["client-2"]
+
+    # Billing rows replace the header of their day, other days fall back to it
+    db["Client_Attendance"].insert_many(
+        [
+            {
+                "CLIENT_ID": "client-3",
+                "DATE": "2024-02-01",
+                "ATTENDANCE_DATA": {"PRESENT": 2},
+            },
+            {
+                "CLIENT_ID": "client-2",
+                "DATE": "2024-02-01",
+                "ATTENDANCE_DATA": [{"STATUS": "PRESENT"}, {"STATUS": "ABSENT"}],
+            },
+        ]
+    )
+    response = client.post(
+        "/clients/invoices", json={"MONTH": "2024-02"}, headers=auth_headers
+    )
+    invoices = response.get_json()["INVOICES"]
+    assert [(invoice["CLIENT_ID"], invoice["WORKER_DAYS"]) for invoice in invoices] == [
+        ("client-2", 3),
+        ("client-3", 2),
+    ]
+    assert [day["DATE"] for day in invoices[0]["DAYS"]] == ["2024-02-01", "2024-02-02"]
+    assert invoices[0]["INVOICE_NUMBER"] == "INV-202402-CLIENT-2"
+
+    response = client.get(
+        "/clients/invoices?MONTH=2024-02&FORMAT=csv", headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.mimetype == "application/zip"
+    assert response.data[:2] == b"PK"
+
+
+def test_home_reports_the_version(client):
+    response = client.get("/")
+    assert response.get_json()["VERSION"] == os.getenv("VERSION", "v0.0.1")
@@ -0,0 +1,96 @@
+# test_archive.py
+# Packing closed months into Attendance_Archive while writes may be in flight.
+from lib import archive
+from lib import db as attendance_db
+from lib.archive import archive_month, get_archived_month
+from lib.db import update_attendance_entry
+
+
+def _day(db, date, statuses, revision=0):
+    db["Daily_Attendance"].insert_one(
+        {
+            "DATE": date,
+            "CLIENT_ID": "client-1",
+            "SIGNED_BY": "",
+            "PRESENT": list(statuses.values()).count("PRESENT"),
+            "ABSENT": list(statuses.values()).count("ABSENT"),
+            "REVISION": revision,
+        }
+    )
+    db["Worker_Attendance"].insert_many(
+        [
+            {"DATE": date, "WORKER_ID": worker_id, "STATUS": status}
+            for worker_id, status in statuses.items()
+        ]
+    )
+
+
+def test_archive_month(db):
+    _day(db, "2023-01-02", {"w1": "PRESENT", "w2": "ABSENT"})
+    _day(db, "2023-01-03", {"w1": "ABSENT"})
+
+    assert archive_month(db, "2023-01") == 2
+
+    assert db["Daily_Attendance"].count_documents({}) == 0
+    assert db["Worker_Attendance"].count_documents({}) == 0
+    archived = get_archived_month(db, "2023-01")
+    assert archived.worker_series("w1") == {
+        "2023-01-02": "PRESENT",
+        "2023-01-03": "ABSENT",
+    }
+
+
+# A write that passed the archive check before the claim lands after the month
+# was read: its day keeps its header and is packed again
+def test_archive_month_repacks_a_day_written_meanwhile(db, monkeypatch):
+    _day(db, "2023-02-01", {"w1": "ABSENT"})
+    _day(db, "2023-02-02", {"w1": "ABSENT"})
+    pack_month = archive.pack_month
+    calls = []
+
+    def late_write(*args):
+        if not calls:
+            db["Worker_Attendance"].update_one(
+                {"DATE": "2023-02-01", "WORKER_ID": "w1"},
+                {"$set": {"STATUS": "PRESENT"}},
+            )
+            db["Daily_Attendance"].update_one(
+                {"DATE": "2023-02-01"},
+                {"$inc": {"REVISION": 1, "PRESENT": 1, "ABSENT": -1}},
+            )
+        calls.append(args)
+        return pack_month(*args)
+
+    monkeypatch.setattr(archive, "pack_month", late_write)
+
+    assert archive_month(db, "2023-02") == 2
+
+    assert len(calls) == 2
+    assert db["Daily_Attendance"].count_documents({}) == 0
+    assert db["Worker_Attendance"].count_documents({}) == 0
+    archived = get_archived_month(db, "2023-02")
+    assert archived.worker_series("w1") == {
+        "2023-02-01": "PRESENT",
+        "2023-02-02": "ABSENT",
+    }
+    assert archived.header("2023-02-01")["PRESENT"] == 1
+
+
+# The archive deletes the day header while a full update is in flight: the
+# update is refused and leaves no records behind
+def test_write_refused_when_the_day_is_archived_under_it(db, monkeypatch):
+    _day(db, "2023-03-01", {"w1": "ABSENT"})
+    header_changes = attendance_db._header_changes
+
+    def archived_meanwhile(*args):
+        db["Daily_Attendance"].delete_many({"DATE": "2023-03-01"})
+        db["Worker_Attendance"].delete_many({"DATE": "2023-03-01"})
+        return header_changes(*args)
+
+    monkeypatch.setattr(attendance_db, "_header_changes", archived_meanwhile)
+    message = update_attendance_entry(
+        "2023-03-01", [{"WORKER_ID": "w1", "STATUS": "PRESENT"}]
+    )
+
+    assert message == "Attendance Entry is archived."
+    assert db["Worker_Attendance"].count_documents({"DATE": "2023-03-01"}) == 0
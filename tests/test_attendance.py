@@ -0,0 +1,49 @@
+# test_attendance.py
+# Month, DATE range and field value helpers shared by the attendance modules.
+import pytest
+
+from lib.attendance import (
+    MONTH_PATTERN,
+    date_query,
+    month_query,
+    month_range,
+    plain_value,
+)
+
+
+@pytest.mark.parametrize("month", ["2024-01", "2024-12"])
+def test_month_pattern_accepts(month):
+    assert MONTH_PATTERN.match(month)
+
+
+@pytest.mark.parametrize("month", ["2024-1", "2024-13", "2024-00", "24-01", "January"])
+def test_month_pattern_rejects(month):
+    assert not MONTH_PATTERN.match(month)
+
+
+def test_month_range():
+    assert month_range("2024-02") == ("2024-02-01", "2024-03-01")
+    assert month_range("2024-12") == ("2024-12-01", "2025-01-01")
+
+
+def test_month_query():
+    assert month_query(None) == {}
+    assert month_query("2024-12") == {
+        "DATE": {"$gte": "2024-12-01", "$lt": "2025-01-01"}
+    }
+
+
+def test_date_query():
+    assert date_query() == {}
+    assert date_query("2024-01-01") == {"DATE": {"$gte": "2024-01-01"}}
+    assert date_query(None, "2024-01-31", after="2024-01-10") == {
+        "DATE": {"$lte": "2024-01-31", "$gt": "2024-01-10"}
+    }
+
+
+def test_plain_value():
+    assert plain_value({"DESCRIPTION": "Status", "VALUE": "PRESENT"}) == "PRESENT"
+    assert plain_value("ABSENT") == "ABSENT"
+    assert plain_value(None) is None
+    assert plain_value({"DESCRIPTION": "Status"}, "") == ""
+    assert plain_value("", "-") == ""
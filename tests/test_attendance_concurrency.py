@@ -0,0 +1,122 @@
+# test_attendance_concurrency.py
+# Supervisors opening the same date at once must share one day sheet: the
+# upsert on the unique DATE index and the unique (DATE, WORKER_ID) index leave
+# exactly one Daily_Attendance document and one record per worker. A PATCH
+# racing another write keeps the other write and recounts the day.
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from lib import db as attendance_db
+from lib.db import create_Attendance_Entry, patch_attendance_entry
+
+REQUESTS = 32
+
+
+def _workers(db, count):
+    ids = (
+        db["Worker_Data"]
+        .insert_many(
+            [
+                {"NAME": f"Worker {n}", "EMAIL": {"VALUE": f"worker{n}@example.com"}}
+                for n in range(count)
+            ]
+        )
+        .inserted_ids
+    )
+    return sorted(str(worker_id) for worker_id in ids)
+
+
+def _assert_one_day_sheet(db, date, days, worker_ids):
+    assert db["Daily_Attendance"].count_documents({"DATE": date}) == 1
+    rows = list(db["Worker_Attendance"].find({"DATE": date}))
+    assert sorted(row["WORKER_ID"] for row in rows) == worker_ids
+    day_id = db["Daily_Attendance"].find_one({"DATE": date})["_id"]
+    for day in days:
+        assert day["_id"] == day_id
+        assert (
+            sorted(worker["WORKER_ID"] for worker in day["WORKER_LIST"]) == worker_ids
+        )
+
+
+# mongomock does not enforce unique indexes across threads, these need mongod
+def test_concurrent_threads_create_one_day_sheet(mongod):
+    db = mongod
+    worker_ids = _workers(db, 50)
+    barrier = threading.Barrier(REQUESTS)
+
+    def open_day():
+        barrier.wait()
+        return create_Attendance_Entry("2024-03-04")
+
+    with ThreadPoolExecutor(REQUESTS) as pool:
+        days = [
+            future.result()
+            for future in [pool.submit(open_day) for _ in range(REQUESTS)]
+        ]
+
+    _assert_one_day_sheet(db, "2024-03-04", days, worker_ids)
+
+
+# Each process has its own MongoClient, like gunicorn workers
+def test_concurrent_processes_create_one_day_sheet(mongod):
+    db = mongod
+    worker_ids = _workers(db, 50)
+    context = multiprocessing.get_context("spawn")
+
+    with ProcessPoolExecutor(8, mp_context=context) as pool:
+        days = list(pool.map(create_Attendance_Entry, ["2024-03-05"] * REQUESTS))
+
+    _assert_one_day_sheet(db, "2024-03-05", days, worker_ids)
+
+
+# Another supervisor changes a worker between the PATCH reading the statuses
+# and its compare-and-set update
+def test_patch_keeps_a_concurrent_write(db, monkeypatch):
+    first, second = _workers(db, 2)
+    create_Attendance_Entry("2024-03-06")
+    patch_attendance_entry(
+        "2024-03-06",
+        [
+            {"WORKER_ID": first, "STATUS": "PRESENT"},
+            {"WORKER_ID": second, "STATUS": "PRESENT"},
+        ],
+        CLIENT_ID="client-1",
+    )
+
+    header_changes = attendance_db._header_changes
+
+    def concurrent_write(*args):
+        db["Worker_Attendance"].update_one(
+            {"DATE": "2024-03-06", "WORKER_ID": first}, {"$set": {"STATUS": "LEAVE"}}
+        )
+        return header_changes(*args)
+
+    monkeypatch.setattr(attendance_db, "_header_changes", concurrent_write)
+    message = patch_attendance_entry(
+        "2024-03-06",
+        [
+            {"WORKER_ID": first, "STATUS": "ABSENT"},
+            {"WORKER_ID": second, "STATUS": "ABSENT"},
+        ],
+    )
+
+    assert message == "Attendance Entry Updated Successfully"
+    statuses = {
+        row["WORKER_ID"]: row["STATUS"]
+        for row in db["Worker_Attendance"].find({"DATE": "2024-03-06"})
+    }
+    assert statuses == {first: "LEAVE", second: "ABSENT"}
+    day = db["Daily_Attendance"].find_one({"DATE": "2024-03-06"})
+    assert (day["PRESENT"], day["ABSENT"]) == (0, 1)
+    rollups = {
+        rollup["WORKER_ID"]: (rollup["PRESENT"], rollup["ABSENT"])
+        for rollup in db["Worker_Rollups"].find({"MONTH": "2024-03"})
+    }
+    # The first worker's PRESENT was replaced by the concurrent LEAVE, which
+    # the rollups do not count; only the second worker's change was applied
+    assert rollups[second] == (0, 1)
+    client = db["Client_Rollups"].find_one(
+        {"CLIENT_ID": "client-1", "MONTH": "2024-03"}
+    )
+    assert (client["PRESENT"], client["ABSENT"]) == (0, 1)
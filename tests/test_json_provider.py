@@ -0,0 +1,78 @@
+# test_json_provider.py
+# Native encoding of Mongo documents, with orjson or the standard library.
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import pytest
+from bson import Decimal128, ObjectId
+from flask import Flask
+
+from lib import json_provider
+from lib.json_provider import FastJSONProvider, dumps, iter_ndjson, loads
+
+OBJECT_ID = ObjectId("0123456789abcdef01234567")
+
+
+# Every test runs with orjson (when installed) and with the standard library
+@pytest.fixture(autouse=True, params=["orjson", "json"])
+def backend(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(json_provider, "orjson", None)
+    elif json_provider.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+
+def test_mongo_types_are_encoded_natively():
+    document = {
+        "_id": OBJECT_ID,
+        "CREATED_AT": datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+        "DATE": date(2024, 1, 2),
+        "RATE": Decimal("650.50"),
+        "AMOUNT": Decimal128("1301.00"),
+        "WORKER_LIST": [{"WORKER_ID": OBJECT_ID, "STATUS": "PRESENT"}],
+    }
+    assert loads(dumps(document)) == {
+        "_id": "0123456789abcdef01234567",
+        "CREATED_AT": "2024-01-02T03:04:05+00:00",
+        "DATE": "2024-01-02",
+        "RATE": "650.50",
+        "AMOUNT": "1301.00",
+        "WORKER_LIST": [{"WORKER_ID": "0123456789abcdef01234567", "STATUS": "PRESENT"}],
+    }
+
+
+def test_unknown_types_are_rejected():
+    with pytest.raises(TypeError):
+        dumps({"VALUE": object()})
+
+
+def test_sort_keys():
+    assert dumps({"B": 1, "A": 2}, sort_keys=True).replace(" ", "") == '{"A":2,"B":1}'
+
+
+def test_iter_ndjson():
+    lines = list(
+        iter_ndjson(({"DATE": f"2024-01-0{day}", "_id": OBJECT_ID} for day in (1, 2)))
+    )
+    assert [loads(line) for line in lines] == [
+        {"DATE": "2024-01-01", "_id": "0123456789abcdef01234567"},
+        {"DATE": "2024-01-02", "_id": "0123456789abcdef01234567"},
+    ]
+    assert all(line.endswith("\n") and line.count("\n") == 1 for line in lines)
+
+
+def test_jsonify_uses_the_provider():
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    with app.app_context():
+        response = app.json.response({"_id": OBJECT_ID, "DATE": date(2024, 1, 2)})
+    assert response.mimetype == "application/json"
+    assert response.get_json() == {
+        "DATE": "2024-01-02",
+        "_id": "0123456789abcdef01234567",
+    }
+    assert (
+        app.json.dumps({"_id": OBJECT_ID}, indent=2)
+        == '{\n  "_id": "0123456789abcdef01234567"\n}'
+    )
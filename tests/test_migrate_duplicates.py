@@ -0,0 +1,136 @@
+# test_migrate_duplicates.py
+# Merging the duplicates that block the unique indexes.
+from lib.indexes import ensure_indexes, unique_indexes_ready
+from lib.migrate_duplicates import (
+    merge_duplicate_customers,
+    merge_duplicate_users,
+    merge_duplicate_workers,
+)
+
+
+def _worker(name, email="", phone="", city=""):
+    return {
+        "NAME": {"DESCRIPTION": "Worker Name", "VALUE": name},
+        "EMAIL": {"DESCRIPTION": "Email", "VALUE": email},
+        "PHONE_NUMBER": {"DESCRIPTION": "Phone Number", "VALUE": phone},
+        "CITY": {"DESCRIPTION": "Worker City", "VALUE": city},
+    }
+
+
+def test_merge_duplicate_workers(db):
+    # Workers loaded before the unique indexes existed
+    db["Worker_Data"].drop_indexes()
+    kept, by_email, by_phone, other = (
+        db["Worker_Data"]
+        .insert_many(
+            [
+                _worker("Asha", "asha@example.com", "9000000001"),
+                _worker("Asha K", "asha@example.com", "", city="Pune"),
+                _worker("Asha", "", "9000000001"),
+                _worker("Ravi", "ravi@example.com", "9000000002"),
+            ]
+        )
+        .inserted_ids
+    )
+    db["Daily_Attendance"].insert_one({"DATE": "2024-03-04", "PRESENT": 2, "ABSENT": 0})
+    db["Worker_Attendance"].insert_many(
+        [
+            {"DATE": "2024-03-04", "WORKER_ID": str(kept), "STATUS": "PRESENT"},
+            {"DATE": "2024-03-04", "WORKER_ID": str(by_email), "STATUS": "PRESENT"},
+            {"DATE": "2024-03-05", "WORKER_ID": str(by_phone), "STATUS": "ABSENT"},
+        ]
+    )
+
+    assert merge_duplicate_workers(db) == 2
+
+    workers = {worker["_id"]: worker for worker in db["Worker_Data"].find()}
+    assert set(workers) == {kept, other}
+    assert workers[kept]["NAME"]["VALUE"] == "Asha"
+    assert workers[kept]["CITY"]["VALUE"] == "Pune"
+    rows = sorted(
+        (row["DATE"], row["WORKER_ID"]) for row in db["Worker_Attendance"].find()
+    )
+    assert rows == [("2024-03-04", str(kept)), ("2024-03-05", str(kept))]
+    day = db["Daily_Attendance"].find_one({"DATE": "2024-03-04"})
+    assert (day["PRESENT"], day["ABSENT"]) == (1, 0)
+    merged = {
+        (merged["COLLECTION"], merged["DOCUMENT"]["_id"]): merged["MERGED_INTO"]
+        for merged in db["Merged_Duplicates"].find()
+    }
+    assert len(merged) == 3
+    assert merged[("Worker_Data", by_email)] == kept
+    assert merged[("Worker_Data", by_phone)] == kept
+
+    assert merge_duplicate_workers(db) == 0
+    ensure_indexes(db)
+    assert unique_indexes_ready("Worker_Data")
+
+
+def _customer(name, email, mobile):
+    return {
+        "CUSTOMER_DATA": {
+            "NAME": {"VALUE": name},
+            "EMAIL": {"VALUE": email},
+            "MOBILE": {"VALUE": mobile},
+        }
+    }
+
+
+def test_merge_duplicate_customers(db):
+    db["Customers"].drop_indexes()
+    kept, duplicate = (
+        db["Customers"]
+        .insert_many(
+            [
+                _customer("Acme", "acme@example.com", "9876543210"),
+                _customer("Acme", "billing@acme.example.com", "9876500000"),
+            ]
+        )
+        .inserted_ids
+    )
+    db["Client_Attendance"].insert_many(
+        [
+            {"CLIENT_ID": str(kept), "DATE": "2024-03-04", "ATTENDANCE_DATA": {}},
+            {"CLIENT_ID": str(duplicate), "DATE": "2024-03-04", "ATTENDANCE_DATA": {}},
+            {"CLIENT_ID": str(duplicate), "DATE": "2024-03-05", "ATTENDANCE_DATA": {}},
+        ]
+    )
+    db["Daily_Attendance"].insert_one(
+        {"DATE": "2024-03-05", "CLIENT_ID": str(duplicate), "REVISION": 1}
+    )
+
+    assert merge_duplicate_customers(db) == 1
+
+    assert [customer["_id"] for customer in db["Customers"].find()] == [kept]
+    billing = sorted(
+        (row["DATE"], row["CLIENT_ID"]) for row in db["Client_Attendance"].find()
+    )
+    assert billing == [("2024-03-04", str(kept)), ("2024-03-05", str(kept))]
+    day = db["Daily_Attendance"].find_one({"DATE": "2024-03-05"})
+    assert (day["CLIENT_ID"], day["REVISION"]) == (str(kept), 2)
+    assert db["Merged_Duplicates"].count_documents({"COLLECTION": "Customers"}) == 1
+    ensure_indexes(db)
+    assert unique_indexes_ready("Customers")
+
+
+# Emails were never checked before the unique index
+def test_merge_duplicate_users(db):
+    db["Users"].drop_indexes()
+    first, second = (
+        db["Users"]
+        .insert_many(
+            [
+                {"username": "asha", "email": "asha@example.com"},
+                {"username": "asha2", "email": "asha@example.com"},
+            ]
+        )
+        .inserted_ids
+    )
+
+    assert merge_duplicate_users(db) == 1
+
+    assert [user["username"] for user in db["Users"].find()] == ["asha"]
+    merged = db["Merged_Duplicates"].find_one({"COLLECTION": "Users"})
+    assert (merged["DOCUMENT"]["_id"], merged["MERGED_INTO"]) == (second, first)
+    ensure_indexes(db)
+    assert unique_indexes_ready("Users")
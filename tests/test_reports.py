@@ -0,0 +1,32 @@
+# test_reports.py
+# Report archives rendered in the process pool.
+import io
+import zipfile
+
+from lib.reports import iter_report_archive
+
+DAYS = [
+    ("2024-03-04", [("Asha", "asha@example.com", "9000000001")]),
+    ("2024-03-05", [("Ravi", "ravi@example.com", "9000000002")]),
+]
+
+
+def test_consolidated_report_archive():
+    data = b"".join(iter_report_archive(iter(DAYS), "csv", "consolidated", "march"))
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.namelist() == ["march.csv"]
+        assert archive.read("march.csv").decode().splitlines() == [
+            "Date,Name,Email,Phone",
+            "2024-03-04,Asha,asha@example.com,9000000001",
+            "2024-03-05,Ravi,ravi@example.com,9000000002",
+        ]
+
+
+def test_daily_report_archive():
+    data = b"".join(iter_report_archive(iter(DAYS), "pdf", "daily", "march"))
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.namelist() == [
+            "attendance_report_2024-03-04.pdf",
+            "attendance_report_2024-03-05.pdf",
+        ]
+        assert archive.read("attendance_report_2024-03-04.pdf").startswith(b"%PDF-1.4")
@@ -0,0 +1,23 @@
+# test_tokens.py
+# Revocations polled from Revoked_Tokens by the other processes.
+import time
+from datetime import datetime, timedelta, timezone
+
+from lib import tokens
+from lib.tokens import issue_token, verify_token
+
+
+def test_poll_loads_revocations_and_prunes_expired(db, monkeypatch):
+    monkeypatch.setattr(tokens, "_revoked", {"expired": time.time() - 1})
+    monkeypatch.setattr(tokens, "_polled_since", None)
+    token = issue_token("tester")
+    jti = verify_token(token)["jti"]
+    now = datetime.now(timezone.utc)
+    db["Revoked_Tokens"].insert_one(
+        {"_id": jti, "REVOKED_AT": now, "EXPIRES_AT": now + timedelta(hours=1)}
+    )
+
+    tokens._poll_revocations()
+
+    assert set(tokens._revoked) == {jti}
+    assert verify_token(token) is None
@@ -0,0 +1,68 @@
+# test_validators.py
+# Field validators compiled from schema/Attendance Schema - Client.csv.
+import pytest
+
+from lib.db import validate_customer_fields
+from lib.validators import validate_client_fields
+
+
+def _form(**values):
+    fields = {
+        "NAME": "Acme",
+        "ADDRESS": "1 Park Street, Kolkata",
+        "EMAIL": "accounts@acme.in",
+        "MOBILE": "+91-98765 43210",
+    }
+    fields.update(values)
+    return {name: {"VALUE": value} for name, value in fields.items()}
+
+
+def test_valid_form():
+    form = _form(
+        CONTACT_EMAIL="ops@acme.in",
+        ONBOARDING_DATE="2024-01-15",
+        BILLING_DATE="15/01/2024",
+        DAILY_RATE=650.5,
+    )
+    assert validate_client_fields(form) is None
+    assert validate_customer_fields(form) is None
+
+
+@pytest.mark.parametrize(
+    "field, value",
+    [
+        ("EMAIL", "not-an-email"),
+        ("CONTACT_EMAIL", "ops@acme"),
+        ("MOBILE", "call me"),
+        ("MOBILE", True),
+        ("CONTACT_NUMBER", "98765x"),
+        ("DAILY_RATE", "six hundred"),
+        ("ONBOARDING_DATE", "January 2024"),
+        ("NAME", 42),
+        ("ATTENDANCE_DATA", "none"),
+    ],
+)
+def test_invalid_value(field, value):
+    assert validate_client_fields(_form(**{field: value})) == (field, False)
+
+
+def test_entry_must_be_a_field():
+    form = _form()
+    form["WEBSITE"] = "acme.in"
+    assert validate_client_fields(form) == ("WEBSITE", False)
+
+
+def test_empty_optional_fields_are_skipped():
+    assert validate_client_fields(_form(WEBSITE="", GST_NUMBER=None)) is None
+
+
+@pytest.mark.parametrize("field", ["NAME", "EMAIL", "MOBILE"])
+def test_customer_fields_are_required(field):
+    assert (
+        validate_customer_fields(_form(**{field: ""}))
+        == f"CUSTOMER {field} IS REQUIRED."
+    )
+
+
+def test_customer_data_must_be_a_dict():
+    assert validate_customer_fields(None) == "CUSTOMER DATA IS INVALID."